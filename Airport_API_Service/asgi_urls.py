@@ -0,0 +1,16 @@
+"""
+URLconf of the requests that come in over ASGI: Airport_API_Service.urls
+with the async views of airport.async_urls.
+"""
+from django.urls import path, include
+
+from Airport_API_Service.urls import urlpatterns as wsgi_urlpatterns
+
+urlpatterns = [
+    path("api/airport/", include("airport.async_urls", namespace="airport")),
+    *(
+        pattern
+        for pattern in wsgi_urlpatterns
+        if getattr(pattern, "namespace", None) != "airport"
+    ),
+]
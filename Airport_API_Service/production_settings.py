@@ -0,0 +1,26 @@
+"""
+Production settings: the development settings without the debug toolbar
+and without the Swagger and Redoc pages. drf-spectacular stays installed,
+as the views describe their schema with it.
+
+Use them with DJANGO_SETTINGS_MODULE=Airport_API_Service.production_settings.
+"""
+import os
+
+from Airport_API_Service.settings import *  # noqa: F401, F403
+from Airport_API_Service.settings import INSTALLED_APPS, MIDDLEWARE
+
+DEBUG = False
+
+ALLOWED_HOSTS = os.getenv("ALLOWED_HOSTS", "localhost").split(",")
+
+DEVELOPMENT_APPS = ("debug_toolbar",)
+
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in DEVELOPMENT_APPS]
+MIDDLEWARE = [
+    middleware
+    for middleware in MIDDLEWARE
+    if middleware.split(".")[0] not in DEVELOPMENT_APPS
+]
+
+API_DOC_PAGES = False
@@ -52,6 +52,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "airport.metrics.MetricsMiddleware",
+    "airport.query_inspector.QueryInspectorMiddleware",
+    "airport.async_views.AsyncUrlconfMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "debug_toolbar.middleware.DebugToolbarMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -64,6 +67,9 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = "Airport_API_Service.urls"
 
+# Requests that come in over ASGI, with async read views (airport.async_views)
+ASGI_URLCONF = "Airport_API_Service.asgi_urls"
+
 TEMPLATES = [
     {
         "BACKEND": "django.template.backends.django.DjangoTemplates",
@@ -96,6 +102,50 @@ DATABASES = {
     }
 }
 
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+
+if os.environ.get("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.environ["REDIS_URL"],
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+FLIGHT_CACHE_TIMEOUT = 300
+
+SEAT_HOLD_TTL = 600
+SEAT_HOLD_MAX_TTL = 1800
+# Seats one user can hold on a flight at a time
+SEAT_HOLD_MAX_SEATS = 10
+
+CONNECTION_MIN_MINUTES = 45
+CONNECTION_MAX_MINUTES = 24 * 60
+# Days of first departures searched by one connection search
+CONNECTION_MAX_DAYS = 7
+CONNECTION_GRAPH_MAX_AGE = 300
+
+ROUTING_CHANGES_TIMEOUT = 24 * 60 * 60
+
+# Seconds between two publications of the request metrics of a process
+METRICS_FLUSH_INTERVAL = 10
+# Bearer token of the metrics endpoint, which otherwise only serves staff
+# users, or everyone with DEBUG
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+# "log" or "raise" to report N+1 and slow queries of each request
+QUERY_INSPECTOR_MODE = os.getenv("QUERY_INSPECTOR_MODE")
+# Executions of one query template in a request reported as N+1
+QUERY_INSPECTOR_REPEAT = 3
+QUERY_INSPECTOR_SLOW_MS = 100
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -147,12 +197,21 @@ REST_FRAMEWORK = {
         "rest_framework.throttling.AnonRateThrottle",
         "rest_framework.throttling.UserRateThrottle",
     ],
-    "DEFAULT_THROTTLE_RATES": {"anon": "100/day", "user": "1000/day"},
-    "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.LimitOffsetPagination",
+    "DEFAULT_THROTTLE_RATES": {
+        "anon": "100/day",
+        # Raised by manage.py load_test for the servers it starts
+        "user": os.getenv("USER_THROTTLE_RATE", "1000/day"),
+    },
+    "DEFAULT_PAGINATION_CLASS": "airport.pagination.AirportPagination",
     "PAGE_SIZE": 10,
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
 }
 
+# Schema rendered by manage.py build_schema and served by airport.schema
+OPENAPI_SCHEMA_FILE = BASE_DIR / "openapi-schema.yml"
+# Serve the Swagger and Redoc pages of the schema
+API_DOC_PAGES = True
+
 SPECTACULAR_SETTINGS = {
     "TITLE": "Airport Service API",
     "DESCRIPTION": "Flight tracking service providing information on aircraft movements worldwide",
@@ -1,10 +1,9 @@
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
-from drf_spectacular.views import (
-    SpectacularSwaggerView,
-    SpectacularRedocView,
-    SpectacularAPIView,
-)
+
+from airport.metrics import metrics_view
+from airport.schema import schema_view
 
 urlpatterns = [
     path("admin/", admin.site.urls),
@@ -12,14 +11,25 @@ urlpatterns = [
     path("api/users/", include("user.urls", namespace="user")),
     path("api/", include("djoser.urls")),
     path("api/users/", include("djoser.urls.jwt")),
-    path("__debug__/", include("debug_toolbar.urls")),
-    path("api/schema/", SpectacularAPIView.as_view(), name="schema"),
-    path(
-        "api/doc/swagger/",
-        SpectacularSwaggerView.as_view(url_name="schema"),
-        name="swagger",
-    ),
-    path(
-        "api/doc/redoc/", SpectacularRedocView.as_view(url_name="schema"), name="redoc"
-    ),
+    path("metrics/", metrics_view, name="metrics"),
+    path("api/schema/", schema_view, name="schema"),
 ]
+
+if "debug_toolbar" in settings.INSTALLED_APPS:
+    urlpatterns.append(path("__debug__/", include("debug_toolbar.urls")))
+
+if settings.API_DOC_PAGES:
+    from drf_spectacular.views import SpectacularSwaggerView, SpectacularRedocView
+
+    urlpatterns += [
+        path(
+            "api/doc/swagger/",
+            SpectacularSwaggerView.as_view(url_name="schema"),
+            name="swagger",
+        ),
+        path(
+            "api/doc/redoc/",
+            SpectacularRedocView.as_view(url_name="schema"),
+            name="redoc",
+        ),
+    ]
@@ -9,6 +9,7 @@ from airport.models import (
     Airplane,
     Flight,
     Ticket,
+    SeatHold,
 )
 
 
@@ -50,5 +51,11 @@ class TicketAdmin(admin.ModelAdmin):
     list_filter = ("flight", "order")
 
 
+@admin.register(SeatHold)
+class SeatHoldAdmin(admin.ModelAdmin):
+    list_display = ("flight", "row", "seat", "user", "expires_at")
+    list_filter = ("flight",)
+
+
 admin.site.register(Crew)
 admin.site.register(AirplaneType)
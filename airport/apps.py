@@ -1,6 +1,14 @@
 from django.apps import AppConfig
+from django.core.checks import Tags, register
 
 
 class AirportConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "airport"
+
+    def ready(self):
+        import airport.signals  # noqa: F401
+        from airport.metrics import check_metrics_cache, instrument_connections
+
+        instrument_connections()
+        register(check_metrics_cache, Tags.caches, deploy=True)
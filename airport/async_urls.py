@@ -0,0 +1,14 @@
+from django.urls import path, include
+from rest_framework import routers
+
+from airport.async_views import ASYNC_VIEWSETS
+from airport.urls import router as sync_router
+
+# The routes of airport.urls, with the async viewsets where there are some
+router = routers.DefaultRouter()
+for prefix, viewset, basename in sync_router.registry:
+    router.register(prefix, ASYNC_VIEWSETS.get(viewset, viewset), basename=basename)
+
+urlpatterns = [path("", include(router.urls))]
+
+app_name = "airport"
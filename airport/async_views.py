@@ -0,0 +1,160 @@
+"""
+Async list and retrieve of the flight, route and airport viewsets, served
+to requests that come in over ASGI.
+
+AsyncUrlconfMiddleware routes ASGI requests to ASGI_URLCONF, where these
+viewsets replace the sync ones. Their list and retrieve await the async
+ORM, so a worker serves other requests while the database answers; the
+other actions and methods run the sync viewset in the thread of the
+request. Responses are the same as those of the sync viewsets.
+"""
+import functools
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404
+from rest_framework import exceptions
+from rest_framework.response import Response
+
+from airport.views import AirportViewSet, FlightViewSet, RouteViewSet
+
+
+class AsyncUrlconfMiddleware:
+    """Resolve the requests that come in over ASGI with ASGI_URLCONF."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if isinstance(request, ASGIRequest):
+            request.urlconf = settings.ASGI_URLCONF
+        return self.get_response(request)
+
+
+class AsyncViewSetMixin:
+    """
+    Serve the actions in async_actions with the coroutine a<action>() of
+    the viewset, e.g. alist(), and the other actions as the sync viewset.
+    """
+
+    async_actions = ("list", "retrieve")
+
+    @classmethod
+    def as_view(cls, actions=None, **initkwargs):
+        view = super().as_view(actions, **initkwargs)
+
+        async def async_view(request, *args, **kwargs):
+            return await view(request, *args, **kwargs)
+
+        return functools.update_wrapper(async_view, view)
+
+    async def dispatch(self, request, *args, **kwargs):
+        if self.action_map.get(request.method.lower()) not in self.async_actions:
+            return await sync_to_async(super().dispatch)(request, *args, **kwargs)
+
+        # APIView.dispatch()
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+        try:
+            await self.aperform_authentication(request)
+            self.initial(request, *args, **kwargs)
+            handler = getattr(self, f"a{self.action}")
+            response = await handler(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    async def aperform_authentication(self, request):
+        """
+        Request._authenticate(), ahead of initial() which then finds the
+        user set. Authenticators load the user in the thread of the request,
+        where the async ORM runs its queries as well.
+        """
+        for authenticator in request.authenticators:
+            try:
+                user_auth_tuple = await sync_to_async(authenticator.authenticate)(
+                    request
+                )
+            except exceptions.APIException:
+                request._not_authenticated()
+                raise
+
+            if user_auth_tuple is not None:
+                request._authenticator = authenticator
+                request.user, request.auth = user_auth_tuple
+                return
+        request._not_authenticated()
+
+
+class AsyncReadModelMixin:
+    """
+    The async ListModelMixin and RetrieveModelMixin. It comes after the
+    viewset in the bases, below the alist() and aretrieve() of its mixins.
+    """
+
+    async def aget_queryset(self):
+        return self.get_queryset()
+
+    async def apaginate_queryset(self, queryset):
+        if self.paginator is None:
+            return None
+        return await self.paginator.apaginate_queryset(
+            queryset, self.request, view=self
+        )
+
+    async def aget_object(self):
+        queryset = self.filter_queryset(await self.aget_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            instance = await queryset.aget(
+                **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+            )
+        except (queryset.model.DoesNotExist, TypeError, ValueError, ValidationError):
+            raise Http404
+        self.check_object_permissions(self.request, instance)
+        return instance
+
+    async def alist(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(await self.aget_queryset())
+        page = await self.apaginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+
+        instances = [instance async for instance in queryset]
+        return Response(self.get_serializer(instances, many=True).data)
+
+    async def aretrieve(self, request, *args, **kwargs):
+        instance = await self.aget_object()
+        return Response(self.get_serializer(instance).data)
+
+
+class AsyncAirportViewSet(AsyncViewSetMixin, AirportViewSet, AsyncReadModelMixin):
+    pass
+
+
+class AsyncRouteViewSet(AsyncViewSetMixin, RouteViewSet, AsyncReadModelMixin):
+    pass
+
+
+class AsyncFlightViewSet(AsyncViewSetMixin, FlightViewSet, AsyncReadModelMixin):
+    pass
+
+
+ASYNC_VIEWSETS = {
+    AirportViewSet: AsyncAirportViewSet,
+    RouteViewSet: AsyncRouteViewSet,
+    FlightViewSet: AsyncFlightViewSet,
+}
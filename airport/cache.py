@@ -0,0 +1,245 @@
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Min
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag, urlencode
+from rest_framework.response import Response
+
+from airport.models import SeatHold
+
+FLIGHT_LIST_VERSION_KEY = "airport:flights:list:version"
+FLIGHT_CACHE_HITS_KEY = "airport:flights:cache:hits"
+FLIGHT_CACHE_MISSES_KEY = "airport:flights:cache:misses"
+
+
+def flight_version_key(flight_id):
+    return f"airport:flights:{flight_id}:version"
+
+
+def _get_versions(*keys):
+    """
+    Return the current version token of each key. A missing token is
+    replaced with a fresh one, never with a previously used value, so an
+    evicted token cannot resurrect responses cached before an invalidation.
+    """
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, uuid.uuid4().hex, timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def _request_fingerprint(request):
+    query = urlencode(sorted(request.query_params.lists()), doseq=True)
+    return hashlib.md5(f"{request.get_host()}?{query}".encode()).hexdigest()
+
+
+def flight_list_cache_key(request):
+    (list_version,) = _get_versions(FLIGHT_LIST_VERSION_KEY)
+    return f"airport:flights:list:{list_version}:{_request_fingerprint(request)}"
+
+
+def flight_detail_cache_key(request, flight_id):
+    (flight_version,) = _get_versions(flight_version_key(flight_id))
+    return (
+        f"airport:flights:{flight_id}:{flight_version}:"
+        f"{_request_fingerprint(request)}"
+    )
+
+
+def _invalidate(flight_ids):
+    new_version = uuid.uuid4().hex
+    versions = {flight_version_key(flight_id): new_version for flight_id in flight_ids}
+    versions[FLIGHT_LIST_VERSION_KEY] = new_version
+    cache.set_many(versions, timeout=None)
+
+
+def invalidate_flights(flight_ids=()):
+    """
+    Drop cached flight list pages and the detail responses of the given
+    flights. The drop is repeated on commit, so a response cached by a
+    concurrent request before the transaction committed is dropped too.
+    """
+    flight_ids = list(flight_ids)
+    _invalidate(flight_ids)
+    transaction.on_commit(lambda: _invalidate(flight_ids))
+
+
+def _count(key):
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, timeout=None)
+
+
+def flight_cache_stats():
+    stats = cache.get_many([FLIGHT_CACHE_HITS_KEY, FLIGHT_CACHE_MISSES_KEY])
+    return {
+        "hits": stats.get(FLIGHT_CACHE_HITS_KEY, 0),
+        "misses": stats.get(FLIGHT_CACHE_MISSES_KEY, 0),
+    }
+
+
+class FlightCacheMixin:
+    """Serve FlightViewSet list and retrieve responses from the cache."""
+
+    @staticmethod
+    def _active_holds(data):
+        # Seats held on the flights of a response become available without
+        # a write, when the first hold expires
+        flights = data["results"] if "results" in data else [data]
+        return SeatHold.objects.active().filter(
+            flight_id__in=[flight["id"] for flight in flights]
+        )
+
+    @staticmethod
+    def _etag(request, cache_key, holds_expire_at):
+        # Derived from the cache key, so a conditional request that hits the
+        # cache is answered without touching the database
+        fingerprint = (
+            f"{cache_key}:{request.accepted_renderer.format}:"
+            f"{holds_expire_at.isoformat() if holds_expire_at else ''}"
+        )
+        return quote_etag(hashlib.md5(fingerprint.encode()).hexdigest())
+
+    def _cache_hit(self, request, cache_key):
+        entry = cache.get(cache_key)
+        if entry is None or (entry[1] is not None and entry[1] <= timezone.now()):
+            _count(FLIGHT_CACHE_MISSES_KEY)
+            return None
+        _count(FLIGHT_CACHE_HITS_KEY)
+        data, holds_expire_at = entry
+        etag = self._etag(request, cache_key, holds_expire_at)
+        response = get_conditional_response(request, etag=etag) or Response(data)
+        response["ETag"] = etag
+        response["X-Cache"] = "HIT"
+        return response
+
+    def _cache_miss(self, request, cache_key, response, holds_expire_at):
+        response["X-Cache"] = "MISS"
+        if response.status_code != 200:
+            return response
+        cache.set(
+            cache_key, (response.data, holds_expire_at), settings.FLIGHT_CACHE_TIMEOUT
+        )
+        etag = self._etag(request, cache_key, holds_expire_at)
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            not_modified["X-Cache"] = "MISS"
+            response = not_modified
+        response["ETag"] = etag
+        return response
+
+    def _cached_response(self, cache_key, view, request, *args, **kwargs):
+        response = self._cache_hit(request, cache_key)
+        if response is not None:
+            return response
+        response = view(request, *args, **kwargs)
+        holds_expire_at = None
+        if response.status_code == 200:
+            holds_expire_at = self._active_holds(response.data).aggregate(
+                expires_at=Min("expires_at")
+            )["expires_at"]
+        return self._cache_miss(request, cache_key, response, holds_expire_at)
+
+    async def _acached_response(self, cache_key, view, request, *args, **kwargs):
+        response = self._cache_hit(request, cache_key)
+        if response is not None:
+            return response
+        response = await view(request, *args, **kwargs)
+        holds_expire_at = None
+        if response.status_code == 200:
+            holds_expire_at = (
+                await self._active_holds(response.data).aaggregate(
+                    expires_at=Min("expires_at")
+                )
+            )["expires_at"]
+        return self._cache_miss(request, cache_key, response, holds_expire_at)
+
+    def _detail_cache_key(self, request, **kwargs):
+        return flight_detail_cache_key(
+            request, kwargs[self.lookup_url_kwarg or self.lookup_field]
+        )
+
+    def list(self, request, *args, **kwargs):
+        return self._cached_response(
+            flight_list_cache_key(request), super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._cached_response(
+            self._detail_cache_key(request, **kwargs),
+            super().retrieve,
+            request,
+            *args,
+            **kwargs,
+        )
+
+    async def alist(self, request, *args, **kwargs):
+        return await self._acached_response(
+            flight_list_cache_key(request), super().alist, request, *args, **kwargs
+        )
+
+    async def aretrieve(self, request, *args, **kwargs):
+        return await self._acached_response(
+            self._detail_cache_key(request, **kwargs),
+            super().aretrieve,
+            request,
+            *args,
+            **kwargs,
+        )
+
+
+class ChangeLog:
+    """
+    Versioned log of changes kept in the cache, for data that every process
+    derives from the database, keeps in memory and updates incrementally.
+    A reader remembers the (epoch, version) it has applied and asks for the
+    changes after it; when they are gone or the epoch changed, it rebuilds.
+    """
+
+    def __init__(self, name, timeout):
+        self.epoch_key = f"airport:{name}:epoch"
+        self.version_key = f"airport:{name}:version"
+        self.changes_key = f"airport:{name}:changes"
+        self.timeout = timeout
+
+    def state(self):
+        state = cache.get_many([self.epoch_key, self.version_key])
+        if self.epoch_key not in state:
+            cache.add(self.epoch_key, uuid.uuid4().hex, timeout=None)
+            state[self.epoch_key] = cache.get(self.epoch_key)
+        return state[self.epoch_key], state.get(self.version_key, 0)
+
+    def changes(self, since, version):
+        """Changes after version since up to version, or None if incomplete"""
+        keys = [
+            f"{self.changes_key}:{number}" for number in range(since + 1, version + 1)
+        ]
+        changes = cache.get_many(keys)
+        if len(changes) < len(keys):
+            return None
+        return [changes[key] for key in keys]
+
+    def _append(self, change):
+        if change is None:
+            cache.set(self.epoch_key, uuid.uuid4().hex, timeout=None)
+            return
+        cache.add(self.version_key, 0, timeout=None)
+        version = cache.incr(self.version_key)
+        cache.set(f"{self.changes_key}:{version}", change, timeout=self.timeout)
+
+    def record(self, change=None):
+        """
+        Append a change, or start a new epoch when change is None. Like
+        invalidate_flights(), the change is recorded again on commit.
+        """
+        self._append(change)
+        transaction.on_commit(lambda: self._append(change))
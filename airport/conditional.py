@@ -0,0 +1,123 @@
+import hashlib
+
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+class ConditionalListMixin:
+    """
+    ETag and Last-Modified for list responses. Both are derived from the row
+    count and the latest updated_at of the (filtered) queryset and of the
+    related rows listed in conditional_fields, so an unchanged response is
+    answered with 304 without serializing it.
+    """
+
+    conditional_fields = ("updated_at",)
+
+    def _state_aggregates(self):
+        return {
+            "count": Count("pk", distinct=True),
+            **{
+                f"updated_at_{index}": Max(field)
+                for index, field in enumerate(self.conditional_fields)
+            },
+        }
+
+    def _validators_from_state(self, request, state):
+        updated_at = [value for key, value in state.items() if key != "count" and value]
+        last_modified = max(updated_at, default=None)
+        fingerprint = (
+            f"{request.get_full_path()}:{request.accepted_renderer.format}:"
+            f"{state['count']}:{last_modified.isoformat() if last_modified else ''}"
+        )
+        etag = quote_etag(hashlib.md5(fingerprint.encode()).hexdigest())
+        return etag, int(last_modified.timestamp()) if last_modified else None
+
+    def _validators(self, request, queryset):
+        return self._validators_from_state(
+            request, queryset.order_by().aggregate(**self._state_aggregates())
+        )
+
+    @staticmethod
+    def _set_validators(response, etag, last_modified):
+        if response.status_code in (200, 304):
+            response["ETag"] = etag
+            if last_modified is not None:
+                response["Last-Modified"] = http_date(last_modified)
+        return response
+
+    def _conditional_response(self, queryset, view, request, *args, **kwargs):
+        etag, last_modified = self._validators(request, queryset)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = view(request, *args, **kwargs)
+        return self._set_validators(response, etag, last_modified)
+
+    async def _aconditional_response(self, queryset, view, request, *args, **kwargs):
+        etag, last_modified = self._validators_from_state(
+            request, await queryset.order_by().aaggregate(**self._state_aggregates())
+        )
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = await view(request, *args, **kwargs)
+        return self._set_validators(response, etag, last_modified)
+
+    def list(self, request, *args, **kwargs):
+        return self._conditional_response(
+            self.filter_queryset(self.get_queryset()),
+            super().list,
+            request,
+            *args,
+            **kwargs,
+        )
+
+    async def alist(self, request, *args, **kwargs):
+        return await self._aconditional_response(
+            self.filter_queryset(await self.aget_queryset()),
+            super().alist,
+            request,
+            *args,
+            **kwargs,
+        )
+
+
+class ConditionalGetMixin(ConditionalListMixin):
+    """ConditionalListMixin that covers retrieve responses as well."""
+
+    def _lookup_queryset(self, queryset, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        return self.filter_queryset(queryset).filter(
+            **{self.lookup_field: kwargs[lookup_url_kwarg]}
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            queryset = self._lookup_queryset(self.get_queryset(), **kwargs)
+        except (TypeError, ValueError, ValidationError):
+            return super().retrieve(request, *args, **kwargs)
+        return self._conditional_response(
+            queryset,
+            super().retrieve,
+            request,
+            *args,
+            **kwargs,
+        )
+
+    async def aretrieve(self, request, *args, **kwargs):
+        try:
+            queryset = self._lookup_queryset(await self.aget_queryset(), **kwargs)
+        except (TypeError, ValueError, ValidationError):
+            return await super().aretrieve(request, *args, **kwargs)
+        return await self._aconditional_response(
+            queryset,
+            super().aretrieve,
+            request,
+            *args,
+            **kwargs,
+        )
@@ -0,0 +1,219 @@
+import heapq
+import itertools
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import Counter, defaultdict, namedtuple
+
+from django.conf import settings
+from django.utils import timezone
+
+from airport.cache import ChangeLog
+from airport.models import Flight
+
+SCHEDULE_CHANGES = ChangeLog("schedule", timeout=settings.CONNECTION_GRAPH_MAX_AGE)
+
+Leg = namedtuple(
+    "Leg", ("flight_id", "source_id", "destination_id", "departure", "arrival")
+)
+
+
+def _timestamp(value):
+    return int(value.timestamp())
+
+
+class ConnectionGraph:
+    """
+    Time-dependent graph of flights: for every airport, its departures
+    sorted by time, plus the airports each airport is reached from. Times
+    are Unix timestamps.
+    """
+
+    def __init__(self, legs=()):
+        self.legs = {}
+        self.departures = defaultdict(list)
+        self.inbound = defaultdict(Counter)
+        for leg in legs:
+            self.add(leg)
+
+    def add(self, leg):
+        self.remove(leg.flight_id)
+        self.legs[leg.flight_id] = leg
+        insort(self.departures[leg.source_id], (leg.departure, leg.flight_id))
+        self.inbound[leg.destination_id][leg.source_id] += 1
+
+    def remove(self, flight_id):
+        leg = self.legs.pop(flight_id, None)
+        if leg is None:
+            return
+        departures = self.departures[leg.source_id]
+        del departures[bisect_left(departures, (leg.departure, leg.flight_id))]
+        sources = self.inbound[leg.destination_id]
+        sources[leg.source_id] -= 1
+        if not sources[leg.source_id]:
+            del sources[leg.source_id]
+
+    def _reaching(self, destination_ids, max_legs):
+        """
+        reaching[n]: airports from which one of the destinations can be
+        reached with at most n legs, ignoring departure times.
+        """
+        reaching = [frozenset(destination_ids)]
+        for _ in range(max_legs):
+            previous = reaching[-1]
+            reaching.append(
+                previous.union(
+                    *(self.inbound.get(airport_id, ()) for airport_id in previous)
+                )
+            )
+        return reaching
+
+    def search(
+        self,
+        source_ids,
+        destination_ids,
+        departure_from,
+        departure_to,
+        max_legs=3,
+        min_connection=0,
+        max_connection=24 * 60 * 60,
+        limit=None,
+    ):
+        """
+        The first limit (by default all) itineraries of up to max_legs
+        flights by arrival, as lists of legs, leaving one of the source
+        airports between departure_from and departure_to and ending at one
+        of the destination airports. Each connection leaves min_connection
+        to max_connection seconds after the previous arrival and no airport
+        is visited twice. Branches that cannot reach a destination with the
+        legs left, or not before the last of limit itineraries found, are
+        not explored.
+        """
+        destinations = frozenset(destination_ids)
+        reaching = self._reaching(destinations, max_legs)
+        # The found itineraries as a heap with the last in order on top
+        found = []
+        sequence = itertools.count()
+
+        def latest_arrival():
+            if limit is None or len(found) < limit:
+                return float("inf")
+            return -found[0][0]
+
+        def add(legs):
+            item = (-legs[-1].arrival, -len(legs), legs[0].departure)
+            item += (-next(sequence), legs)
+            if limit is None or len(found) < limit:
+                heapq.heappush(found, item)
+            elif item > found[0]:
+                heapq.heapreplace(found, item)
+
+        def extend(path, airport_id, earliest, latest, visited):
+            legs_left = max_legs - len(path)
+            departures = self.departures.get(airport_id, ())
+            for index in range(bisect_left(departures, (earliest,)), len(departures)):
+                departure, flight_id = departures[index]
+                if departure > min(latest, latest_arrival()):
+                    break
+                leg = self.legs[flight_id]
+                if leg.destination_id in visited or leg.arrival > latest_arrival():
+                    continue
+                if leg.destination_id in destinations:
+                    add(path + [leg])
+                elif legs_left > 1 and leg.destination_id in reaching[legs_left - 1]:
+                    extend(
+                        path + [leg],
+                        leg.destination_id,
+                        leg.arrival + min_connection,
+                        leg.arrival + max_connection,
+                        visited | {leg.destination_id},
+                    )
+
+        for source_id in set(source_ids) - destinations:
+            if source_id in reaching[max_legs]:
+                extend([], source_id, departure_from, departure_to, {source_id})
+
+        return [item[-1] for item in sorted(found, reverse=True)]
+
+
+def _legs(queryset):
+    for row in queryset.values_list(
+        "id",
+        "route__source_id",
+        "route__destination_id",
+        "departure_time",
+        "arrival_time",
+    ).iterator(chunk_size=5000):
+        yield Leg(*row[:3], _timestamp(row[3]), _timestamp(row[4]))
+
+
+class _GraphState:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.graph = None
+        self.epoch = None
+        self.version = 0
+        self.built_at = 0
+
+
+_state = _GraphState()
+
+
+def _refresh_graph():
+    """
+    Bring the graph of this process up to date with the schedule. Flights
+    changed since the last refresh are reloaded from the change log in the
+    cache; the graph is rebuilt from the database when the log is
+    incomplete, after schedule_changed() without flights and at least every
+    CONNECTION_GRAPH_MAX_AGE seconds. Past departures are not loaded.
+    """
+    epoch, version = SCHEDULE_CHANGES.state()
+    changes = None
+    if (
+        _state.graph is not None
+        and _state.epoch == epoch
+        and _state.version <= version
+        and time.monotonic() - _state.built_at < settings.CONNECTION_GRAPH_MAX_AGE
+    ):
+        changes = SCHEDULE_CHANGES.changes(_state.version, version)
+
+    if changes is None:
+        _state.graph = ConnectionGraph(
+            _legs(Flight.objects.filter(departure_time__gte=timezone.now()))
+        )
+        _state.built_at = time.monotonic()
+    elif changes:
+        changed_flight_ids = set().union(*changes)
+        for flight_id in changed_flight_ids:
+            _state.graph.remove(flight_id)
+        for leg in _legs(Flight.objects.filter(pk__in=changed_flight_ids)):
+            _state.graph.add(leg)
+
+    _state.epoch, _state.version = epoch, version
+
+
+def search_connections(
+    source_ids, destination_ids, departure_from, departure_to, **options
+):
+    """
+    ConnectionGraph.search on the up to date graph of this process, with
+    departure_from and departure_to given as datetimes.
+    """
+    with _state.lock:
+        _refresh_graph()
+        return _state.graph.search(
+            source_ids,
+            destination_ids,
+            _timestamp(departure_from),
+            _timestamp(departure_to),
+            **options,
+        )
+
+
+def schedule_changed(flight_ids=None):
+    """
+    Log that the departure, arrival or route of the given flights changed,
+    so every process reloads them into its graph. Without flight ids, the
+    graphs are rebuilt.
+    """
+    SCHEDULE_CHANGES.record(None if flight_ids is None else list(flight_ids))
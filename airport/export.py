@@ -0,0 +1,114 @@
+import csv
+import json
+
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, F
+from django.http import StreamingHttpResponse
+
+from airport.models import Flight, Order, Ticket
+
+CHUNK_SIZE = 2000
+OUTPUTS = {
+    "csv": "text/csv",
+    "jsonl": "application/x-ndjson",
+}
+
+# Queryset, model fields and annotations of every export, in column order.
+EXPORTS = {
+    "flights": (
+        Flight.objects.order_by("id"),
+        (
+            "id",
+            "route_id",
+            "airplane_id",
+            "departure_time",
+            "arrival_time",
+            "tickets_sold",
+        ),
+        {
+            "source": F("route__source__name"),
+            "destination": F("route__destination__name"),
+            "distance": F("route__distance"),
+            "airplane_name": F("airplane__name"),
+            "capacity": F("airplane__capacity"),
+        },
+    ),
+    "orders": (
+        Order.objects.order_by("id"),
+        ("id", "user_id", "created_at"),
+        {"tickets_count": Count("tickets")},
+    ),
+    "tickets": (
+        Ticket.objects.order_by("id"),
+        ("id", "order_id", "flight_id", "row", "seat"),
+        {
+            "user_id": F("order__user_id"),
+            "created_at": F("order__created_at"),
+        },
+    ),
+}
+
+
+class Echo:
+    """File-like object that returns what is written, for csv.writer"""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(columns, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow([row[column] for column in columns])
+
+
+def json_lines(columns, rows):
+    for row in rows:
+        yield json.dumps(row, cls=DjangoJSONEncoder) + "\n"
+
+
+def _chunks(lines):
+    """Join lines into chunks, so the server writes fewer, larger blocks."""
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) == CHUNK_SIZE:
+            yield "".join(chunk)
+            chunk = []
+    if chunk:
+        yield "".join(chunk)
+
+
+async def _aiterate(iterator):
+    """
+    Yield the items of a sync iterator, each read in the thread of the
+    request, where its cursor lives. Django would read a sync iterator to
+    the end before sending any of it under ASGI.
+    """
+    try:
+        while (item := await sync_to_async(next)(iterator, None)) is not None:
+            yield item
+    finally:
+        await sync_to_async(iterator.close)()
+
+
+def export_response(name, output="csv", asynchronous=False):
+    """
+    Stream all rows of an export as CSV or JSON lines. Rows are read as
+    dicts with a server-side cursor, CHUNK_SIZE at a time, so memory use
+    does not depend on the size of the table. Requests served over ASGI
+    need an asynchronous response.
+    """
+    queryset, fields, annotations = EXPORTS[name]
+    columns = fields + tuple(annotations)
+    rows = queryset.values(*fields, **annotations).iterator(chunk_size=CHUNK_SIZE)
+    lines = (json_lines if output == "jsonl" else csv_lines)(columns, rows)
+    chunks = _chunks(lines)
+
+    response = StreamingHttpResponse(
+        _aiterate(chunks) if asynchronous else chunks, content_type=OUTPUTS[output]
+    )
+    response["Content-Disposition"] = f'attachment; filename="{name}.{output}"'
+    return response
@@ -0,0 +1,73 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Run in a fresh interpreter: the startup of a WSGI worker, up to the
+# loaded URLconf, and its peak RSS (kilobytes on Linux)
+PROBE = """
+import json, resource, sys, time
+started_at = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+get_wsgi_application()
+from django.urls import get_resolver
+get_resolver().url_patterns
+print(json.dumps({
+    "seconds": time.perf_counter() - started_at,
+    "rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    "modules": len(sys.modules),
+}))
+"""
+
+
+class Command(BaseCommand):
+    """Django command to measure the startup time and memory of a worker"""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "settings_modules",
+            nargs="*",
+            default=[
+                "Airport_API_Service.settings",
+                "Airport_API_Service.production_settings",
+            ],
+            help="Settings modules to compare, the first one is the reference.",
+        )
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def _probe(self, settings_module):
+        result = subprocess.run(
+            [sys.executable, "-c", PROBE],
+            cwd=settings.BASE_DIR,
+            env={**os.environ, "DJANGO_SETTINGS_MODULE": settings_module},
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode:
+            raise CommandError(f"{settings_module} failed to start:\n{result.stderr}")
+        return json.loads(result.stdout.splitlines()[-1])
+
+    def handle(self, *args, **options):
+        reference = None
+        for settings_module in options["settings_modules"]:
+            probes = [
+                self._probe(settings_module) for _ in range(options["repeat"])
+            ]
+            seconds = statistics.median(probe["seconds"] for probe in probes)
+            rss_mb = statistics.median(probe["rss_kb"] for probe in probes) / 1024
+            line = (
+                f"{settings_module}: {seconds * 1000:.0f} ms, {rss_mb:.1f} MB RSS, "
+                f"{probes[0]['modules']} modules"
+            )
+            if reference is None:
+                reference = seconds, rss_mb
+            else:
+                line += (
+                    f" ({(seconds / reference[0] - 1) * 100:+.0f}% time, "
+                    f"{rss_mb - reference[1]:+.1f} MB)"
+                )
+            self.stdout.write(line)
@@ -0,0 +1,35 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from airport.schema import build_schema
+
+
+class Command(BaseCommand):
+    """
+    Django command to render the OpenAPI schema to OPENAPI_SCHEMA_FILE.
+    Integer bounds come from the database backend, so the committed file is
+    rendered with the PostgreSQL settings.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Only fail if the schema file is out of date with the code.",
+        )
+
+    def handle(self, *args, **options):
+        path = Path(settings.OPENAPI_SCHEMA_FILE)
+        schema = build_schema()
+        if options["check"]:
+            if not path.exists() or path.read_bytes() != schema:
+                raise CommandError(
+                    f"{path.name} is out of date, run `manage.py build_schema`."
+                )
+            self.stdout.write(self.style.SUCCESS(f"{path.name} is up to date"))
+            return
+
+        path.write_bytes(schema)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {path}"))
@@ -0,0 +1,287 @@
+import random
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from airport.cache import invalidate_flights
+from airport.connections import schedule_changed
+from airport.models import (
+    Airplane,
+    AirplaneType,
+    Airport,
+    Crew,
+    Flight,
+    Order,
+    Route,
+    Ticket,
+)
+from airport.routing import routes_changed
+from airport.seat_map import SeatMap
+
+CITIES = (
+    "Amsterdam", "Athens", "Bangkok", "Barcelona", "Berlin", "Boston",
+    "Buenos Aires", "Cairo", "Chicago", "Delhi", "Dubai", "Dublin",
+    "Hong Kong", "Istanbul", "Kyiv", "Lisbon", "London", "Los Angeles",
+    "Madrid", "Mexico City", "Miami", "Milan", "Montreal", "Mumbai",
+    "New York", "Oslo", "Paris", "Phoenix", "Prague", "Rome", "San Francisco",
+    "Seoul", "Singapore", "Stockholm", "Sydney", "Tokyo", "Toronto", "Vienna",
+    "Warsaw", "Zurich",
+)
+AIRPORT_SUFFIXES = ("Airport", "International", "Skyport", "Air Hub", "Gateway")
+AIRPLANE_TYPES = (
+    "Boeing 737", "Airbus A320", "Embraer E190", "Bombardier Q400", "Boeing 777"
+)
+FIRST_NAMES = (
+    "Anna", "Bohdan", "Carlos", "Daria", "Emma", "Farid", "Grace", "Hiro",
+    "Ivan", "Julia", "Kofi", "Lena", "Marco", "Nadia", "Oleh", "Priya",
+)
+LAST_NAMES = (
+    "Andersen", "Bondarenko", "Costa", "Dubois", "Evans", "Fischer", "Garcia",
+    "Horvat", "Ito", "Jensen", "Kovalenko", "Larsen", "Moreau", "Novak",
+)
+CRUISE_SPEED = 800
+TICKETS_PER_ORDER = (1, 4)
+
+
+class Command(BaseCommand):
+    """
+    Django command to fill the database with a reproducible, production-sized
+    dataset. Routes are checked with Route.validate_routes (distinct
+    airports, one route per pair of airports in either direction) and tickets
+    stay inside the seat ranges checked by Ticket.validate_ticket, with seat
+    maps and tickets_sold filled in to match.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--airports", type=int, default=2000)
+        parser.add_argument("--routes", type=int, default=20000)
+        parser.add_argument("--airplanes", type=int, default=500)
+        parser.add_argument("--crew", type=int, default=5000)
+        parser.add_argument("--users", type=int, default=10000)
+        parser.add_argument("--flights", type=int, default=50000)
+        parser.add_argument(
+            "--tickets",
+            type=int,
+            default=2000000,
+            help="Total number of tickets, spread over the flights.",
+        )
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=180,
+            help="Flights depart within this many days, starting tomorrow.",
+        )
+        parser.add_argument(
+            "--password",
+            help="Password of the generated users. Unusable if not given.",
+        )
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+
+        airports = self._create_airports(options["airports"])
+        routes = self._create_routes(airports, options["routes"])
+        airplanes = self._create_airplanes(options["airplanes"])
+        crew = self._create_crew(options["crew"])
+        users = self._create_users(
+            options["users"], options["seed"], options["password"]
+        )
+        if options["flights"] and not (routes and airplanes):
+            raise CommandError("Flights need at least one route and one airplane.")
+        if options["tickets"] and not users:
+            raise CommandError("Tickets need at least one user.")
+        flights, tickets = self._create_flights(
+            routes, airplanes, crew, users, options
+        )
+        invalidate_flights()
+        schedule_changed()
+        routes_changed()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Created {len(airports)} airports, {len(routes)} routes, "
+                f"{len(airplanes)} airplanes, {len(crew)} crew, "
+                f"{len(users)} users, {flights} flights and {tickets} tickets"
+            )
+        )
+
+    def _bulk_create(self, model, objects):
+        return model.objects.bulk_create(objects, batch_size=self.batch_size)
+
+    def _create_airports(self, count):
+        airports = []
+        for index in range(count):
+            city = self.random.choice(CITIES)
+            suffix = self.random.choice(AIRPORT_SUFFIXES)
+            airports.append(
+                Airport(name=f"{city} {suffix} {index + 1}", closest_big_city=city)
+            )
+        return self._bulk_create(Airport, airports)
+
+    def _create_routes(self, airports, count):
+        available = len(airports) * (len(airports) - 1) // 2
+        if count > available:
+            raise CommandError(
+                f"{len(airports)} airports allow at most {available} routes."
+            )
+
+        pairs = set()
+        routes = []
+        while len(routes) < count:
+            source, destination = self.random.sample(airports, 2)
+            pair = frozenset((source.pk, destination.pk))
+            if pair in pairs:
+                continue
+            pairs.add(pair)
+            routes.append(
+                Route(
+                    source=source,
+                    destination=destination,
+                    distance=self.random.randint(200, 15000),
+                )
+            )
+        Route.validate_routes(routes)
+        return self._bulk_create(Route, routes)
+
+    def _create_airplanes(self, count):
+        airplane_types = {
+            airplane_type.name: airplane_type
+            for airplane_type in AirplaneType.objects.filter(name__in=AIRPLANE_TYPES)
+        }
+        self._bulk_create(
+            AirplaneType,
+            [
+                AirplaneType(name=name)
+                for name in AIRPLANE_TYPES
+                if name not in airplane_types
+            ],
+        )
+        airplane_types = list(
+            AirplaneType.objects.filter(name__in=AIRPLANE_TYPES).order_by("id")
+        )
+        return self._bulk_create(
+            Airplane,
+            [
+                Airplane(
+                    name=f"Airplane {index + 1}",
+                    rows=self.random.randint(10, 60),
+                    seats_in_row=self.random.randint(4, 10),
+                    airplane_type=self.random.choice(airplane_types),
+                )
+                for index in range(count)
+            ],
+        )
+
+    def _create_crew(self, count):
+        return self._bulk_create(
+            Crew,
+            [
+                Crew(
+                    first_name=self.random.choice(FIRST_NAMES),
+                    last_name=self.random.choice(LAST_NAMES),
+                )
+                for _ in range(count)
+            ],
+        )
+
+    def _create_users(self, count, seed, password):
+        user_model = get_user_model()
+        password = make_password(password)
+        emails = [f"passenger{seed}-{index + 1}@example.com" for index in range(count)]
+        user_model.objects.bulk_create(
+            [user_model(email=email, password=password) for email in emails],
+            batch_size=self.batch_size,
+            ignore_conflicts=True,
+        )
+        users = []
+        for start in range(0, count, self.batch_size):
+            users.extend(
+                user_model.objects.filter(
+                    email__in=emails[start : start + self.batch_size]
+                ).order_by("id")
+            )
+        return users
+
+    def _create_flights(self, routes, airplanes, crew, users, options):
+        flights_count = options["flights"]
+        tickets_left = options["tickets"]
+        first_departure = timezone.now() + timezone.timedelta(days=1, hours=1)
+        created_flights = created_tickets = 0
+
+        while created_flights < flights_count:
+            flights = []
+            seats = []
+            for _ in range(min(self.batch_size, flights_count - created_flights)):
+                route = self.random.choice(routes)
+                airplane = self.random.choice(airplanes)
+                departure_time = first_departure + timezone.timedelta(
+                    minutes=self.random.randrange(options["days"] * 24 * 60)
+                )
+                arrival_time = departure_time + timezone.timedelta(
+                    minutes=route.distance * 60 // CRUISE_SPEED + 30
+                )
+
+                flights_left = flights_count - created_flights - len(flights)
+                sold = min(airplane.capacity, tickets_left // flights_left)
+                tickets_left -= sold
+                seat_map = SeatMap(airplane.rows, airplane.seats_in_row)
+                flight_seats = []
+                for place in self.random.sample(range(airplane.capacity), sold):
+                    row, seat = divmod(place, airplane.seats_in_row)
+                    seat_map.take(row + 1, seat + 1)
+                    flight_seats.append((row + 1, seat + 1))
+
+                flights.append(
+                    Flight(
+                        route=route,
+                        airplane=airplane,
+                        departure_time=departure_time,
+                        arrival_time=arrival_time,
+                        seat_map=seat_map.to_bytes(),
+                        tickets_sold=sold,
+                    )
+                )
+                seats.append(flight_seats)
+
+            flights = self._bulk_create(Flight, flights)
+            if crew:
+                self._bulk_create(
+                    Flight.crew.through,
+                    [
+                        Flight.crew.through(flight_id=flight.pk, crew_id=member.pk)
+                        for flight in flights
+                        for member in self.random.sample(
+                            crew, min(len(crew), self.random.randint(2, 5))
+                        )
+                    ],
+                )
+            created_tickets += self._create_tickets(flights, seats, users)
+            created_flights += len(flights)
+            self.stdout.write(f"Created {created_flights}/{flights_count} flights")
+
+        return created_flights, created_tickets
+
+    def _create_tickets(self, flights, seats, users):
+        """Sell the given seats of each flight in orders of a few tickets."""
+        orders = []
+        tickets = []
+        for flight, flight_seats in zip(flights, seats):
+            start = 0
+            while start < len(flight_seats):
+                size = self.random.randint(*TICKETS_PER_ORDER)
+                order = Order(user=self.random.choice(users))
+                orders.append(order)
+                tickets.extend(
+                    Ticket(flight=flight, order=order, row=row, seat=seat)
+                    for row, seat in flight_seats[start : start + size]
+                )
+                start += size
+
+        self._bulk_create(Order, orders)
+        self._bulk_create(Ticket, tickets)
+        return len(tickets)
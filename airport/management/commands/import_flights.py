@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.exceptions import ParseError
+
+from airport.schedule_import import (
+    InvalidSchedule,
+    import_flight_schedule,
+    read_csv,
+    read_json_lines,
+)
+
+READERS = {"csv": read_csv, "jsonl": read_json_lines}
+
+
+class Command(BaseCommand):
+    """Django command to import a flight schedule from a CSV or JSON lines file"""
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument(
+            "--format",
+            choices=READERS,
+            help="File format, by default guessed from the file extension.",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        file_format = options["format"] or (
+            "csv" if path.lower().endswith(".csv") else "jsonl"
+        )
+        with open(path, newline="", encoding="utf-8") as schedule:
+            try:
+                created = import_flight_schedule(
+                    READERS[file_format](schedule), options["batch_size"]
+                )
+            except ParseError as error:
+                raise CommandError(error.detail)
+            except InvalidSchedule as error:
+                for row in error.detail["errors"]:
+                    self.stderr.write(f"Line {row['line']}: {row['errors']}")
+                raise CommandError(error.detail["detail"])
+
+        self.stdout.write(self.style.SUCCESS(f"Imported {created} flights"))
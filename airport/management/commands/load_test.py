@@ -0,0 +1,208 @@
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+from django.utils.http import urlencode
+from rest_framework_simplejwt.tokens import AccessToken
+
+from airport.models import Flight
+
+SERVERS = {
+    "wsgi": ["Airport_API_Service.wsgi:application"],
+    "asgi": [
+        "Airport_API_Service.asgi:application",
+        "--worker-class",
+        "uvicorn.workers.UvicornWorker",
+    ],
+}
+STARTUP_TIMEOUT = 30
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def _get(port, path, token):
+    """Status of a GET on a new connection, as a client without keep-alive"""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        writer.write(
+            f"GET {path} HTTP/1.1\r\nHost: localhost\r\n"
+            f"Authorization: Bearer {token}\r\nConnection: close\r\n\r\n".encode()
+        )
+        await writer.drain()
+        response = await reader.read()
+    finally:
+        writer.close()
+    return int(response.split(b" ", 2)[1])
+
+
+async def _client(port, paths, token, deadline, latencies, errors):
+    request_number = 0
+    while time.perf_counter() < deadline:
+        path = paths[request_number % len(paths)]
+        request_number += 1
+        started_at = time.perf_counter()
+        try:
+            status = await _get(port, path, token)
+        except (OSError, IndexError, ValueError):
+            status = None
+        latencies.append(time.perf_counter() - started_at)
+        if status != 200:
+            errors.append(status)
+
+
+async def _load(port, paths, token, clients, duration):
+    latencies, errors = [], []
+    deadline = time.perf_counter() + duration
+    await asyncio.gather(
+        *(
+            _client(
+                port, paths[index:] + paths[:index], token, deadline, latencies, errors
+            )
+            for index in range(clients)
+        )
+    )
+    return latencies, errors
+
+
+class Command(BaseCommand):
+    """
+    Django command to compare the throughput and latency of the read
+    endpoints served by gunicorn with sync WSGI workers and with uvicorn
+    ASGI workers, which serve them with the async views, under the same
+    number of concurrent clients
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "servers",
+            nargs="*",
+            default=list(SERVERS),
+            help=f"Servers to compare, of {', '.join(SERVERS)}.",
+        )
+        parser.add_argument("--workers", type=int, default=4)
+        parser.add_argument("--clients", type=int, default=64)
+        parser.add_argument(
+            "--duration", type=float, default=10, help="Seconds of load per server."
+        )
+        parser.add_argument(
+            "--warmup", type=float, default=2, help="Seconds of load before measuring."
+        )
+
+    def _paths(self):
+        """A flight search, a flight and the first pages of routes and airports"""
+        flight = Flight.objects.select_related("route__source").order_by("pk").first()
+        if flight is None:
+            raise CommandError("There are no flights, run generate_airport_data.")
+        search = urlencode(
+            {
+                "source": flight.route.source.closest_big_city,
+                "date": flight.departure_time.date().isoformat(),
+            }
+        )
+        return [
+            f"{reverse('airport:flight-list')}?{search}",
+            reverse("airport:flight-detail", args=[flight.pk]),
+            reverse("airport:route-list"),
+            reverse("airport:airport-list"),
+        ]
+
+    def _token(self):
+        user = get_user_model().objects.filter(is_active=True).order_by("pk").first()
+        if user is None:
+            raise CommandError("There are no active users to authenticate with.")
+        return str(AccessToken.for_user(user))
+
+    def _start(self, server, port, workers, log):
+        process = subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "gunicorn",
+                *SERVERS[server],
+                "--workers",
+                str(workers),
+                "--bind",
+                f"127.0.0.1:{port}",
+            ],
+            cwd=settings.BASE_DIR,
+            env={**os.environ, "USER_THROTTLE_RATE": "1000000/s"},
+            stdout=log,
+            stderr=log,
+        )
+        started_at = time.monotonic()
+        while time.monotonic() - started_at < STARTUP_TIMEOUT:
+            if process.poll() is not None:
+                break
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=1).close()
+                return process
+            except OSError:
+                time.sleep(0.2)
+        process.kill()
+        log.seek(0)
+        raise CommandError(f"The {server} server did not start:\n{log.read()}")
+
+    def _stop(self, process):
+        process.terminate()
+        try:
+            process.wait(timeout=STARTUP_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+    def handle(self, *args, **options):
+        unknown = set(options["servers"]) - set(SERVERS)
+        if unknown:
+            raise CommandError(f"Unknown servers: {', '.join(sorted(unknown))}.")
+        paths, token = self._paths(), self._token()
+        self.stdout.write(
+            f"{options['clients']} clients, {options['workers']} workers, "
+            f"{options['duration']:g} s per server: {', '.join(paths)}"
+        )
+
+        clients, warmup, duration = (
+            options["clients"],
+            options["warmup"],
+            options["duration"],
+        )
+        reference = None
+        for server in options["servers"]:
+            port = _free_port()
+            with tempfile.TemporaryFile(mode="w+") as log:
+                process = self._start(server, port, options["workers"], log)
+                try:
+                    if options["warmup"]:
+                        asyncio.run(_load(port, paths, token, clients, warmup))
+                    latencies, errors = asyncio.run(
+                        _load(port, paths, token, clients, duration)
+                    )
+                finally:
+                    self._stop(process)
+
+            throughput = len(latencies) / duration
+            percentiles = statistics.quantiles(latencies, n=100)
+            line = (
+                f"{server}: {throughput:.0f} requests/s, "
+                f"p50 {percentiles[49] * 1000:.0f} ms, "
+                f"p99 {percentiles[98] * 1000:.0f} ms, {len(errors)} errors"
+            )
+            if reference is None:
+                reference = throughput, percentiles[98]
+            else:
+                line += (
+                    f" ({(throughput / reference[0] - 1) * 100:+.0f}% throughput, "
+                    f"{(percentiles[98] / reference[1] - 1) * 100:+.0f}% p99)"
+                )
+            self.stdout.write(line)
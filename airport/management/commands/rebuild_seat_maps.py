@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from airport.models import Flight
+
+
+class Command(BaseCommand):
+    """Django command to rebuild flight seat maps from sold tickets"""
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        flight_ids = Flight.objects.order_by("id").values_list("id", flat=True)
+        rebuilt = 0
+        last_id = 0
+        while True:
+            batch = list(flight_ids.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1]
+            rebuilt += Flight.objects.filter(id__in=batch).rebuild_seat_maps()
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rebuilt} seat maps"))
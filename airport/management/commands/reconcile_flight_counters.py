@@ -0,0 +1,66 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from airport.models import Flight, Ticket, ticket_seat_maps
+from airport.seat_map import SeatMap
+
+
+class Command(BaseCommand):
+    """Django command to detect and fix drift of flight counters and seat maps"""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report flights whose counters or seat maps drifted.",
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def _drifted(self, batch):
+        """Flights of the batch whose counter or seat map drifted, reported"""
+        drifted = []
+        for flight_id, (seat_map, tickets) in ticket_seat_maps(batch.values()).items():
+            flight = batch[flight_id]
+            drift = []
+            if flight.tickets_sold != tickets:
+                drift.append(f"tickets_sold={flight.tickets_sold}, actual={tickets}")
+            if SeatMap.for_flight(flight).to_bytes() != seat_map.to_bytes():
+                drift.append("seat map differs from the tickets")
+            if drift:
+                self.stdout.write(f"Flight {flight_id}: {'; '.join(drift)}")
+                drifted.append(flight_id)
+        return drifted
+
+    def handle(self, *args, **options):
+        flights = Flight.objects.select_related("airplane").order_by("id")
+        tickets_count = (
+            Ticket.objects.filter(flight=OuterRef("pk"))
+            .order_by()
+            .values("flight")
+            .annotate(count=Count("id"))
+            .values("count")
+        )
+        fixed = 0
+        last_id = 0
+        while True:
+            batch = {
+                flight.pk: flight
+                for flight in flights.filter(id__gt=last_id)[: options["batch_size"]]
+            }
+            if not batch:
+                break
+            last_id = max(batch)
+
+            drifted = self._drifted(batch)
+            if not drifted or options["dry_run"]:
+                continue
+            with transaction.atomic():
+                Flight.objects.filter(pk__in=drifted).rebuild_seat_maps()
+                Flight.objects.filter(pk__in=drifted).update(
+                    tickets_sold=Coalesce(Subquery(tickets_count), 0)
+                )
+            fixed += len(drifted)
+
+        self.stdout.write(self.style.SUCCESS(f"Fixed {fixed} flights"))
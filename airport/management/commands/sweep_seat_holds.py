@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from airport.cache import invalidate_flights
+from airport.models import Flight, SeatHold
+
+
+class Command(BaseCommand):
+    """Django command to delete expired seat holds in bulk"""
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=10000)
+
+    def handle(self, *args, **options):
+        swept = 0
+        while True:
+            batch = list(
+                SeatHold.objects.expired().values_list("id", "flight_id")[
+                    : options["batch_size"]
+                ]
+            )
+            if not batch:
+                break
+            SeatHold.objects.filter(pk__in=[hold_id for hold_id, _ in batch]).delete()
+            flight_ids = {flight_id for _, flight_id in batch}
+            Flight.objects.filter(pk__in=flight_ids).update(updated_at=timezone.now())
+            invalidate_flights(flight_ids)
+            swept += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(f"Swept {swept} expired seat holds"))
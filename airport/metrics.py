@@ -0,0 +1,350 @@
+"""
+Per-request performance metrics, exposed in the Prometheus text format.
+
+MetricsMiddleware records the wall time, database query count and time,
+render time and response size of every request, labelled by DRF viewset
+and action (FlightViewSet.list). Each process aggregates its requests in
+memory and publishes them to the cache, under a slot of its own, at most
+every METRICS_FLUSH_INTERVAL seconds; metrics_view merges the slots. The
+slots of exited processes are kept, so the totals never go down.
+Streaming responses are measured up to the start of the stream. The
+middleware runs as sync or async as the handler; queries are recorded by
+every connection into the metrics of the request context, which follows
+the async ORM into the thread where it runs the query.
+"""
+import contextvars
+import os
+import threading
+import time
+from bisect import bisect_left
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core import checks
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+from django.utils.crypto import constant_time_compare
+from rest_framework import exceptions
+from rest_framework.settings import api_settings
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+
+HISTOGRAMS = {
+    "airport_request_duration_seconds": (
+        "Wall time of the request",
+        DURATION_BUCKETS,
+    ),
+    "airport_db_queries": ("Database queries of the request", QUERY_BUCKETS),
+    "airport_db_duration_seconds": (
+        "Time spent in database queries by the request",
+        DURATION_BUCKETS,
+    ),
+    "airport_render_duration_seconds": (
+        "Time spent rendering the response body",
+        DURATION_BUCKETS,
+    ),
+    "airport_response_size_bytes": ("Size of the response body", SIZE_BUCKETS),
+}
+REQUESTS_TOTAL = "airport_requests_total"
+
+SLOTS_KEY = "airport:metrics:slots"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_current = contextvars.ContextVar("airport_request_metrics", default=None)
+
+
+class RequestMetrics:
+    """Measurements of one request, also its database execute wrapper."""
+
+    __slots__ = ("queries", "db_time", "render_time")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.render_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started_at = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started_at
+            self.queries += 1
+
+
+class _ProcessMetrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = {}
+        self.histograms = {}
+        self.flushed_at = 0.0
+        # (pid, cache key) of the slot, taken again in a forked process
+        self.slot = None
+
+    def observe(self, view, method, status, values):
+        with self.lock:
+            key = (view, method, status)
+            self.requests[key] = self.requests.get(key, 0) + 1
+            for name, value in values.items():
+                histogram = self.histograms.get((name, view))
+                if histogram is None:
+                    # Bucket counts, then the sum and the count
+                    histogram = [0] * (len(HISTOGRAMS[name][1]) + 3)
+                    self.histograms[(name, view)] = histogram
+                histogram[bisect_left(HISTOGRAMS[name][1], value)] += 1
+                histogram[-2] += value
+                histogram[-1] += 1
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "requests": dict(self.requests),
+                "histograms": {
+                    key: list(histogram)
+                    for key, histogram in self.histograms.items()
+                },
+            }
+
+
+_process = _ProcessMetrics()
+
+
+def _slot_key(slot):
+    return f"airport:metrics:process:{slot}"
+
+
+def _process_key():
+    """
+    Cache key of the metrics of this process. Each process takes a slot
+    number of its own with an atomic increment, so concurrent processes
+    never overwrite each other's registration.
+    """
+    pid = os.getpid()
+    if _process.slot is None or _process.slot[0] != pid:
+        cache.add(SLOTS_KEY, 0, timeout=None)
+        _process.slot = (pid, _slot_key(cache.incr(SLOTS_KEY)))
+    return _process.slot[1]
+
+
+def flush(force=False):
+    """Publish the metrics of this process to the cache."""
+    now = time.monotonic()
+    if not force and now - _process.flushed_at < settings.METRICS_FLUSH_INTERVAL:
+        return
+    _process.flushed_at = now
+    cache.set(_process_key(), _process.snapshot(), timeout=None)
+
+
+def collect():
+    """Metrics of all processes that ever published them, merged."""
+    flush(force=True)
+    requests = {}
+    histograms = {}
+    slots = range(1, cache.get(SLOTS_KEY, 0) + 1)
+    for snapshot in cache.get_many([_slot_key(slot) for slot in slots]).values():
+        for key, count in snapshot["requests"].items():
+            requests[key] = requests.get(key, 0) + count
+        for key, histogram in snapshot["histograms"].items():
+            if key in histograms:
+                histograms[key] = [
+                    total + value for total, value in zip(histograms[key], histogram)
+                ]
+            else:
+                histograms[key] = list(histogram)
+    return requests, histograms
+
+
+def check_metrics_cache(app_configs, **kwargs):
+    """Deployment check that the processes publish to a shared cache"""
+    if isinstance(caches["default"], LocMemCache):
+        return [
+            checks.Warning(
+                "Request metrics are published to LocMemCache, so /metrics only "
+                "shows the process that serves it.",
+                hint="Set REDIS_URL to share the metrics of all processes.",
+                id="airport.W001",
+            )
+        ]
+    return []
+
+
+def _labels(**labels):
+    return ",".join(
+        '{}="{}"'.format(
+            name,
+            str(value)
+            .replace("\\", "\\\\")
+            .replace('"', '\\"')
+            .replace("\n", "\\n"),
+        )
+        for name, value in labels.items()
+    )
+
+
+def render(requests, histograms):
+    lines = [
+        f"# HELP {REQUESTS_TOTAL} Requests by view, method and status code",
+        f"# TYPE {REQUESTS_TOTAL} counter",
+    ]
+    for (view, method, status), count in sorted(requests.items()):
+        labels = _labels(view=view, method=method, status=status)
+        lines.append(f"{REQUESTS_TOTAL}{{{labels}}} {count}")
+
+    for name, (description, buckets) in HISTOGRAMS.items():
+        lines += [f"# HELP {name} {description}", f"# TYPE {name} histogram"]
+        for (histogram_name, view), histogram in sorted(histograms.items()):
+            if histogram_name != name:
+                continue
+            cumulative = 0
+            for bound, count in zip(buckets + ("+Inf",), histogram):
+                cumulative += count
+                labels = _labels(view=view, le=bound)
+                lines.append(f"{name}_bucket{{{labels}}} {cumulative}")
+            labels = _labels(view=view)
+            lines.append(f"{name}_sum{{{labels}}} {histogram[-2]}")
+            lines.append(f"{name}_count{{{labels}}} {histogram[-1]}")
+    return "\n".join(lines) + "\n"
+
+
+def _is_staff(request):
+    """Whether the session or the API credentials are of a staff user"""
+    users = [getattr(request, "user", None)]
+    for authentication_class in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+        try:
+            user_auth_tuple = authentication_class().authenticate(request)
+        except exceptions.AuthenticationFailed:
+            user_auth_tuple = None
+        if user_auth_tuple is not None:
+            users.append(user_auth_tuple[0])
+    return any(user and user.is_active and user.is_staff for user in users)
+
+
+def metrics_view(request):
+    """
+    Metrics of all processes in the Prometheus text format, for staff users
+    and for METRICS_TOKEN sent as a bearer token. Only with DEBUG and no
+    token set are they open to everyone.
+    """
+    token = settings.METRICS_TOKEN
+    if token:
+        allowed = constant_time_compare(
+            request.headers.get("Authorization", ""), f"Bearer {token}"
+        )
+    else:
+        allowed = settings.DEBUG
+    if not allowed and not _is_staff(request):
+        return HttpResponse(
+            "Metrics require METRICS_TOKEN or a staff user.", status=401
+        )
+    return HttpResponse(render(*collect()), content_type=CONTENT_TYPE)
+
+
+def view_label(view_func, method):
+    """Viewset and action (FlightViewSet.list) or the name of a plain view"""
+    view_class = getattr(view_func, "cls", None)
+    if view_class is None:
+        return f"{view_func.__module__}.{view_func.__qualname__}"
+    actions = getattr(view_func, "actions", None) or {}
+    return f"{view_class.__name__}.{actions.get(method.lower(), method.lower())}"
+
+
+def _record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    return metrics(execute, sql, params, many, context)
+
+
+def _install_execute_wrapper(sender, connection, **kwargs):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+def instrument_connections():
+    """Record the queries of every database connection for MetricsMiddleware."""
+    connection_created.connect(
+        _install_execute_wrapper, dispatch_uid="airport_request_metrics"
+    )
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+            # Not run in a thread by the async handler, as sync ones would be
+            self.process_view = self.aprocess_view
+            self.process_template_response = self.aprocess_template_response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        context_token = _current.set(metrics)
+        started_at = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(context_token)
+        return self._observe(request, response, metrics, started_at)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        context_token = _current.set(metrics)
+        started_at = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(context_token)
+        return self._observe(request, response, metrics, started_at)
+
+    def _observe(self, request, response, metrics, started_at):
+        view = getattr(request, "metrics_view", "unresolved")
+        if view is None:
+            return response
+        values = {
+            "airport_request_duration_seconds": time.perf_counter() - started_at,
+            "airport_db_queries": metrics.queries,
+            "airport_db_duration_seconds": metrics.db_time,
+            "airport_render_duration_seconds": metrics.render_time,
+        }
+        if not response.streaming:
+            values["airport_response_size_bytes"] = len(response.content)
+        _process.observe(view, request.method, response.status_code, values)
+        flush()
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # The metrics endpoint itself is not recorded
+        request.metrics_view = (
+            None
+            if view_func is metrics_view
+            else view_label(view_func, request.method)
+        )
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        MetricsMiddleware.process_view(
+            self, request, view_func, view_args, view_kwargs
+        )
+
+    def process_template_response(self, request, response):
+        # Called right before the response, e.g. a DRF Response, is rendered
+        metrics = _current.get()
+        if metrics is not None:
+            started_at = time.perf_counter()
+
+            def rendered(response):
+                metrics.render_time += time.perf_counter() - started_at
+
+            response.add_post_render_callback(rendered)
+        return response
+
+    async def aprocess_template_response(self, request, response):
+        return MetricsMiddleware.process_template_response(self, request, response)
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.1 on 2026-10-18 05:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("airport", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="flight",
+            name="seat_map",
+            field=models.BinaryField(default=b""),
+        ),
+    ]
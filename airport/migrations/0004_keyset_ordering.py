@@ -0,0 +1,34 @@
+# Generated by Django 5.0.1 on 2026-10-18 05:52
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("airport", "0003_flight_tickets_sold"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="flight",
+            options={"ordering": ["-departure_time", "-id"]},
+        ),
+        migrations.AlterModelOptions(
+            name="order",
+            options={"ordering": ["-created_at", "-id"]},
+        ),
+        migrations.AddIndex(
+            model_name="flight",
+            index=models.Index(
+                fields=["-departure_time", "-id"], name="flight_departure_keyset_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(
+                fields=["user", "-created_at", "-id"], name="order_user_keyset_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,44 @@
+from django.db import migrations
+
+TRIGRAM_INDEXES = {
+    "airport_name_trgm_idx": "name",
+    "airport_city_trgm_idx": "closest_big_city",
+}
+
+
+def create_trigram_indexes(apps, schema_editor):
+    # icontains compiles to UPPER(column::text) LIKE UPPER(%term%) on PostgreSQL,
+    # so the trigram indexes are built on the same expression.
+    # SQLite, and PostgreSQL builds without the contrib modules, keep
+    # scanning the airports table.
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'"
+        )
+        if cursor.fetchone() is None:
+            return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for index_name, column in TRIGRAM_INDEXES.items():
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {index_name} ON airport_airport "
+            f'USING gin (UPPER("{column}"::text) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for index_name in TRIGRAM_INDEXES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {index_name}")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("airport", "0004_keyset_ordering"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.0.1 on 2026-10-18 06:37
+
+import django.db.models.functions.comparison
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("airport", "0007_seathold"),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name="route",
+            name="unique_source_destination",
+        ),
+        migrations.AddConstraint(
+            model_name="route",
+            constraint=models.UniqueConstraint(
+                django.db.models.functions.comparison.Least("source", "destination"),
+                django.db.models.functions.comparison.Greatest("source", "destination"),
+                name="unique_route_airports",
+                violation_error_message="Route with the same source and destination already exists.",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="route",
+            constraint=models.CheckConstraint(
+                check=models.Q(("source", models.F("destination")), _negated=True),
+                name="route_distinct_airports",
+                violation_error_message="Source and destination airports must be different.",
+            ),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.0.1 on 2026-10-18 06:40
+
+import django.db.models.expressions
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("airport", "0008_route_airport_pair_constraints"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="airplane",
+            name="capacity",
+            field=models.GeneratedField(
+                db_persist=True,
+                expression=django.db.models.expressions.CombinedExpression(
+                    models.F("rows"), "*", models.F("seats_in_row")
+                ),
+                output_field=models.IntegerField(),
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="airplane",
+            index=models.Index(fields=["capacity"], name="airplane_capacity_idx"),
+        ),
+    ]
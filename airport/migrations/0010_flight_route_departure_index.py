@@ -0,0 +1,29 @@
+# Generated by Django 5.0.1 on 2026-10-18 06:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("airport", "0009_airplane_capacity"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="flight",
+            index=models.Index(
+                fields=["route", "departure_time"], name="flight_route_departure_idx"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="flight",
+            name="route",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="flights",
+                to="airport.route",
+            ),
+        ),
+    ]
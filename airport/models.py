@@ -1,10 +1,17 @@
+from collections import Counter
+
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models.functions import Coalesce, Greatest, Least
+from django.utils import timezone
 from rest_framework.exceptions import ValidationError
 
+from airport.seat_map import SeatMap
+
 
 class AirplaneType(models.Model):
     name = models.CharField(max_length=255)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self) -> str:
         return self.name
@@ -15,14 +22,33 @@ class Airplane(models.Model):
     rows = models.IntegerField()
     seats_in_row = models.IntegerField()
     airplane_type = models.ForeignKey(AirplaneType, on_delete=models.CASCADE, related_name="airplanes")
+    capacity = models.GeneratedField(
+        expression=models.F("rows") * models.F("seats_in_row"),
+        output_field=models.IntegerField(),
+        db_persist=True,
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["capacity"], name="airplane_capacity_idx")]
+
+    def save(
+        self,
+        force_insert=False,
+        force_update=False,
+        using=None,
+        update_fields=None,
+    ):
+        adding = self._state.adding
+        super(Airplane, self).save(force_insert, force_update, using, update_fields)
+        if not adding:
+            # Updates don't return the capacity computed by the database, so
+            # it is loaded again when it is read
+            self.__dict__.pop("capacity", None)
 
     def __str__(self) -> str:
         return self.name
 
-    @property
-    def capacity(self):
-        return self.rows * self.seats_in_row
-
 
 class Order(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
@@ -32,7 +58,12 @@ class Order(models.Model):
         return str(self.created_at)
 
     class Meta:
-        ordering = ["-created_at"]
+        ordering = ["-created_at", "-id"]
+        indexes = [
+            models.Index(
+                fields=["user", "-created_at", "-id"], name="order_user_keyset_idx"
+            )
+        ]
 
 
 class Ticket(models.Model):
@@ -76,9 +107,26 @@ class Ticket(models.Model):
         update_fields=None,
     ):
         self.full_clean()
-        return super(Ticket, self).save(
-            force_insert, force_update, using, update_fields
-        )
+        with transaction.atomic():
+            saved = None
+            if not self._state.adding:
+                saved = (
+                    Ticket.objects.filter(pk=self.pk)
+                    .values_list("flight_id", "row", "seat")
+                    .first()
+                )
+            # The flight the ticket leaves, whose cache is invalidated as well
+            self._saved_flight_id = saved[0] if saved else None
+            super(Ticket, self).save(force_insert, force_update, using, update_fields)
+            if saved == (self.flight_id, self.row, self.seat):
+                return
+            changes = [((self.flight_id, self.row, self.seat), True)]
+            if saved is not None:
+                changes.append((saved, False))
+            # Flights are locked in the order of their ids, as orders do
+            for (flight_id, row, seat), take in sorted(changes):
+                flight = self.flight if take else Flight(pk=flight_id)
+                flight._change_seats([(row, seat)], take)
 
     def __str__(self):
         return f"{str(self.flight)} (row: {self.row}, seat: {self.seat})"
@@ -91,11 +139,16 @@ class Ticket(models.Model):
 class Airport(models.Model):
     name = models.CharField(max_length=255)
     closest_big_city = models.CharField(max_length=255)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self) -> str:
         return self.name
 
 
+ROUTE_EXISTS_ERROR = "Route with the same source and destination already exists."
+ROUTE_SAME_AIRPORTS_ERROR = "Source and destination airports must be different."
+
+
 class Route(models.Model):
     source = models.ForeignKey(
         Airport, on_delete=models.CASCADE, related_name="source_routes"
@@ -104,37 +157,81 @@ class Route(models.Model):
         Airport, on_delete=models.CASCADE, related_name="destination_routes"
     )
     distance = models.IntegerField()
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         constraints = [
             models.UniqueConstraint(
-                fields=["source", "destination"], name="unique_source_destination"
-            )
+                Least("source", "destination"),
+                Greatest("source", "destination"),
+                name="unique_route_airports",
+                violation_error_message=ROUTE_EXISTS_ERROR,
+            ),
+            models.CheckConstraint(
+                check=~models.Q(source=models.F("destination")),
+                name="route_distinct_airports",
+                violation_error_message=ROUTE_SAME_AIRPORTS_ERROR,
+            ),
         ]
 
     @staticmethod
-    def validate_route(source, destination, distance):
-        existing_routes = Route.objects.filter(
-            models.Q(source=source, destination=destination)
-            | models.Q(source=destination, destination=source)
-        ).select_related("source", "destination")
-
-        if existing_routes.exists():
-            raise ValidationError(
-                "Route with the same source and destination already exists."
-            )
+    def airport_pair(source_id, destination_id):
+        return min(source_id, destination_id), max(source_id, destination_id)
+
+    @staticmethod
+    def with_airport_pair(queryset):
+        return queryset.annotate(
+            first_airport=Least("source", "destination"),
+            second_airport=Greatest("source", "destination"),
+        )
 
-        if source == destination:
-            raise ValidationError("Source and destination airports must be different.")
+    @staticmethod
+    def validate_route(source_id, destination_id, route_id=None):
+        if source_id == destination_id:
+            raise ValidationError(ROUTE_SAME_AIRPORTS_ERROR)
+
+        first_airport, second_airport = Route.airport_pair(source_id, destination_id)
+        if (
+            Route.with_airport_pair(Route.objects.exclude(pk=route_id))
+            .filter(first_airport=first_airport, second_airport=second_airport)
+            .exists()
+        ):
+            raise ValidationError(ROUTE_EXISTS_ERROR)
 
-        reverse_route = existing_routes.first()
-        if reverse_route and reverse_route.distance != distance:
-            raise ValidationError(
-                "Reverse route has different distance. Please, provide correct distance."
-            )
+    @staticmethod
+    def validate_routes(routes):
+        """
+        Validate unsaved routes for bulk_create with a single query. Errors
+        are reported by position in routes, for routes between the same
+        airport, routes that already exist and repeated routes.
+        """
+        errors = {}
+        pairs = {}
+        for index, route in enumerate(routes):
+            pair = Route.airport_pair(route.source_id, route.destination_id)
+            if route.source_id == route.destination_id:
+                errors[index] = [ROUTE_SAME_AIRPORTS_ERROR]
+            elif pair in pairs:
+                errors[index] = [ROUTE_EXISTS_ERROR]
+            else:
+                pairs[pair] = index
+
+        if pairs:
+            airport_ids = {airport_id for pair in pairs for airport_id in pair}
+            existing = Route.with_airport_pair(
+                Route.objects.filter(
+                    source__in=airport_ids, destination__in=airport_ids
+                )
+            ).values_list("first_airport", "second_airport")
+            for pair in existing:
+                if pair in pairs:
+                    errors[pairs[pair]] = [ROUTE_EXISTS_ERROR]
+
+        if errors:
+            raise ValidationError(dict(sorted(errors.items())))
 
     def clean(self):
-        Route.validate_route(self.source, self.destination, self.distance)
+        Route.validate_route(self.source_id, self.destination_id, self.pk)
 
     def save(
         self,
@@ -143,8 +240,20 @@ class Route(models.Model):
         using=None,
         update_fields=None,
     ):
-        self.full_clean()
-        return super(Route, self).save(force_insert, force_update, using, update_fields)
+        # The airports are checked by the foreign keys, their pair by clean()
+        self.full_clean(
+            exclude=["source", "destination"], validate_constraints=False
+        )
+        try:
+            with transaction.atomic():
+                return super(Route, self).save(
+                    force_insert, force_update, using, update_fields
+                )
+        except IntegrityError as error:
+            # The same route was created concurrently, after clean() checked
+            if "unique_route_airports" not in str(error):
+                raise
+            raise ValidationError(ROUTE_EXISTS_ERROR) from error
 
     def __str__(self) -> str:
         return f"From: {self.source} - to: {self.destination}"
@@ -153,6 +262,7 @@ class Route(models.Model):
 class Crew(models.Model):
     first_name = models.CharField(max_length=255)
     last_name = models.CharField(max_length=255)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ("first_name", "last_name")
@@ -161,14 +271,156 @@ class Crew(models.Model):
         return f"{self.first_name} {self.last_name}"
 
 
+def ticket_seat_maps(flights):
+    """
+    Seat maps built from the tickets of flights loaded with their airplane,
+    with the number of tickets, by flight id. Tickets for seats that are
+    not on the map are counted only.
+    """
+    seat_maps = {
+        flight.pk: SeatMap(flight.airplane.rows, flight.airplane.seats_in_row)
+        for flight in flights
+    }
+    tickets = Counter()
+    for flight_id, row, seat in Ticket.objects.filter(
+        flight__in=flights
+    ).values_list("flight_id", "row", "seat"):
+        seat_map = seat_maps[flight_id]
+        if row <= seat_map.rows and seat <= seat_map.seats_in_row:
+            seat_map.take(row, seat)
+        tickets[flight_id] += 1
+    return {
+        flight_id: (seat_map, tickets[flight_id])
+        for flight_id, seat_map in seat_maps.items()
+    }
+
+
+class FlightQuerySet(models.QuerySet):
+    def with_seats_held(self):
+        seats_held = (
+            SeatHold.objects.active()
+            .filter(flight=models.OuterRef("pk"))
+            .order_by()
+            .values("flight")
+            .annotate(count=models.Count("id"))
+            .values("count")
+        )
+        return self.annotate(
+            seats_held=Coalesce(models.Subquery(seats_held), 0)
+        )
+
+    def rebuild_seat_maps(self):
+        """
+        Rebuild the seat maps of these flights from their tickets, under a
+        row lock on each flight, and return the number of flights.
+        """
+        with transaction.atomic():
+            flights = list(
+                self.select_for_update(of=("self",)).select_related("airplane")
+            )
+            seat_maps = ticket_seat_maps(flights)
+            for flight in flights:
+                flight.seat_map = seat_maps[flight.pk][0].to_bytes()
+                flight.updated_at = timezone.now()
+            self.model.objects.bulk_update(flights, ["seat_map", "updated_at"])
+        return len(flights)
+
+
 class Flight(models.Model):
-    route = models.ForeignKey(Route, on_delete=models.CASCADE, related_name="flights")
+    # Indexed by flight_route_departure_idx
+    route = models.ForeignKey(
+        Route, on_delete=models.CASCADE, related_name="flights", db_index=False
+    )
     airplane = models.ForeignKey(
         Airplane, on_delete=models.CASCADE, related_name="flights"
     )
     crew = models.ManyToManyField(Crew, related_name="flights")
     departure_time = models.DateTimeField()
     arrival_time = models.DateTimeField()
+    seat_map = models.BinaryField(default=b"", editable=False)
+    tickets_sold = models.PositiveIntegerField(default=0, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = FlightQuerySet.as_manager()
 
     class Meta:
-        ordering = ["-departure_time"]
+        ordering = ["-departure_time", "-id"]
+        indexes = [
+            models.Index(
+                fields=["-departure_time", "-id"], name="flight_departure_keyset_idx"
+            ),
+            models.Index(
+                fields=["route", "departure_time"], name="flight_route_departure_idx"
+            ),
+        ]
+
+    @property
+    def tickets_available(self):
+        if not hasattr(self, "seats_held"):
+            self.seats_held = self.seat_holds.active().count()
+        return self.airplane.capacity - self.tickets_sold - self.seats_held
+
+    def _change_seats(self, seats, take):
+        with transaction.atomic():
+            flight = (
+                Flight.objects.select_for_update(of=("self",))
+                .select_related("airplane")
+                .filter(pk=self.pk)
+                .first()
+            )
+            if flight is None:
+                return
+            seat_map = SeatMap.for_flight(flight)
+            for row, seat in seats:
+                if take:
+                    seat_map.take(row, seat)
+                else:
+                    seat_map.release(row, seat)
+            flight.save_seat_map(seat_map, len(seats) if take else -len(seats))
+            self.seat_map = flight.seat_map
+            self.tickets_sold = flight.tickets_sold
+
+    def save_seat_map(self, seat_map, sold_change):
+        """Store a seat map changed under a row lock on this flight."""
+        self.seat_map = seat_map.to_bytes()
+        Flight.objects.filter(pk=self.pk).update(
+            seat_map=self.seat_map,
+            tickets_sold=models.F("tickets_sold") + sold_change,
+            updated_at=timezone.now(),
+        )
+        self.tickets_sold += sold_change
+
+    def take_seats(self, seats):
+        self._change_seats(seats, take=True)
+
+    def release_seats(self, seats):
+        self._change_seats(seats, take=False)
+
+
+class SeatHoldQuerySet(models.QuerySet):
+    def active(self):
+        return self.filter(expires_at__gt=timezone.now())
+
+    def expired(self):
+        return self.filter(expires_at__lte=timezone.now())
+
+
+class SeatHold(models.Model):
+    flight = models.ForeignKey(
+        Flight, on_delete=models.CASCADE, related_name="seat_holds"
+    )
+    user = models.ForeignKey(
+        get_user_model(), on_delete=models.CASCADE, related_name="seat_holds"
+    )
+    row = models.IntegerField()
+    seat = models.IntegerField()
+    expires_at = models.DateTimeField(db_index=True)
+
+    objects = SeatHoldQuerySet.as_manager()
+
+    class Meta:
+        unique_together = ("flight", "row", "seat")
+        ordering = ["row", "seat"]
+
+    def __str__(self):
+        return f"{str(self.flight)} (row: {self.row}, seat: {self.seat}) held"
@@ -0,0 +1,145 @@
+from asgiref.sync import sync_to_async
+from rest_framework.pagination import CursorPagination, LimitOffsetPagination
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination keyed on the ordering of the queryset, by default the
+    ordering of the paginated model.
+    """
+
+    page_size_query_param = "limit"
+    max_page_size = 100
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.ordering = (
+            tuple(queryset.query.order_by)
+            or tuple(queryset.model._meta.ordering)
+            or ("-pk",)
+        )
+        return super().paginate_queryset(queryset, request, view)
+
+
+class AirportPagination(LimitOffsetPagination):
+    """
+    Limit/offset pagination with two opt-ins for clients walking long lists:
+    ?pagination=cursor switches to keyset pagination and ?count=false skips
+    the COUNT query.
+    """
+
+    pagination_query_param = "pagination"
+    count_query_param = "count"
+    keyset_pagination_class = KeysetPagination
+
+    def _use_keyset(self, request):
+        return (
+            request.query_params.get(self.pagination_query_param) == "cursor"
+            or KeysetPagination.cursor_query_param in request.query_params
+        )
+
+    def _use_count(self, request):
+        return request.query_params.get(self.count_query_param, "").lower() not in (
+            "false",
+            "0",
+        )
+
+    def _page_bounds(self, request):
+        """The slice after the page, to tell whether there is a next page"""
+        self.limit = self.get_limit(request)
+        if self.limit is None:
+            return None
+        self.offset = self.get_offset(request)
+        self.request = request
+        self.count = None
+        return slice(self.offset, self.offset + self.limit + 1)
+
+    def _page(self, results):
+        self.has_next = len(results) > self.limit
+        return results[: self.limit]
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset_paginator = None
+        if self._use_keyset(request):
+            self.keyset_paginator = self.keyset_pagination_class()
+            return self.keyset_paginator.paginate_queryset(queryset, request, view)
+
+        if self._use_count(request):
+            return super().paginate_queryset(queryset, request, view)
+
+        bounds = self._page_bounds(request)
+        if bounds is None:
+            return None
+        return self._page(list(queryset[bounds]))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """paginate_queryset() with the async ORM"""
+        self.keyset_paginator = None
+        if self._use_keyset(request):
+            # The cursor is decoded and encoded around the query in the
+            # paginator of DRF, so it runs whole in the thread of the request
+            self.keyset_paginator = self.keyset_pagination_class()
+            return await sync_to_async(self.keyset_paginator.paginate_queryset)(
+                queryset, request, view
+            )
+
+        if self._use_count(request):
+            # LimitOffsetPagination.paginate_queryset()
+            self.request = request
+            self.limit = self.get_limit(request)
+            if self.limit is None:
+                return None
+            self.count = await queryset.acount()
+            self.offset = self.get_offset(request)
+            if self.count > self.limit and self.template is not None:
+                self.display_page_controls = True
+            if self.count == 0 or self.offset > self.count:
+                return []
+            queryset = queryset[self.offset : self.offset + self.limit]
+            return [instance async for instance in queryset]
+
+        bounds = self._page_bounds(request)
+        if bounds is None:
+            return None
+        return self._page([instance async for instance in queryset[bounds]])
+
+    def get_next_link(self):
+        if self.count is not None:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.limit_query_param, self.limit)
+        return replace_query_param(
+            url, self.offset_query_param, self.offset + self.limit
+        )
+
+    def get_paginated_response(self, data):
+        if self.keyset_paginator is not None:
+            return self.keyset_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def get_schema_operation_parameters(self, view):
+        return super().get_schema_operation_parameters(view) + [
+            {
+                "name": self.pagination_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Set to 'cursor' to use keyset pagination.",
+                "schema": {"type": "string", "enum": ["cursor"]},
+            },
+            {
+                "name": KeysetPagination.cursor_query_param,
+                "required": False,
+                "in": "query",
+                "description": KeysetPagination.cursor_query_description,
+                "schema": {"type": "string"},
+            },
+            {
+                "name": self.count_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Set to 'false' to skip counting the results.",
+                "schema": {"type": "boolean"},
+            },
+        ]
@@ -0,0 +1,163 @@
+"""
+Opt-in detector of N+1 and slow queries, for tests and staging.
+
+With QUERY_INSPECTOR_MODE set to "log" or "raise", QueryInspectorMiddleware
+groups the SQL of every request by template (the statement with its
+parameters left out) and reports templates executed at least
+QUERY_INSPECTOR_REPEAT times and queries slower than
+QUERY_INSPECTOR_SLOW_MS. Each query is attributed to the serializer field
+being rendered when it ran, e.g. FlightListSerializer.crew, or to the view
+otherwise. "log" writes a warning to the airport.query_inspector logger,
+"raise" raises QueryProblems, which fails the test requesting the view.
+"""
+import contextvars
+import logging
+import re
+import time
+from collections import defaultdict
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from rest_framework import serializers
+
+logger = logging.getLogger(__name__)
+
+MODES = ("log", "raise")
+VIEW = "view"
+TRANSACTION_STATEMENTS = ("SAVEPOINT", "RELEASE SAVEPOINT", "ROLLBACK", "BEGIN")
+
+_IN_LIST = re.compile(r"\((?:%s, )+%s\)")
+_WHITESPACE = re.compile(r"\s+")
+
+_current = contextvars.ContextVar("airport_query_inspector", default=None)
+
+
+class QueryProblems(AssertionError):
+    """Repeated or slow queries found by the query inspector."""
+
+    def __init__(self, label, problems):
+        self.problems = problems
+        super().__init__(
+            f"{label}: {len(problems)} query problem(s)\n" + "\n".join(problems)
+        )
+
+
+def query_template(sql):
+    """The statement with IN lists of any length collapsed"""
+    return _IN_LIST.sub("(%s, ...)", _WHITESPACE.sub(" ", sql).strip())
+
+
+class QueryInspector:
+    """
+    Records the queries run on every connection in its block, with the
+    serializer field that triggered them.
+    """
+
+    def __init__(self, repeat=None, slow_ms=None):
+        if repeat is None:
+            repeat = settings.QUERY_INSPECTOR_REPEAT
+        if slow_ms is None:
+            slow_ms = settings.QUERY_INSPECTOR_SLOW_MS
+        self.repeat = repeat
+        self.slow_ms = slow_ms
+        self.field = None
+        self.queries = []
+        self._stack = None
+        self._token = None
+
+    def __enter__(self):
+        instrument_serializers()
+        self._token = _current.set(self)
+        self._stack = ExitStack()
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+        _current.reset(self._token)
+
+    def __call__(self, execute, sql, params, many, context):
+        started_at = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration_ms = (time.perf_counter() - started_at) * 1000
+            if not sql.lstrip().upper().startswith(TRANSACTION_STATEMENTS):
+                self.queries.append(
+                    (query_template(sql), self.field or VIEW, duration_ms)
+                )
+
+    def problems(self):
+        """Descriptions of the repeated and the slow queries"""
+        repeated = defaultdict(list)
+        for template, field, _ in self.queries:
+            repeated[template].append(field)
+
+        problems = []
+        for template, fields in repeated.items():
+            if len(fields) >= self.repeat:
+                sources = ", ".join(sorted(set(fields)))
+                problems.append(
+                    f"N+1: {len(fields)} queries from {sources}: {template}"
+                )
+        for template, field, duration_ms in self.queries:
+            if duration_ms >= self.slow_ms:
+                problems.append(
+                    f"Slow: {duration_ms:.1f} ms from {field}: {template}"
+                )
+        return problems
+
+    def report(self, label, mode):
+        problems = self.problems()
+        if not problems:
+            return
+        if mode == "raise":
+            raise QueryProblems(label, problems)
+        logger.warning(
+            "%s: %d query problem(s)\n%s", label, len(problems), "\n".join(problems)
+        )
+
+
+def _attributed_fields(readable_fields):
+    def fields(serializer):
+        inspector = _current.get()
+        if inspector is None:
+            yield from readable_fields.fget(serializer)
+            return
+        name = type(serializer).__name__
+        for field in readable_fields.fget(serializer):
+            previous, inspector.field = inspector.field, f"{name}.{field.field_name}"
+            try:
+                yield field
+            finally:
+                inspector.field = previous
+
+    fields.instrumented = True
+    return property(fields)
+
+
+def instrument_serializers():
+    """Attribute queries to the serializer field being rendered."""
+    fget = serializers.Serializer._readable_fields.fget
+    if not getattr(fget, "instrumented", False):
+        serializers.Serializer._readable_fields = _attributed_fields(
+            serializers.Serializer._readable_fields
+        )
+
+
+class QueryInspectorMiddleware:
+    def __init__(self, get_response):
+        if settings.QUERY_INSPECTOR_MODE not in MODES:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with QueryInspector() as inspector:
+            response = self.get_response(request)
+        inspector.report(
+            f"{request.method} {request.path}", settings.QUERY_INSPECTOR_MODE
+        )
+        return response
@@ -0,0 +1,197 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException, ErrorDetail, ValidationError
+
+from airport.cache import invalidate_flights
+from airport.models import Flight, SeatHold, Ticket
+from airport.seat_map import SeatMap
+
+
+class SeatsUnavailable(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "Some of the requested seats are already taken."
+    default_code = "seats_unavailable"
+
+    def __init__(self, taken_seats):
+        super().__init__()
+        self.detail = {
+            "detail": ErrorDetail(self.default_detail, self.default_code),
+            "taken_seats": [
+                {"flight": flight_id, "row": row, "seat": seat}
+                for flight_id, row, seat in sorted(taken_seats)
+            ],
+        }
+
+
+class SeatHoldLimitExceeded(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_code = "seat_hold_limit"
+
+    def __init__(self, limit):
+        super().__init__(f"At most {limit} seats can be held on a flight at a time.")
+
+
+def _lock_flights(flight_ids):
+    return (
+        Flight.objects.select_for_update(of=("self",))
+        .select_related("airplane")
+        .filter(pk__in=flight_ids)
+        .order_by("pk")
+    )
+
+
+def _validate_seats(flight, seats):
+    requested_seats = set()
+    for row, seat in seats:
+        Ticket.validate_ticket(row, seat, flight.airplane, ValidationError)
+        if (row, seat) in requested_seats:
+            raise ValidationError(
+                "Ticket with this Flight, Row and Seat already exists."
+            )
+        requested_seats.add((row, seat))
+
+
+def _seat_holds(seats_by_flight):
+    """Holds (expired or not) on the requested seats, in one query."""
+    requested_seats = {
+        (flight_id, row, seat)
+        for flight_id, seats in seats_by_flight.items()
+        for row, seat in seats
+    }
+    holds = SeatHold.objects.filter(
+        flight_id__in=seats_by_flight,
+        row__in={row for _, row, _ in requested_seats},
+        seat__in={seat for _, _, seat in requested_seats},
+    )
+    return [
+        hold
+        for hold in holds
+        if (hold.flight_id, hold.row, hold.seat) in requested_seats
+    ]
+
+
+def _held_by_others(holds, user):
+    now = timezone.now()
+    return [
+        (hold.flight_id, hold.row, hold.seat)
+        for hold in holds
+        if hold.user_id != user.pk and hold.expires_at > now
+    ]
+
+
+def reserve_seats(order, tickets_data):
+    """
+    Create the tickets of an order. The flights are locked in id order, so
+    concurrent orders for the same flight queue up instead of racing to the
+    unique constraint, and seats are checked against the locked seat maps
+    and the holds of other users. The buyer's own holds on the seats are
+    consumed. Unavailable seats are reported with SeatsUnavailable (409).
+    """
+    seats_by_flight = defaultdict(list)
+    for ticket_data in tickets_data:
+        seats_by_flight[ticket_data["flight"].pk].append(
+            (ticket_data["row"], ticket_data["seat"])
+        )
+
+    with transaction.atomic():
+        seat_maps = {}
+        taken_seats = []
+        for flight in _lock_flights(seats_by_flight):
+            _validate_seats(flight, seats_by_flight[flight.pk])
+            seat_map = SeatMap.for_flight(flight)
+            for row, seat in seats_by_flight[flight.pk]:
+                if seat_map.is_taken(row, seat):
+                    taken_seats.append((flight.pk, row, seat))
+                seat_map.take(row, seat)
+            seat_maps[flight] = seat_map
+
+        holds = _seat_holds(seats_by_flight)
+        taken_seats += _held_by_others(holds, order.user)
+        if taken_seats:
+            raise SeatsUnavailable(taken_seats)
+
+        tickets = [Ticket(order=order, **ticket_data) for ticket_data in tickets_data]
+        try:
+            with transaction.atomic():
+                Ticket.objects.bulk_create(tickets)
+        except IntegrityError:
+            # The seat map drifted from the tickets table; report what is
+            # actually sold according to the unique constraint.
+            requested_seats = {
+                (ticket.flight_id, ticket.row, ticket.seat) for ticket in tickets
+            }
+            sold_seats = Ticket.objects.filter(
+                flight_id__in=seats_by_flight,
+                row__in={ticket.row for ticket in tickets},
+                seat__in={ticket.seat for ticket in tickets},
+            ).values_list("flight_id", "row", "seat")
+            raise SeatsUnavailable(requested_seats.intersection(sold_seats))
+
+        if holds:
+            SeatHold.objects.filter(pk__in=[hold.pk for hold in holds]).delete()
+        for flight, seat_map in seat_maps.items():
+            flight.save_seat_map(seat_map, len(seats_by_flight[flight.pk]))
+        invalidate_flights(seats_by_flight)
+        return tickets
+
+
+def hold_seats(flight, user, seats, ttl):
+    """
+    Hold free seats of a flight for ``ttl`` seconds. Holding a seat the user
+    already holds extends the hold; seats that are sold or held by another
+    user are reported with SeatsUnavailable (409). A user holds at most
+    SEAT_HOLD_MAX_SEATS seats of a flight, SeatHoldLimitExceeded (409).
+    """
+    with transaction.atomic():
+        flight = _lock_flights([flight.pk]).get()
+        _validate_seats(flight, seats)
+        seat_map = SeatMap.for_flight(flight)
+        taken_seats = [
+            (flight.pk, row, seat)
+            for row, seat in seats
+            if seat_map.is_taken(row, seat)
+        ]
+
+        holds = _seat_holds({flight.pk: seats})
+        taken_seats += _held_by_others(holds, user)
+        if taken_seats:
+            raise SeatsUnavailable(taken_seats)
+
+        other_holds = (
+            SeatHold.objects.filter(
+                flight=flight, user=user, expires_at__gt=timezone.now()
+            )
+            .exclude(pk__in=[hold.pk for hold in holds])
+            .count()
+        )
+        if other_holds + len(seats) > settings.SEAT_HOLD_MAX_SEATS:
+            raise SeatHoldLimitExceeded(settings.SEAT_HOLD_MAX_SEATS)
+
+        if holds:
+            SeatHold.objects.filter(pk__in=[hold.pk for hold in holds]).delete()
+        expires_at = timezone.now() + timezone.timedelta(seconds=ttl)
+        new_holds = SeatHold.objects.bulk_create(
+            SeatHold(
+                flight=flight, user=user, row=row, seat=seat, expires_at=expires_at
+            )
+            for row, seat in seats
+        )
+        Flight.objects.filter(pk=flight.pk).update(updated_at=timezone.now())
+        invalidate_flights([flight.pk])
+        return new_holds
+
+
+def release_holds(flight, user, seats=None):
+    holds = SeatHold.objects.filter(flight=flight, user=user)
+    if seats:
+        seats = set(seats)
+        holds = holds.filter(
+            pk__in=[hold.pk for hold in holds if (hold.row, hold.seat) in seats]
+        )
+    holds.delete()
+    Flight.objects.filter(pk=flight.pk).update(updated_at=timezone.now())
+    invalidate_flights([flight.pk])
@@ -0,0 +1,128 @@
+"""
+Shortest routes between airports, kept up to date with the route changes.
+The graph of the routes is shared through the cache, with the shortest
+paths from each searched airport for the version of the graph they were
+computed on. airport.routing_table is imported on the first build only:
+numpy and scipy take longer to load than the rest of the service.
+"""
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+
+from airport.cache import ChangeLog
+from airport.models import Route
+
+ROUTING_TABLE_KEY = "airport:routing:table"
+ROUTE_CHANGES = ChangeLog("routes", timeout=settings.ROUTING_CHANGES_TIMEOUT)
+# Airports whose shortest paths a process keeps in memory
+PROCESS_PATHS = 1024
+
+
+def build_routing_table():
+    from airport.routing_table import RoutingTable
+
+    return RoutingTable.build(
+        Route.objects.values_list("source_id", "destination_id", "distance")
+        .order_by()
+        .iterator(chunk_size=10000)
+    )
+
+
+class _TableState:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.table = None
+        self.epoch = None
+        self.version = 0
+        self.paths = {}
+
+
+_state = _TableState()
+
+
+def _apply(table, changes):
+    for change, source_id, destination_id, distance in changes:
+        if change == "add":
+            table.add_route(source_id, destination_id, distance)
+        elif not table.remove_route(source_id, destination_id, distance):
+            return False
+    return True
+
+
+def _refresh_table():
+    """
+    Bring the table of this process up to date with the routes. The table
+    is persisted in the cache; the newest of the stored and the in-memory
+    table is updated with the logged route changes, or rebuilt when they
+    are gone or do not apply.
+    """
+    epoch, version = ROUTE_CHANGES.state()
+    if _state.table is not None and (_state.epoch, _state.version) == (
+        epoch,
+        version,
+    ):
+        return
+
+    table = None
+    applied = 0
+    stored = cache.get(ROUTING_TABLE_KEY)
+    for candidate in (stored, (_state.table, _state.epoch, _state.version)):
+        if candidate and candidate[0] is not None and candidate[1] == epoch:
+            if applied <= candidate[2] <= version:
+                table, applied = candidate[0], candidate[2]
+
+    changes = ROUTE_CHANGES.changes(applied, version) if table is not None else None
+    if changes is None or not _apply(table, changes):
+        table = build_routing_table()
+
+    cache.set(ROUTING_TABLE_KEY, (table, epoch, version), timeout=None)
+    _state.table, _state.epoch, _state.version = table, epoch, version
+    _state.paths = {}
+
+
+def _paths_from(source_id):
+    """Shortest paths from an airport, on the table of this process"""
+    paths = _state.paths.get(source_id)
+    if paths is not None:
+        return paths
+    key = f"{ROUTING_TABLE_KEY}:{_state.epoch}:{_state.version}:{source_id}"
+    paths = cache.get(key)
+    if paths is None:
+        paths = _state.table.paths_from(source_id)
+        if paths is None:
+            return None
+        cache.set(key, paths, timeout=settings.ROUTING_CHANGES_TIMEOUT)
+    if len(_state.paths) >= PROCESS_PATHS:
+        del _state.paths[next(iter(_state.paths))]
+    _state.paths[source_id] = paths
+    return paths
+
+
+def shortest_route(source_id, destination_id):
+    """(airport ids, distance) of the shortest path, None if unreachable"""
+    with _state.lock:
+        _refresh_table()
+        if source_id == destination_id:
+            return [source_id], 0
+        paths = _paths_from(source_id)
+        if paths is None:
+            return None
+        return _state.table.shortest_path(source_id, destination_id, paths)
+
+
+def route_added(route):
+    ROUTE_CHANGES.record(
+        ("add", route.source_id, route.destination_id, route.distance)
+    )
+
+
+def route_removed(route):
+    ROUTE_CHANGES.record(
+        ("remove", route.source_id, route.destination_id, route.distance)
+    )
+
+
+def routes_changed():
+    """Rebuild the routing tables, after bulk changes or a route update"""
+    ROUTE_CHANGES.record()
@@ -0,0 +1,114 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+
+NO_PATH = -9999
+
+
+def _pair(source_id, destination_id):
+    return min(source_id, destination_id), max(source_id, destination_id)
+
+
+class RoutingTable:
+    """
+    The routes, which are flown in both directions, as a sparse graph over
+    airport_ids. Shortest paths are computed from one airport at a time
+    with Dijkstra, as distances and the airport before the last on each
+    shortest path, indexed as airport_ids.
+    """
+
+    def __init__(self, edges):
+        # Distances of the routes between each pair of airports, lower id
+        # first. Only the shortest one is an edge of the graph
+        self.edges = edges
+        self._graph = None
+
+    def __getstate__(self):
+        return {"edges": self.edges}
+
+    def __setstate__(self, state):
+        self.__init__(state["edges"])
+
+    @classmethod
+    def build(cls, routes):
+        """The graph of (source_id, destination_id, distance) routes"""
+        edges = {}
+        for source_id, destination_id, distance in routes:
+            edges.setdefault(_pair(source_id, destination_id), []).append(distance)
+        return cls(edges)
+
+    @classmethod
+    def empty(cls):
+        return cls({})
+
+    def add_route(self, source_id, destination_id, distance):
+        self.edges.setdefault(_pair(source_id, destination_id), []).append(distance)
+        self._graph = None
+
+    def remove_route(self, source_id, destination_id, distance):
+        """
+        Drop a route and return True. Return False, leaving the table as it
+        is, when the route is not in the table and it must be rebuilt.
+        """
+        pair = _pair(source_id, destination_id)
+        distances = self.edges.get(pair, [])
+        if distance not in distances:
+            return False
+        distances.remove(distance)
+        if not distances:
+            del self.edges[pair]
+        self._graph = None
+        return True
+
+    def graph(self):
+        """airport_ids, their index and the adjacency matrix"""
+        if self._graph is None:
+            pairs = np.array(list(self.edges), dtype=np.int64).reshape(-1, 2)
+            airport_ids, ends = np.unique(pairs, return_inverse=True)
+            ends = ends.reshape(-1, 2).astype(np.int32)
+            adjacency = csr_matrix(
+                (
+                    np.array([min(value) for value in self.edges.values()], float),
+                    (ends[:, 0], ends[:, 1]),
+                ),
+                shape=(len(airport_ids), len(airport_ids)),
+            )
+            airport_ids = airport_ids.tolist()
+            index = {airport_id: i for i, airport_id in enumerate(airport_ids)}
+            self._graph = airport_ids, index, adjacency
+        return self._graph
+
+    def paths_from(self, source_id):
+        """Distances and predecessors from an airport, None if it has no routes"""
+        _, index, adjacency = self.graph()
+        if source_id not in index:
+            return None
+        return dijkstra(
+            adjacency,
+            directed=False,
+            indices=index[source_id],
+            return_predecessors=True,
+        )
+
+    def shortest_path(self, source_id, destination_id, paths=None):
+        """
+        (airport ids, distance) of the shortest path, None if unreachable.
+        paths are those of paths_from(source_id), when already computed.
+        """
+        if source_id == destination_id:
+            return [source_id], 0
+        airport_ids, index, _ = self.graph()
+        if source_id not in index or destination_id not in index:
+            return None
+        if paths is None:
+            paths = self.paths_from(source_id)
+        distances, predecessors = paths
+        current = index[destination_id]
+        if np.isinf(distances[current]):
+            return None
+
+        path = [destination_id]
+        while predecessors[current] != NO_PATH:
+            current = int(predecessors[current])
+            path.append(airport_ids[current])
+        return path[::-1], int(distances[index[destination_id]])
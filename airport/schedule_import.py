@@ -0,0 +1,208 @@
+import codecs
+import csv
+import json
+import re
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.exceptions import ErrorDetail, ParseError, ValidationError
+from rest_framework.parsers import BaseParser
+from rest_framework.relations import PrimaryKeyRelatedField
+
+from airport.cache import invalidate_flights
+from airport.connections import schedule_changed
+from airport.models import Airplane, Crew, Flight, Route
+from airport.serializers import FlightImportSerializer, FlightSerializer
+
+CREW_SEPARATOR = re.compile(r"[\s,;]+")
+MAX_ERRORS = 100
+DOES_NOT_EXIST = PrimaryKeyRelatedField.default_error_messages["does_not_exist"]
+
+
+class InvalidSchedule(ValidationError):
+    default_detail = "Invalid rows, no flights were imported."
+    default_code = "invalid_schedule"
+
+    def __init__(self, errors):
+        super().__init__()
+        self.detail = {
+            "detail": ErrorDetail(self.default_detail, self.default_code),
+            "errors": errors,
+        }
+
+
+class _Lines:
+    """Iterator of decoded lines, counted in line_number"""
+
+    def __init__(self, lines):
+        self.lines = iter(lines)
+        self.line_number = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            line = next(self.lines)
+        except UnicodeDecodeError as error:
+            raise ParseError(
+                f"Line {self.line_number + 1}: {error.encoding} decode error - "
+                f"{error.reason}"
+            )
+        self.line_number += 1
+        return line
+
+
+def read_csv(lines):
+    """
+    (line number, row) pairs of a CSV schedule with a header row. Crew ids
+    in a cell are separated by spaces, commas or semicolons.
+    """
+    lines = _Lines(lines)
+    reader = csv.DictReader(lines)
+    while True:
+        try:
+            row = next(reader)
+        except StopIteration:
+            return
+        except csv.Error as error:
+            raise ParseError(f"Line {lines.line_number}: CSV parse error - {error}")
+        crew = (row.get("crew") or "").strip()
+        row["crew"] = CREW_SEPARATOR.split(crew) if crew else []
+        yield reader.line_num, row
+
+
+def read_json_lines(lines):
+    """(line number, row) pairs of a schedule with one JSON object per line"""
+    lines = _Lines(lines)
+    for line in lines:
+        line_number = lines.line_number
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except ValueError as error:
+            raise ParseError(f"Line {line_number}: JSON parse error - {error}")
+
+
+def _decode(stream, parser_context):
+    encoding = (parser_context or {}).get("encoding", settings.DEFAULT_CHARSET)
+    return codecs.iterdecode(stream, encoding)
+
+
+class FlightScheduleCSVParser(BaseParser):
+    """Parses the request body lazily, line by line, into schedule rows."""
+
+    media_type = "text/csv"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        return read_csv(_decode(stream, parser_context))
+
+
+class FlightScheduleJSONLinesParser(BaseParser):
+    """Parses the request body lazily, line by line, into schedule rows."""
+
+    media_type = "application/x-ndjson"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        return read_json_lines(_decode(stream, parser_context))
+
+
+def _existing_ids(model, ids):
+    return set(model.objects.filter(pk__in=ids).values_list("pk", flat=True))
+
+
+def _validate_batch(batch, errors):
+    """
+    Validate a batch of rows with one query per related model and the time
+    checks of FlightSerializer. The row serializer is shared by the batch to
+    skip copying its fields for every row. Invalid rows are appended to
+    errors.
+    """
+    row_serializer = FlightImportSerializer()
+    parsed = []
+    for line_number, row in batch:
+        try:
+            parsed.append((line_number, row_serializer.run_validation(row)))
+        except ValidationError as error:
+            errors.append({"line": line_number, "errors": error.detail})
+
+    existing_ids = {
+        "route": _existing_ids(Route, {data["route"] for _, data in parsed}),
+        "airplane": _existing_ids(Airplane, {data["airplane"] for _, data in parsed}),
+        "crew": _existing_ids(
+            Crew, {crew_id for _, data in parsed for crew_id in data["crew"]}
+        ),
+    }
+    now = timezone.now()
+    valid = []
+    for line_number, data in parsed:
+        row_errors = {}
+        for field, ids in (
+            ("route", [data["route"]]),
+            ("airplane", [data["airplane"]]),
+            ("crew", data["crew"]),
+        ):
+            missing = [pk for pk in ids if pk not in existing_ids[field]]
+            if missing:
+                row_errors[field] = [
+                    DOES_NOT_EXIST.format(pk_value=pk) for pk in missing
+                ]
+        try:
+            FlightSerializer.validate_times(
+                data["departure_time"], data["arrival_time"], now
+            )
+        except ValidationError as error:
+            row_errors["non_field_errors"] = error.detail
+
+        if row_errors:
+            errors.append({"line": line_number, "errors": row_errors})
+        else:
+            valid.append(data)
+    return valid
+
+
+def _create_flights(rows):
+    flights = Flight.objects.bulk_create(
+        Flight(
+            route_id=data["route"],
+            airplane_id=data["airplane"],
+            departure_time=data["departure_time"],
+            arrival_time=data["arrival_time"],
+        )
+        for data in rows
+    )
+    Flight.crew.through.objects.bulk_create(
+        Flight.crew.through(flight_id=flight.pk, crew_id=crew_id)
+        for flight, data in zip(flights, rows)
+        for crew_id in dict.fromkeys(data["crew"])
+    )
+    return len(flights)
+
+
+def import_flight_schedule(rows, batch_size=1000):
+    """
+    Create flights from (line number, row) pairs, reading and inserting them
+    a batch at a time. Nothing is imported if any row is invalid; the
+    InvalidSchedule error then lists up to MAX_ERRORS invalid rows.
+    """
+    rows = iter(rows)
+    errors = []
+    created = 0
+    with transaction.atomic():
+        while len(errors) < MAX_ERRORS:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            valid = _validate_batch(batch, errors)
+            if not errors:
+                created += _create_flights(valid)
+
+        if errors:
+            raise InvalidSchedule(errors[:MAX_ERRORS])
+
+    invalidate_flights()
+    schedule_changed()
+    return created
@@ -0,0 +1,53 @@
+"""
+OpenAPI schema served from OPENAPI_SCHEMA_FILE, the artifact rendered by
+`manage.py build_schema` and committed with the code, instead of being
+generated by drf-spectacular on every request. Responses carry an ETag and
+are revalidated on every use (no-cache), so clients pick up the schema of a
+deploy at once and otherwise get a 304. When the file is missing, it is
+generated on the first request and written for the next processes.
+"""
+import functools
+import hashlib
+from pathlib import Path
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+
+CONTENT_TYPE = "application/vnd.oai.openapi; charset=utf-8"
+
+
+def build_schema():
+    """The OpenAPI schema of all endpoints, in YAML"""
+    from drf_spectacular.generators import SchemaGenerator
+    from drf_spectacular.renderers import OpenApiYamlRenderer
+
+    schema = SchemaGenerator().get_schema(request=None, public=True)
+    return OpenApiYamlRenderer().render(schema, renderer_context={})
+
+
+@functools.cache
+def load_schema():
+    """The schema and its ETag"""
+    path = Path(settings.OPENAPI_SCHEMA_FILE)
+    if path.exists():
+        schema = path.read_bytes()
+    else:
+        schema = build_schema()
+        try:
+            path.write_bytes(schema)
+        except OSError:
+            # A read-only image still serves the schema from memory
+            pass
+    return schema, quote_etag(hashlib.md5(schema).hexdigest())
+
+
+def schema_view(request):
+    schema, etag = load_schema()
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(schema, content_type=CONTENT_TYPE)
+    response["ETag"] = etag
+    patch_cache_control(response, public=True, no_cache=True)
+    return response
@@ -0,0 +1,46 @@
+from airport.models import Airport
+
+
+def _airport_ids(city):
+    return Airport.objects.filter(closest_big_city__icontains=city).values_list(
+        "id", flat=True
+    )
+
+
+def resolve_airport_ids(city):
+    """
+    Resolve a city search term to the ids of matching airports, so that
+    routes and flights can be filtered with an integer IN lookup instead
+    of joining airports and scanning their city names.
+    """
+    return list(_airport_ids(city))
+
+
+async def aresolve_airport_ids(city):
+    """resolve_airport_ids() with the async ORM"""
+    return [airport_id async for airport_id in _airport_ids(city)]
+
+
+# Filtering of a view by city through airport_ids(), which resolves each city
+# once per request although conditional responses build the queryset twice.
+# Async views resolve the cities of the request ahead in aget_queryset(), as
+# get_queryset() itself cannot query the database from the event loop.
+class AirportSearchMixin:
+
+    airport_search_params = ()
+
+    def airport_ids(self, city):
+        if not hasattr(self, "resolved_airport_ids"):
+            self.resolved_airport_ids = {}
+        if city not in self.resolved_airport_ids:
+            self.resolved_airport_ids[city] = resolve_airport_ids(city)
+        return self.resolved_airport_ids[city]
+
+    async def aget_queryset(self):
+        if not hasattr(self, "resolved_airport_ids"):
+            self.resolved_airport_ids = {}
+        for param in self.airport_search_params:
+            city = self.request.query_params.get(param)
+            if city and city not in self.resolved_airport_ids:
+                self.resolved_airport_ids[city] = await aresolve_airport_ids(city)
+        return self.get_queryset()
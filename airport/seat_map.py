@@ -0,0 +1,70 @@
+import base64
+
+
+class SeatMap:
+    """Bitset of the sold seats of a flight, one bit per seat in row order."""
+
+    def __init__(self, rows, seats_in_row, data=b""):
+        self.rows = rows
+        self.seats_in_row = seats_in_row
+        size = (rows * seats_in_row + 7) // 8
+        self._bits = bytearray(bytes(data or b"")[:size].ljust(size, b"\0"))
+
+    @classmethod
+    def for_flight(cls, flight):
+        return cls(flight.airplane.rows, flight.airplane.seats_in_row, flight.seat_map)
+
+    def _position(self, row, seat):
+        if not (1 <= row <= self.rows and 1 <= seat <= self.seats_in_row):
+            raise ValueError(f"Seat (row: {row}, seat: {seat}) is not on the map")
+        index = (row - 1) * self.seats_in_row + seat - 1
+        return index // 8, 0x80 >> (index % 8)
+
+    def is_taken(self, row, seat):
+        byte, mask = self._position(row, seat)
+        return bool(self._bits[byte] & mask)
+
+    def take(self, row, seat):
+        byte, mask = self._position(row, seat)
+        self._bits[byte] |= mask
+
+    def release(self, row, seat):
+        # A seat off the map, e.g. of a ticket sold before the airplane of
+        # the flight changed, is not on it to release
+        if 1 <= row <= self.rows and 1 <= seat <= self.seats_in_row:
+            byte, mask = self._position(row, seat)
+            self._bits[byte] &= ~mask
+
+    @property
+    def taken_count(self):
+        return int.from_bytes(self._bits, "big").bit_count()
+
+    def taken_places(self):
+        for byte_index, byte in enumerate(self._bits):
+            if not byte:
+                continue
+            for bit in range(8):
+                if byte & (0x80 >> bit):
+                    row, seat = divmod(byte_index * 8 + bit, self.seats_in_row)
+                    yield row + 1, seat + 1
+
+    def to_runs(self):
+        """Run-length encoding: lengths of alternating free and taken runs."""
+        runs = []
+        taken = False
+        length = 0
+        for index in range(self.rows * self.seats_in_row):
+            seat_taken = bool(self._bits[index // 8] & (0x80 >> (index % 8)))
+            if seat_taken != taken:
+                runs.append(length)
+                taken = seat_taken
+                length = 0
+            length += 1
+        runs.append(length)
+        return runs
+
+    def to_bytes(self):
+        return bytes(self._bits)
+
+    def to_base64(self):
+        return base64.b64encode(self._bits).decode()
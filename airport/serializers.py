@@ -1,4 +1,6 @@
+from django.conf import settings
 from django.db import transaction
+from django.db.models import Q
 from django.utils import timezone
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
@@ -12,7 +14,10 @@ from airport.models import (
     Order,
     Flight,
     Crew,
+    SeatHold,
 )
+from airport.reservations import reserve_seats
+from airport.seat_map import SeatMap
 
 
 class AirplaneTypeSerializer(serializers.ModelSerializer):
@@ -26,6 +31,21 @@ class AirplaneSerializer(serializers.ModelSerializer):
         model = Airplane
         fields = ("id", "name", "rows", "seats_in_row", "airplane_type")
 
+    def validate(self, attrs):
+        data = super(AirplaneSerializer, self).validate(attrs)
+        if self.instance is not None:
+            rows = data.get("rows", self.instance.rows)
+            seats_in_row = data.get("seats_in_row", self.instance.seats_in_row)
+            if Ticket.objects.filter(
+                Q(row__gt=rows) | Q(seat__gt=seats_in_row),
+                flight__airplane=self.instance,
+            ).exists():
+                raise ValidationError(
+                    "Tickets are sold for seats outside of "
+                    f"{rows} rows of {seats_in_row} seats."
+                )
+        return data
+
 
 class CrewSerializer(serializers.ModelSerializer):
     class Meta:
@@ -41,12 +61,24 @@ class CrewListSerializer(CrewSerializer):
 
 class AirplaneListSerializer(serializers.ModelSerializer):
     airplane_type = serializers.CharField(source="airplane_type.name")
+    capacity = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = Airplane
         fields = ("id", "name", "rows", "seats_in_row", "airplane_type", "capacity")
 
 
+class CapacityQuerySerializer(serializers.Serializer):
+    min_capacity = serializers.IntegerField(
+        min_value=0, required=False, help_text="Minimum number of airplane seats"
+    )
+    ordering = serializers.ChoiceField(
+        choices=("capacity", "-capacity"),
+        required=False,
+        help_text="Order by airplane capacity, '-capacity' for descending",
+    )
+
+
 class AirportSerializer(serializers.ModelSerializer):
     class Meta:
         model = Airport
@@ -64,33 +96,87 @@ class RouteListSerializer(RouteSerializer):
     destination = serializers.CharField(source="destination.name")
 
 
+class ShortestRouteQuerySerializer(serializers.Serializer):
+    def get_fields(self):
+        # "from" is a keyword, so the fields can't be declared as attributes
+        return {
+            "from": serializers.IntegerField(
+                min_value=1, help_text="Source airport id"
+            ),
+            "to": serializers.IntegerField(
+                min_value=1, help_text="Destination airport id"
+            ),
+        }
+
+
+class ShortestRouteSerializer(serializers.Serializer):
+    distance = serializers.IntegerField(help_text="Total distance of the routes")
+    airports = AirportSerializer(many=True)
+
+
 class FlightSerializer(serializers.ModelSerializer):
     class Meta:
         model = Flight
         fields = ("id", "route", "airplane", "crew", "departure_time", "arrival_time")
 
-    def validate(self, data):
-        super().validate(data)
-
-        departure_time = data.get("departure_time")
-        arrival_time = data.get("arrival_time")
-        allow_create_time = timezone.now() + timezone.timedelta(days=1)
-        allow_update_time = timezone.now()
+    create_lead_time = timezone.timedelta(days=1)
 
-        if self.instance is None:
-            if departure_time < allow_create_time:
+    @classmethod
+    def validate_times(cls, departure_time, arrival_time, now, creating=True):
+        if creating:
+            if departure_time < now + cls.create_lead_time:
                 raise serializers.ValidationError(
                     "Flights must be created no later than a day before departure"
                 )
         else:
-            if departure_time < allow_update_time:
+            if departure_time < now:
                 raise serializers.ValidationError("Departure time must be in future")
 
         if arrival_time <= departure_time:
             raise ValidationError("Arrival time must be later than departure time.")
 
+    def validate(self, data):
+        super().validate(data)
+
+        self.validate_times(
+            data.get("departure_time"),
+            data.get("arrival_time"),
+            timezone.now(),
+            creating=self.instance is None,
+        )
+        airplane = data.get("airplane")
+        if self.instance is not None and airplane not in (None, self.instance.airplane):
+            self.validate_seats_on_map(self.instance, airplane)
         return data
 
+    @staticmethod
+    def validate_seats_on_map(flight, airplane):
+        if flight.tickets.filter(
+            Q(row__gt=airplane.rows) | Q(seat__gt=airplane.seats_in_row)
+        ).exists():
+            raise ValidationError(
+                {
+                    "airplane": "Tickets are sold for seats outside of "
+                    f"{airplane.rows} rows of {airplane.seats_in_row} seats."
+                }
+            )
+
+    def update(self, instance, validated_data):
+        airplane = validated_data.get("airplane", instance.airplane)
+        if airplane == instance.airplane:
+            return super().update(instance, validated_data)
+
+        with transaction.atomic():
+            # Orders take seats under the same row lock, so none is sold off
+            # the map of the new airplane before it is rebuilt
+            Flight.objects.select_for_update(of=("self",)).filter(
+                pk=instance.pk
+            ).first()
+            self.validate_seats_on_map(instance, airplane)
+            flight = super().update(instance, validated_data)
+            Flight.objects.filter(pk=flight.pk).rebuild_seat_maps()
+        return flight
+
 
 class FlightListSerializer(FlightSerializer):
     source = serializers.CharField(source="route.source.name", read_only=True)
@@ -117,7 +203,50 @@ class FlightListSerializer(FlightSerializer):
         )
 
 
+def _held_seats(flight_ids, user):
+    return set(
+        SeatHold.objects.active()
+        .filter(flight_id__in=flight_ids)
+        .exclude(user=user)
+        .values_list("flight_id", "row", "seat")
+    )
+
+
+class TicketFlightField(serializers.PrimaryKeyRelatedField):
+    """Takes the flight from those loaded by TicketBatchSerializer."""
+
+    def to_internal_value(self, data):
+        flights = self.context.get("ticket_flights", {})
+        if isinstance(data, int) and not isinstance(data, bool) and data in flights:
+            return flights[data]
+        return super().to_internal_value(data)
+
+
+class TicketBatchSerializer(serializers.ListSerializer):
+    """
+    Loads the flights and the seat holds of other users for all tickets at
+    once, instead of two queries per ticket.
+    """
+
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            flight_ids = {
+                item["flight"]
+                for item in data
+                if isinstance(item, dict) and isinstance(item.get("flight"), int)
+            }
+            self.context["ticket_flights"] = Flight.objects.select_related(
+                "airplane"
+            ).in_bulk(flight_ids)
+            self.context["held_seats"] = _held_seats(
+                flight_ids, self.context["request"].user
+            )
+        return super().to_internal_value(data)
+
+
 class TicketSerializer(serializers.ModelSerializer):
+    flight = TicketFlightField(queryset=Flight.objects.select_related("airplane"))
+
     def validate(self, attrs):
         data = super(TicketSerializer, self).validate(attrs=attrs)
         Ticket.validate_ticket(
@@ -126,27 +255,32 @@ class TicketSerializer(serializers.ModelSerializer):
             attrs["flight"].airplane,
             ValidationError,
         )
+        held_seats = self.context.get("held_seats")
+        if held_seats is None:
+            held_seats = _held_seats(
+                [attrs["flight"].pk], self.context["request"].user
+            )
+        if (attrs["flight"].pk, attrs["row"], attrs["seat"]) in held_seats:
+            raise ValidationError({"seat": "Seat is held by another customer."})
         return data
 
     class Meta:
         model = Ticket
         fields = ("id", "row", "seat", "flight")
+        list_serializer_class = TicketBatchSerializer
+        # Seat conflicts are checked for the whole order by reserve_seats
+        # instead of one unique_together query per ticket.
+        validators = []
 
 
 class TicketListSerializer(TicketSerializer):
     flight = FlightListSerializer(many=False, read_only=True)
 
 
-class TicketSeatsSerializer(TicketSerializer):
-    class Meta:
-        model = Ticket
-        fields = ("row", "seat")
-
-
 class FlightDetailSerializer(FlightSerializer):
     route = RouteListSerializer(many=False, read_only=True)
     airplane = AirplaneListSerializer(many=False, read_only=True)
-    taken_places = TicketSeatsSerializer(source="tickets", many=True, read_only=True)
+    taken_places = serializers.SerializerMethodField()
     crew = CrewSerializer(many=True, read_only=True)
 
     class Meta:
@@ -161,6 +295,150 @@ class FlightDetailSerializer(FlightSerializer):
             "crew",
         )
 
+    def get_taken_places(self, flight) -> list[dict]:
+        return [
+            {"row": row, "seat": seat}
+            for row, seat in SeatMap.for_flight(flight).taken_places()
+        ]
+
+
+class SeatMapSerializer(serializers.Serializer):
+    rows = serializers.IntegerField()
+    seats_in_row = serializers.IntegerField()
+    encoding = serializers.ChoiceField(choices=("bitmap", "rle"))
+    seat_map = serializers.JSONField()
+
+
+class FlightFilterSerializer(serializers.Serializer):
+    date = serializers.DateField(
+        required=False, help_text="Departure date in UTC (ex. 2024-10-08)"
+    )
+    date_from = serializers.DateField(
+        required=False, help_text="First departure date in UTC"
+    )
+    date_to = serializers.DateField(
+        required=False, help_text="Last departure date in UTC"
+    )
+    departure_after = serializers.TimeField(
+        required=False, help_text="Earliest departure time of day in UTC (ex. 08:00)"
+    )
+    departure_before = serializers.TimeField(
+        required=False,
+        help_text=(
+            "Departure time of day in UTC before which flights leave; earlier "
+            "than departure_after for a window spanning midnight"
+        ),
+    )
+    airplane_type = serializers.IntegerField(
+        min_value=1, required=False, help_text="Airplane type id"
+    )
+    min_seats_available = serializers.IntegerField(
+        min_value=0, required=False, help_text="Minimum number of free seats"
+    )
+
+    def validate(self, attrs):
+        date_from, date_to = attrs.get("date_from"), attrs.get("date_to")
+        if date_from and date_to and date_to < date_from:
+            raise ValidationError({"date_to": "Must not be before date_from."})
+        return attrs
+
+
+class ConnectionSearchSerializer(serializers.Serializer):
+    source = serializers.CharField(help_text="Source city (ex. Paris)")
+    destination = serializers.CharField(help_text="Destination city (ex. London)")
+    date_from = serializers.DateField(
+        required=False, help_text="First departure date, today by default"
+    )
+    date_to = serializers.DateField(
+        required=False,
+        help_text=(
+            "Last departure date, date_from by default and at most "
+            f"{settings.CONNECTION_MAX_DAYS - 1} days after it"
+        ),
+    )
+    max_legs = serializers.IntegerField(min_value=1, max_value=3, default=3)
+    min_connection = serializers.IntegerField(
+        min_value=0,
+        default=settings.CONNECTION_MIN_MINUTES,
+        help_text="Minimum connection time in minutes",
+    )
+    max_connection = serializers.IntegerField(
+        min_value=1,
+        default=settings.CONNECTION_MAX_MINUTES,
+        help_text="Maximum connection time in minutes",
+    )
+    limit = serializers.IntegerField(min_value=1, max_value=100, default=20)
+
+    def validate(self, attrs):
+        date_from = attrs.setdefault("date_from", timezone.localdate())
+        date_to = attrs.setdefault("date_to", date_from)
+        if date_to < date_from:
+            raise ValidationError({"date_to": "Must not be before date_from."})
+        if (date_to - date_from).days >= settings.CONNECTION_MAX_DAYS:
+            raise ValidationError(
+                {
+                    "date_to": "Must be less than "
+                    f"{settings.CONNECTION_MAX_DAYS} days after date_from."
+                }
+            )
+        if attrs["max_connection"] < attrs["min_connection"]:
+            raise ValidationError(
+                {"max_connection": "Must not be less than min_connection."}
+            )
+        return attrs
+
+
+class ItinerarySerializer(serializers.Serializer):
+    departure_time = serializers.DateTimeField()
+    arrival_time = serializers.DateTimeField()
+    duration = serializers.IntegerField(
+        help_text="Minutes from the first departure to the last arrival"
+    )
+    legs = FlightListSerializer(many=True)
+
+
+class FlightImportSerializer(serializers.Serializer):
+    """One row of a flight schedule import; related ids are checked per batch."""
+
+    route = serializers.IntegerField(min_value=1)
+    airplane = serializers.IntegerField(min_value=1)
+    crew = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), default=list
+    )
+    departure_time = serializers.DateTimeField()
+    arrival_time = serializers.DateTimeField()
+
+
+class FlightImportResultSerializer(serializers.Serializer):
+    created = serializers.IntegerField()
+
+
+class SeatSerializer(serializers.Serializer):
+    row = serializers.IntegerField(min_value=1)
+    seat = serializers.IntegerField(min_value=1)
+
+
+class SeatHoldRequestSerializer(serializers.Serializer):
+    seats = SeatSerializer(
+        many=True, allow_empty=False, max_length=settings.SEAT_HOLD_MAX_SEATS
+    )
+    ttl = serializers.IntegerField(
+        min_value=1,
+        max_value=settings.SEAT_HOLD_MAX_TTL,
+        default=settings.SEAT_HOLD_TTL,
+        help_text="Hold duration in seconds",
+    )
+
+
+class SeatReleaseRequestSerializer(serializers.Serializer):
+    seats = SeatSerializer(many=True, required=False)
+
+
+class SeatHoldSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = SeatHold
+        fields = ("id", "flight", "row", "seat", "expires_at")
+
 
 class OrderSerializer(serializers.ModelSerializer):
     tickets = TicketSerializer(many=True, read_only=False, allow_empty=False)
@@ -173,8 +451,7 @@ class OrderSerializer(serializers.ModelSerializer):
         with transaction.atomic():
             tickets_data = validated_data.pop("tickets")
             order = Order.objects.create(**validated_data)
-            for ticket_data in tickets_data:
-                Ticket.objects.create(order=order, **ticket_data)
+            reserve_seats(order, tickets_data)
             return order
 
 
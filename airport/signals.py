@@ -0,0 +1,160 @@
+from collections import defaultdict
+
+from django.db.models import Q
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from airport.cache import invalidate_flights
+from airport.connections import schedule_changed
+from airport.models import (
+    Airplane,
+    AirplaneType,
+    Airport,
+    Crew,
+    Flight,
+    Order,
+    Route,
+    Ticket,
+)
+from airport.routing import route_added, route_removed, routes_changed
+
+
+@receiver(pre_delete, sender=Order)
+def release_order_seats(sender, instance, **kwargs):
+    seats_by_flight = defaultdict(list)
+    for flight_id, row, seat in instance.tickets.values_list(
+        "flight_id", "row", "seat"
+    ):
+        seats_by_flight[flight_id].append((row, seat))
+    for flight_id, seats in seats_by_flight.items():
+        Flight(pk=flight_id).release_seats(seats)
+
+
+@receiver(post_delete, sender=Ticket)
+def release_ticket_seat(sender, instance, origin, **kwargs):
+    # Seats of deleted orders are released per flight by release_order_seats,
+    # those of deleted flights go with them
+    if getattr(origin, "model", type(origin)) is Ticket:
+        Flight(pk=instance.flight_id).release_seats([(instance.row, instance.seat)])
+
+
+@receiver(post_save, sender=Ticket)
+@receiver(post_delete, sender=Ticket)
+def invalidate_ticket_flight(sender, instance, **kwargs):
+    saved_flight_id = getattr(instance, "_saved_flight_id", None)
+    invalidate_flights({instance.flight_id, saved_flight_id or instance.flight_id})
+
+
+@receiver(post_save, sender=Flight)
+@receiver(post_delete, sender=Flight)
+def invalidate_flight(sender, instance, **kwargs):
+    invalidate_flights([instance.pk])
+
+
+@receiver(post_save, sender=Flight)
+@receiver(post_delete, sender=Flight)
+def update_flight_connections(sender, instance, **kwargs):
+    schedule_changed([instance.pk])
+
+
+def touch_flights(flight_ids):
+    Flight.objects.filter(pk__in=flight_ids).update(updated_at=timezone.now())
+
+
+@receiver(m2m_changed, sender=Flight.crew.through)
+def invalidate_flight_crew(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        flight_ids = [instance.pk] if action.startswith("post_") else []
+    elif action in ("post_add", "post_remove"):
+        flight_ids = list(pk_set)
+    elif action == "pre_clear":
+        flight_ids = list(instance.flights.values_list("id", flat=True))
+    else:
+        flight_ids = []
+
+    if flight_ids:
+        touch_flights(flight_ids)
+        invalidate_flights(flight_ids)
+
+
+@receiver(post_save, sender=Crew)
+def invalidate_crew_flights(sender, instance, **kwargs):
+    invalidate_flights(instance.flights.values_list("id", flat=True))
+
+
+@receiver(pre_delete, sender=Crew)
+def invalidate_deleted_crew_flights(sender, instance, **kwargs):
+    flight_ids = list(instance.flights.values_list("id", flat=True))
+    touch_flights(flight_ids)
+    invalidate_flights(flight_ids)
+
+
+@receiver(post_save, sender=Route)
+def invalidate_route_flights(sender, instance, created, **kwargs):
+    if not created:
+        invalidate_flights(instance.flights.values_list("id", flat=True))
+
+
+@receiver(post_save, sender=Route)
+def update_route_connections(sender, instance, created, **kwargs):
+    if not created:
+        schedule_changed(instance.flights.values_list("id", flat=True))
+
+
+@receiver(post_save, sender=Route)
+def update_route_table(sender, instance, created, **kwargs):
+    if created:
+        route_added(instance)
+    else:
+        routes_changed()
+
+
+@receiver(post_delete, sender=Route)
+def update_deleted_route_table(sender, instance, **kwargs):
+    route_removed(instance)
+
+
+@receiver(pre_save, sender=Airplane)
+def remember_airplane_geometry(sender, instance, **kwargs):
+    instance._saved_geometry = (
+        Airplane.objects.filter(pk=instance.pk)
+        .values_list("rows", "seats_in_row")
+        .first()
+    )
+
+
+@receiver(post_save, sender=Airplane)
+def rebuild_airplane_seat_maps(sender, instance, created, **kwargs):
+    geometry = (instance.rows, instance.seats_in_row)
+    if not created and instance._saved_geometry not in (None, geometry):
+        instance.flights.rebuild_seat_maps()
+
+
+@receiver(post_save, sender=Airplane)
+def invalidate_airplane_flights(sender, instance, **kwargs):
+    invalidate_flights(instance.flights.values_list("id", flat=True))
+
+
+@receiver(post_save, sender=AirplaneType)
+def invalidate_airplane_type_flights(sender, instance, **kwargs):
+    invalidate_flights(
+        Flight.objects.filter(airplane__airplane_type=instance).values_list(
+            "id", flat=True
+        )
+    )
+
+
+@receiver(post_save, sender=Airport)
+def invalidate_airport_flights(sender, instance, **kwargs):
+    invalidate_flights(
+        Flight.objects.filter(
+            Q(route__source=instance) | Q(route__destination=instance)
+        ).values_list("id", flat=True)
+    )
@@ -1,10 +1,19 @@
 from django.contrib.auth import get_user_model
 from django.test import TestCase
-from django.urls import reverse
+from django.utils import timezone
+from django.urls import NoReverseMatch, reverse
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from airport.models import Airplane, AirplaneType
+from airport.models import (
+    Airplane,
+    AirplaneType,
+    Airport,
+    Flight,
+    Order,
+    Route,
+    Ticket,
+)
 from airport.serializers import AirplaneListSerializer
 
 AIRPLANE_URL = reverse("airport:airplane-list")
@@ -49,6 +58,41 @@ class AuthenticatedAirplaneApiTest(TestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(actual_data, serializer.data)
 
+    def test_filter_and_order_airplanes_by_capacity(self):
+        airplane_type = sample_airplane_type()
+        for name, rows in (("small", 10), ("large", 40), ("medium", 20)):
+            Airplane.objects.create(
+                name=name, rows=rows, seats_in_row=6, airplane_type=airplane_type
+            )
+
+        response = self.client.get(
+            AIRPLANE_URL, {"min_capacity": 120, "ordering": "-capacity"}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [
+                (airplane["name"], airplane["capacity"])
+                for airplane in response.data["results"]
+            ],
+            [("large", 240), ("medium", 120)],
+        )
+
+    def test_invalid_capacity_query(self):
+        response = self.client.get(
+            AIRPLANE_URL, {"min_capacity": "many", "ordering": "name"}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("min_capacity", response.data)
+        self.assertIn("ordering", response.data)
+
+    def test_airplane_types_have_no_detail_route(self):
+        airplane_type = sample_airplane_type()
+
+        with self.assertRaises(NoReverseMatch):
+            reverse("airport:airplanetype-detail", args=[airplane_type.id])
+
     def test_admin_required(self):
         airplane_type = sample_airplane_type()
         payload = {
@@ -79,3 +123,61 @@ class AdminAirplaneApiTest(TestCase):
         }
         response = self.client.post(AIRPLANE_URL, payload)
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_capacity_follows_updates(self):
+        airplane = Airplane.objects.create(
+            name="test", rows=40, seats_in_row=6, airplane_type=self.airplane_type
+        )
+        self.assertEqual(airplane.capacity, 240)
+
+        airplane.rows = 30
+        airplane.save()
+
+        self.assertEqual(airplane.capacity, 180)
+
+    def _flight_with_ticket(self, row, seat):
+        airplane = Airplane.objects.create(
+            name="test", rows=10, seats_in_row=4, airplane_type=self.airplane_type
+        )
+        flight = Flight.objects.create(
+            route=Route.objects.create(
+                source=Airport.objects.create(name="Orly", closest_big_city="Paris"),
+                destination=Airport.objects.create(
+                    name="Tegel", closest_big_city="Berlin"
+                ),
+                distance=1000,
+            ),
+            airplane=airplane,
+            departure_time=timezone.now() + timezone.timedelta(days=1),
+            arrival_time=timezone.now() + timezone.timedelta(days=2),
+        )
+        Ticket.objects.create(
+            flight=flight, row=row, seat=seat, order=Order.objects.create(user=self.user)
+        )
+        return airplane, flight
+
+    def test_geometry_change_rebuilds_seat_maps(self):
+        airplane, flight = self._flight_with_ticket(2, 3)
+
+        response = self.client.patch(
+            reverse("airport:airplane-detail", args=[airplane.id]),
+            {"seats_in_row": 6},
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get(reverse("airport:flight-detail", args=[flight.id]))
+        self.assertEqual(response.data["taken_places"], [{"row": 2, "seat": 3}])
+        response = self.client.get(reverse("airport:flight-list"))
+        self.assertEqual(response.data["results"][0]["tickets_available"], 59)
+
+    def test_geometry_change_rejected_for_sold_seats(self):
+        airplane, flight = self._flight_with_ticket(8, 3)
+
+        response = self.client.patch(
+            reverse("airport:airplane-detail", args=[airplane.id]),
+            {"rows": 7},
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        airplane.refresh_from_db()
+        self.assertEqual(airplane.rows, 10)
@@ -0,0 +1,76 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from airport.models import Airport
+from airport.search import resolve_airport_ids
+
+AIRPORT_URL = reverse("airport:airport-list")
+
+
+def detail_url(airport_id):
+    return reverse("airport:airport-detail", args=[airport_id])
+
+
+class AuthenticatedAirportApiTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "test@user.com", "testpassword"
+        )
+        self.client.force_authenticate(self.user)
+        self.heathrow = Airport.objects.create(
+            name="Heathrow", closest_big_city="London"
+        )
+        self.gatwick = Airport.objects.create(name="Gatwick", closest_big_city="London")
+        self.orly = Airport.objects.create(name="Orly", closest_big_city="Paris")
+
+    def test_filter_airports_by_city(self):
+        response = self.client.get(AIRPORT_URL, {"city": "lond"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            {airport["name"] for airport in response.data["results"]},
+            {"Heathrow", "Gatwick"},
+        )
+
+    def test_filter_airports_by_name(self):
+        response = self.client.get(AIRPORT_URL, {"name": "ORL"})
+
+        self.assertEqual(response.data["count"], 1)
+        self.assertEqual(response.data["results"][0]["id"], self.orly.id)
+
+    def test_resolve_airport_ids(self):
+        self.assertEqual(
+            set(resolve_airport_ids("London")), {self.heathrow.id, self.gatwick.id}
+        )
+        self.assertEqual(resolve_airport_ids("Berlin"), [])
+
+    def test_list_not_modified(self):
+        etag = self.client.get(AIRPORT_URL)["ETag"]
+
+        response = self.client.get(AIRPORT_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_list_modified_after_update(self):
+        etag = self.client.get(AIRPORT_URL)["ETag"]
+        self.orly.closest_big_city = "Paris Sud"
+        self.orly.save()
+
+        response = self.client.get(AIRPORT_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_detail_not_modified_since(self):
+        response = self.client.get(detail_url(self.orly.id))
+
+        not_modified = self.client.get(
+            detail_url(self.orly.id),
+            HTTP_IF_MODIFIED_SINCE=response["Last-Modified"],
+        )
+
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
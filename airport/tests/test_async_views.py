@@ -0,0 +1,162 @@
+import json
+from datetime import timedelta
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from airport import metrics
+from airport.models import Airplane, AirplaneType, Airport, Crew, Flight, Route
+
+
+class AsyncReadViewsTest(TestCase):
+    """The async views, served to the AsyncClient, answer as the sync ones."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            "test@user.com", "testpassword"
+        )
+        self.headers = {"Authorization": f"Bearer {AccessToken.for_user(self.user)}"}
+        self.client = APIClient(headers=self.headers)
+
+        paris = Airport.objects.create(name="Orly", closest_big_city="Paris")
+        berlin = Airport.objects.create(name="Tegel", closest_big_city="Berlin")
+        self.route = Route.objects.create(
+            source=paris, destination=berlin, distance=1000
+        )
+        Route.objects.create(
+            source=berlin,
+            destination=Airport.objects.create(
+                name="Ciampino", closest_big_city="Rome"
+            ),
+            distance=1200,
+        )
+        airplane = Airplane.objects.create(
+            name="A320",
+            rows=30,
+            seats_in_row=6,
+            airplane_type=AirplaneType.objects.create(name="Airbus"),
+        )
+        crew = Crew.objects.create(first_name="Ann", last_name="Lee")
+        departure_time = timezone.now() + timedelta(days=1)
+        for index in range(12):
+            flight = Flight.objects.create(
+                route=self.route,
+                airplane=airplane,
+                departure_time=departure_time + timedelta(hours=index),
+                arrival_time=departure_time + timedelta(hours=index + 2),
+            )
+            flight.crew.add(crew)
+        self.flight = flight
+
+    def get_async(self, url, **kwargs):
+        return async_to_sync(self.async_client.get)(
+            url, headers={**self.headers, **kwargs.pop("headers", {})}, **kwargs
+        )
+
+    def assertSameResponse(self, url):
+        sync_response = self.client.get(url)
+        async_response = self.get_async(url)
+        self.assertEqual(async_response.status_code, sync_response.status_code)
+        self.assertEqual(
+            json.loads(async_response.content), json.loads(sync_response.content)
+        )
+        self.assertEqual(async_response.get("ETag"), sync_response.get("ETag"))
+
+    def test_served_by_async_views(self):
+        response = self.get_async(reverse("airport:flight-list"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.resolver_match.func.cls.__name__, "AsyncFlightViewSet"
+        )
+        self.assertEqual(
+            self.client.get(reverse("airport:flight-list")).resolver_match.func.cls,
+            response.resolver_match.func.cls.__mro__[2],
+        )
+
+    @override_settings(QUERY_INSPECTOR_MODE="raise")
+    def test_same_responses(self):
+        for url in (
+            reverse("airport:flight-list"),
+            reverse("airport:flight-list") + "?source=Paris&destination=Berlin",
+            reverse("airport:flight-list") + "?count=false&offset=10",
+            reverse("airport:flight-list") + "?pagination=cursor&limit=5",
+            reverse("airport:flight-list") + "?ordering=-capacity&min_capacity=100",
+            reverse("airport:flight-list") + "?date=not-a-date",
+            reverse("airport:flight-detail", args=[self.flight.id]),
+            reverse("airport:flight-detail", args=[0]),
+            reverse("airport:flight-detail", args=["abc"]),
+            reverse("airport:route-list"),
+            reverse("airport:route-list") + "?destination=Berlin",
+            reverse("airport:route-detail", args=[self.route.id]),
+            reverse("airport:airport-list") + "?city=Paris",
+            reverse("airport:airport-list") + "?limit=1&offset=1",
+        ):
+            with self.subTest(url=url):
+                cache.clear()
+                self.assertSameResponse(url)
+
+    def test_not_modified(self):
+        url = reverse("airport:route-list")
+        etag = self.get_async(url)["ETag"]
+        response = self.get_async(url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_flight_cache(self):
+        url = reverse("airport:flight-detail", args=[self.flight.id])
+        self.assertEqual(self.get_async(url)["X-Cache"], "MISS")
+        self.assertEqual(self.get_async(url)["X-Cache"], "HIT")
+        self.assertEqual(self.client.get(url)["X-Cache"], "HIT")
+
+    def test_authentication(self):
+        url = reverse("airport:flight-list")
+        response = async_to_sync(self.async_client.get)(url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIn("Bearer", response["WWW-Authenticate"])
+
+        response = self.get_async(url, headers={"Authorization": "Bearer invalid"})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.get_async(url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_writes_and_other_actions_are_served_by_sync_viewsets(self):
+        url = reverse("airport:airport-list")
+        response = async_to_sync(self.async_client.post)(
+            url, {"name": "Gatwick", "closest_big_city": "London"}, headers=self.headers
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.user.is_staff = True
+        self.user.save()
+        response = async_to_sync(self.async_client.post)(
+            url, {"name": "Gatwick", "closest_big_city": "London"}, headers=self.headers
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(Airport.objects.filter(name="Gatwick").exists())
+
+        response = self.get_async(
+            reverse("airport:flight-seats", args=[self.flight.id])
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_queries_are_recorded_in_metrics(self):
+        key = ("airport_db_queries", "AsyncFlightViewSet.list")
+        recorded = metrics._process.snapshot()["histograms"].get(key, [0] * 3)
+        self.get_async(reverse("airport:flight-list"))
+        histogram = metrics._process.snapshot()["histograms"][key]
+        # The user, the count, the page, its crews and their seat holds
+        self.assertEqual(histogram[-1] - recorded[-1], 1)
+        self.assertEqual(histogram[-2] - recorded[-2], 5)
+        render = metrics._process.snapshot()["histograms"][
+            ("airport_render_duration_seconds", "AsyncFlightViewSet.list")
+        ]
+        self.assertGreater(render[-2], 0)
@@ -0,0 +1,282 @@
+"""
+Query-count and latency benchmarks for every endpoint.
+
+Each endpoint is requested at growing dataset sizes. The test fails when the
+number of queries of an endpoint grows with the data, or differs from the
+count stored in benchmark_baseline.json. Latency and response size are
+recorded as well; latency is only checked against the baseline when
+AIRPORT_BENCHMARK_LATENCY=1, since it depends on the machine.
+
+Environment variables:
+    AIRPORT_BENCHMARK_SCALES     comma-separated flight counts (default 5,50),
+                                 e.g. 1000,10000,100000 for a full run
+    AIRPORT_BENCHMARK_REPEAT     requests per endpoint and scale (default 3)
+    AIRPORT_BENCHMARK_LATENCY    set to 1 to fail on latency regressions
+    AIRPORT_BENCHMARK_TOLERANCE  allowed slowdown factor (default 1.5)
+    AIRPORT_BENCHMARK_RECORD     set to 1 to write the measured baseline
+"""
+import json
+import os
+import statistics
+import time
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from airport.models import (
+    Airplane,
+    AirplaneType,
+    Airport,
+    Crew,
+    Flight,
+    Order,
+    Route,
+    Ticket,
+)
+from airport.seat_map import SeatMap
+from airport.urls import router
+
+BASELINE_PATH = Path(__file__).with_name("benchmark_baseline.json")
+SCALES = [
+    int(scale)
+    for scale in os.environ.get("AIRPORT_BENCHMARK_SCALES", "5,50").split(",")
+]
+REPEAT = int(os.environ.get("AIRPORT_BENCHMARK_REPEAT", 3))
+CHECK_LATENCY = os.environ.get("AIRPORT_BENCHMARK_LATENCY") == "1"
+TOLERANCE = float(os.environ.get("AIRPORT_BENCHMARK_TOLERANCE", 1.5))
+RECORD = os.environ.get("AIRPORT_BENCHMARK_RECORD") == "1"
+
+PASSWORD = "benchmark-password"
+TICKETS_PER_FLIGHT = 4
+FLIGHTS_PER_ORDER = 10
+BATCH_SIZE = 2000
+
+
+class BenchmarkData:
+    """Grows a dataset of flights, each with crew, an order and sold tickets."""
+
+    def __init__(self, user):
+        self.user = user
+        airplane_type = AirplaneType.objects.create(name="Benchmark type")
+        self.airplanes = Airplane.objects.bulk_create(
+            Airplane(
+                name=f"Airplane {index}",
+                rows=30,
+                seats_in_row=6,
+                airplane_type=airplane_type,
+            )
+            for index in range(5)
+        )
+        airports = Airport.objects.bulk_create(
+            Airport(name=f"Airport {index}", closest_big_city=f"City {index}")
+            for index in range(10)
+        )
+        self.routes = Route.objects.bulk_create(
+            Route(source=source, destination=destination, distance=1000)
+            for index, source in enumerate(airports)
+            for destination in airports[index + 1 :]
+        )
+        self.crew = Crew.objects.bulk_create(
+            Crew(first_name=f"First {index}", last_name=f"Last {index}")
+            for index in range(20)
+        )
+        seat_map = SeatMap(30, 6)
+        for seat in range(1, TICKETS_PER_FLIGHT + 1):
+            seat_map.take(1, seat)
+        self.seat_map = seat_map.to_bytes()
+        self.flights_count = 0
+
+    def grow_to(self, flights_count):
+        while self.flights_count < flights_count:
+            batch_size = min(BATCH_SIZE, flights_count - self.flights_count)
+            self._add_flights(batch_size)
+            self.flights_count += batch_size
+
+    def _add_flights(self, count):
+        departure_time = timezone.now() + timezone.timedelta(days=2)
+        flights = Flight.objects.bulk_create(
+            Flight(
+                route=self.routes[(self.flights_count + index) % len(self.routes)],
+                airplane=self.airplanes[index % len(self.airplanes)],
+                departure_time=departure_time + timezone.timedelta(minutes=index),
+                arrival_time=departure_time + timezone.timedelta(hours=3),
+                seat_map=self.seat_map,
+                tickets_sold=TICKETS_PER_FLIGHT,
+            )
+            for index in range(count)
+        )
+        Flight.crew.through.objects.bulk_create(
+            Flight.crew.through(
+                flight_id=flight.pk,
+                crew_id=self.crew[(index + offset) % len(self.crew)].pk,
+            )
+            for index, flight in enumerate(flights)
+            for offset in range(3)
+        )
+        orders = Order.objects.bulk_create(
+            Order(user=self.user)
+            for _ in range((count + FLIGHTS_PER_ORDER - 1) // FLIGHTS_PER_ORDER)
+        )
+        Ticket.objects.bulk_create(
+            (
+                Ticket(
+                    flight=flight,
+                    order=orders[index // FLIGHTS_PER_ORDER],
+                    row=1,
+                    seat=seat,
+                )
+                for index, flight in enumerate(flights)
+                for seat in range(1, TICKETS_PER_FLIGHT + 1)
+            ),
+            batch_size=BATCH_SIZE,
+        )
+
+
+def airport_endpoints():
+    """
+    Name and model of the GET endpoints of every viewset registered in
+    airport/urls.py. The model is set for detail endpoints.
+    """
+    for _, viewset, basename in router.registry:
+        if hasattr(viewset, "list"):
+            yield f"{basename}-list", None
+        if hasattr(viewset, "retrieve"):
+            yield f"{basename}-detail", viewset.queryset.model
+        for extra_action in viewset.get_extra_actions():
+            if "get" in extra_action.mapping:
+                yield (
+                    f"{basename}-{extra_action.url_name}",
+                    viewset.queryset.model if extra_action.detail else None,
+                )
+
+
+class EndpointBenchmarkTest(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            "benchmark@user.com", PASSWORD, is_staff=True
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.data = BenchmarkData(self.user)
+
+    @staticmethod
+    def _endpoint_url(name, model):
+        args = [model.objects.order_by("pk").last().pk] if model else []
+        url = reverse(f"airport:{name}", args=args)
+        if name == "flight-connections":
+            departure_date = (timezone.now() + timezone.timedelta(days=2)).date()
+            url += (
+                f"?source=City 0&destination=City 1&date_from={departure_date}"
+                f"&date_to={departure_date + timezone.timedelta(days=1)}"
+            )
+        if name == "route-shortest":
+            airports = Airport.objects.order_by("pk")
+            url += f"?from={airports.first().pk}&to={airports.last().pk}"
+        return url
+
+    def _measure(self, request):
+        queries = []
+        latencies = []
+        size = 0
+        for _ in range(REPEAT):
+            cache.clear()
+            with CaptureQueriesContext(connection) as captured:
+                started_at = time.perf_counter()
+                response = request()
+                content = response.getvalue()
+                latencies.append((time.perf_counter() - started_at) * 1000)
+            self.assertLess(response.status_code, 400, content[:200])
+            queries.append(len(captured))
+            size = len(content)
+        return {
+            "queries": max(queries),
+            "median_ms": round(statistics.median(latencies), 2),
+            "bytes": size,
+        }
+
+    def _auth_requests(self):
+        anonymous = APIClient()
+        tokens = anonymous.post(
+            reverse("jwt-create"),
+            {"email": self.user.email, "password": PASSWORD},
+        ).data
+        return [
+            (
+                "jwt-create",
+                lambda: anonymous.post(
+                    reverse("jwt-create"),
+                    {"email": self.user.email, "password": PASSWORD},
+                ),
+            ),
+            (
+                "jwt-refresh",
+                lambda: anonymous.post(
+                    reverse("jwt-refresh"), {"refresh": tokens["refresh"]}
+                ),
+            ),
+            (
+                "jwt-verify",
+                lambda: anonymous.post(
+                    reverse("jwt-verify"), {"token": tokens["access"]}
+                ),
+            ),
+            ("user-me", lambda: self.client.get(reverse("user-me"))),
+        ]
+
+    def _run_scale(self):
+        requests = [
+            (
+                name,
+                lambda url=self._endpoint_url(name, model): self.client.get(url),
+            )
+            for name, model in airport_endpoints()
+        ] + self._auth_requests()
+        return {name: self._measure(request) for name, request in requests}
+
+    def test_endpoints_scale(self):
+        results = {}
+        for scale in SCALES:
+            self.data.grow_to(scale)
+            results[scale] = self._run_scale()
+
+        baseline = (
+            json.loads(BASELINE_PATH.read_text()) if BASELINE_PATH.exists() else {}
+        )
+        smallest = results[SCALES[0]]
+        for scale, measurements in results.items():
+            for endpoint, measurement in measurements.items():
+                with self.subTest(endpoint=endpoint, scale=scale):
+                    self.assertEqual(
+                        measurement["queries"],
+                        smallest[endpoint]["queries"],
+                        f"{endpoint}: query count grows with the data size",
+                    )
+                    expected = baseline.get(endpoint, {}).get(str(scale))
+                    if expected is None:
+                        continue
+                    self.assertLessEqual(
+                        measurement["queries"],
+                        expected["queries"],
+                        f"{endpoint}: more queries than the baseline",
+                    )
+                    if CHECK_LATENCY:
+                        self.assertLessEqual(
+                            measurement["median_ms"],
+                            expected["median_ms"] * TOLERANCE,
+                            f"{endpoint}: slower than the baseline",
+                        )
+
+        if RECORD:
+            for scale, measurements in results.items():
+                for endpoint, measurement in measurements.items():
+                    baseline.setdefault(endpoint, {})[str(scale)] = measurement
+            BASELINE_PATH.write_text(
+                json.dumps(baseline, indent=2, sort_keys=True) + "\n"
+            )
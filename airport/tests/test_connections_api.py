@@ -0,0 +1,237 @@
+import random
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from airport import connections
+from airport.connections import ConnectionGraph, Leg
+from airport.models import Airport, Route, Flight, AirplaneType, Airplane
+
+CONNECTIONS_URL = reverse("airport:flight-connections")
+HOUR = 60 * 60
+
+
+class ConnectionGraphTest(TestCase):
+    def setUp(self):
+        self.graph = ConnectionGraph(
+            [
+                Leg(1, "A", "B", 0, 2 * HOUR),
+                Leg(2, "B", "C", 3 * HOUR, 5 * HOUR),
+                Leg(3, "B", "C", 2 * HOUR + 10 * 60, 4 * HOUR),
+                Leg(4, "A", "C", HOUR, 7 * HOUR),
+                Leg(5, "C", "D", 6 * HOUR, 8 * HOUR),
+                Leg(6, "B", "A", 3 * HOUR, 5 * HOUR),
+            ]
+        )
+
+    def _flights(self, itineraries):
+        return [[leg.flight_id for leg in legs] for legs in itineraries]
+
+    def test_search_sorted_by_arrival(self):
+        itineraries = self.graph.search(["A"], ["C"], 0, HOUR, min_connection=0)
+
+        self.assertEqual(self._flights(itineraries), [[1, 3], [1, 2], [4]])
+
+    def test_min_connection(self):
+        itineraries = self.graph.search(["A"], ["C"], 0, HOUR, min_connection=HOUR)
+
+        self.assertEqual(self._flights(itineraries), [[1, 2], [4]])
+
+    def test_max_legs(self):
+        self.assertEqual(
+            self._flights(self.graph.search(["A"], ["D"], 0, HOUR, max_legs=3)),
+            [[1, 3, 5], [1, 2, 5]],
+        )
+        self.assertEqual(
+            self._flights(self.graph.search(["A"], ["D"], 0, HOUR, max_legs=2)), []
+        )
+
+    def test_departure_window(self):
+        itineraries = self.graph.search(["A"], ["C"], HOUR, 2 * HOUR)
+
+        self.assertEqual(self._flights(itineraries), [[4]])
+
+    def test_limit(self):
+        itineraries = self.graph.search(
+            ["A"], ["C"], 0, HOUR, min_connection=0, limit=2
+        )
+
+        self.assertEqual(self._flights(itineraries), [[1, 3], [1, 2]])
+
+    def test_limit_keeps_first_arrivals(self):
+        generator = random.Random(0)
+        legs = []
+        for flight_id in range(400):
+            source, destination = generator.sample("ABCDEFGH", 2)
+            departure = generator.randrange(0, 48 * HOUR, 15 * 60)
+            arrival = departure + generator.randrange(HOUR, 6 * HOUR, 15 * 60)
+            legs.append(Leg(flight_id, source, destination, departure, arrival))
+        graph = ConnectionGraph(legs)
+
+        itineraries = graph.search(["A"], ["H"], 0, 12 * HOUR)
+        self.assertGreater(len(itineraries), 100)
+        for limit in (1, 7, 50):
+            self.assertEqual(
+                graph.search(["A"], ["H"], 0, 12 * HOUR, limit=limit),
+                itineraries[:limit],
+            )
+
+    def test_remove_and_replace_legs(self):
+        self.graph.remove(3)
+        self.graph.add(Leg(4, "A", "C", HOUR, 3 * HOUR))
+
+        itineraries = self.graph.search(["A"], ["C"], 0, HOUR, min_connection=0)
+
+        self.assertEqual(self._flights(itineraries), [[4], [1, 2]])
+        self.graph.remove(2)
+        self.assertNotIn("B", self.graph.inbound["C"])
+
+
+class ConnectionsApiTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "test@user.com", "testpassword"
+        )
+        self.client.force_authenticate(self.user)
+        self.paris = Airport.objects.create(name="CDG", closest_big_city="Paris")
+        self.berlin = Airport.objects.create(name="BER", closest_big_city="Berlin")
+        self.warsaw = Airport.objects.create(name="WAW", closest_big_city="Warsaw")
+        airplane_type = AirplaneType.objects.create(name="type")
+        self.airplane = Airplane.objects.create(
+            name="plane", rows=20, seats_in_row=6, airplane_type=airplane_type
+        )
+        self.departure = (timezone.now() + timezone.timedelta(days=2)).replace(
+            hour=8, minute=0, second=0, microsecond=0
+        )
+        self.paris_berlin = self._flight(self.paris, self.berlin, 0, 2)
+        self.berlin_warsaw = self._flight(self.berlin, self.warsaw, 3, 4)
+
+    def _flight(self, source, destination, departs_in, arrives_in):
+        route = Route.objects.filter(source=source, destination=destination).first()
+        if route is None:
+            route = Route.objects.create(
+                source=source, destination=destination, distance=1000
+            )
+        return Flight.objects.create(
+            route=route,
+            airplane=self.airplane,
+            departure_time=self.departure + timezone.timedelta(hours=departs_in),
+            arrival_time=self.departure + timezone.timedelta(hours=arrives_in),
+        )
+
+    def _search(self, **params):
+        params = {
+            "source": "Paris",
+            "destination": "Warsaw",
+            "date_from": self.departure.date(),
+            **params,
+        }
+        response = self.client.get(CONNECTIONS_URL, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        return [[leg["id"] for leg in itinerary["legs"]] for itinerary in response.data]
+
+    def test_connection(self):
+        response = self.client.get(
+            CONNECTIONS_URL,
+            {
+                "source": "Paris",
+                "destination": "Warsaw",
+                "date_from": self.departure.date(),
+            },
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        [itinerary] = response.data
+        self.assertEqual(
+            [leg["id"] for leg in itinerary["legs"]],
+            [self.paris_berlin.id, self.berlin_warsaw.id],
+        )
+        self.assertEqual(itinerary["duration"], 4 * 60)
+        self.assertEqual(itinerary["legs"][0]["destination"], "BER")
+        self.assertEqual(
+            itinerary["legs"][1]["tickets_available"], self.airplane.capacity
+        )
+
+    def test_connection_options(self):
+        self.assertEqual(self._search(min_connection=90), [])
+        self.assertEqual(self._search(max_legs=1), [])
+        next_day = self.departure.date() + timezone.timedelta(days=1)
+        self.assertEqual(self._search(date_from=next_day), [])
+
+    def test_invalid_params(self):
+        response = self.client.get(
+            CONNECTIONS_URL,
+            {"source": "Paris", "destination": "Warsaw", "max_legs": 4},
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.get(
+            CONNECTIONS_URL,
+            {
+                "source": "Paris",
+                "destination": "Warsaw",
+                "date_from": "2030-01-02",
+                "date_to": "2030-01-01",
+            },
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_departure_window_is_capped(self):
+        date_from = self.departure.date()
+        for days, status_code in (
+            (6, status.HTTP_200_OK),
+            (7, status.HTTP_400_BAD_REQUEST),
+        ):
+            response = self.client.get(
+                CONNECTIONS_URL,
+                {
+                    "source": "Paris",
+                    "destination": "Warsaw",
+                    "date_from": date_from,
+                    "date_to": date_from + timezone.timedelta(days=days),
+                },
+            )
+            self.assertEqual(response.status_code, status_code)
+
+    def test_graph_updated_incrementally(self):
+        self.assertEqual(
+            self._search(), [[self.paris_berlin.id, self.berlin_warsaw.id]]
+        )
+        built_at = connections._state.built_at
+
+        direct = self._flight(self.paris, self.warsaw, 1, 3)
+        self.assertEqual(
+            self._search(),
+            [[direct.id], [self.paris_berlin.id, self.berlin_warsaw.id]],
+        )
+
+        self.berlin_warsaw.departure_time = self.departure + timezone.timedelta(
+            hours=2, minutes=50
+        )
+        self.berlin_warsaw.arrival_time = self.departure + timezone.timedelta(
+            hours=2, minutes=55
+        )
+        self.berlin_warsaw.save()
+        self.assertEqual(
+            self._search(),
+            [[self.paris_berlin.id, self.berlin_warsaw.id], [direct.id]],
+        )
+
+        direct.delete()
+        self.assertEqual(
+            self._search(), [[self.paris_berlin.id, self.berlin_warsaw.id]]
+        )
+        self.assertEqual(connections._state.built_at, built_at)
+
+    def test_search_does_not_rebuild_graph(self):
+        self._search()
+
+        with self.assertNumQueries(4):
+            self._search()
@@ -0,0 +1,135 @@
+import csv
+import io
+import json
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from airport.models import (
+    Airport,
+    Route,
+    Flight,
+    AirplaneType,
+    Airplane,
+    Order,
+    Ticket,
+)
+
+
+def export_url(name, output=None):
+    url = reverse(f"airport:export-{name}")
+    return f"{url}?output={output}" if output else url
+
+
+class ExportApiTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "admin@user.com", "testpassword", is_staff=True
+        )
+        self.client.force_authenticate(self.user)
+        airport1 = Airport.objects.create(name="airport1", closest_big_city="Paris")
+        airport2 = Airport.objects.create(name="airport2", closest_big_city="Berlin")
+        route = Route.objects.create(
+            source=airport1, destination=airport2, distance=1000
+        )
+        airplane_type = AirplaneType.objects.create(name="type")
+        self.airplane = Airplane.objects.create(
+            name="plane", rows=20, seats_in_row=6, airplane_type=airplane_type
+        )
+        self.flights = [
+            Flight.objects.create(
+                route=route,
+                airplane=self.airplane,
+                departure_time=timezone.now() + timezone.timedelta(days=2, hours=index),
+                arrival_time=timezone.now() + timezone.timedelta(days=3),
+            )
+            for index in range(3)
+        ]
+        customer = get_user_model().objects.create_user(
+            "customer@user.com", "testpassword"
+        )
+        self.order = Order.objects.create(user=customer)
+        for seat in (1, 2):
+            Ticket.objects.create(
+                flight=self.flights[0], order=self.order, row=1, seat=seat
+            )
+
+    def _content(self, response):
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return b"".join(response.streaming_content).decode()
+
+    def test_export_flights_csv(self):
+        response = self.client.get(export_url("flights"))
+
+        self.assertEqual(response["Content-Type"], "text/csv")
+        self.assertIn('filename="flights.csv"', response["Content-Disposition"])
+        rows = list(csv.DictReader(io.StringIO(self._content(response))))
+        self.assertEqual(
+            [int(row["id"]) for row in rows], [flight.id for flight in self.flights]
+        )
+        self.assertEqual(rows[0]["source"], "airport1")
+        self.assertEqual(rows[0]["destination"], "airport2")
+        self.assertEqual(rows[0]["capacity"], "120")
+        self.assertEqual(rows[0]["tickets_sold"], "2")
+
+    def test_export_orders_json_lines(self):
+        response = self.client.get(export_url("orders", "jsonl"))
+
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        rows = [json.loads(line) for line in self._content(response).splitlines()]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]["id"], self.order.id)
+        self.assertEqual(rows[0]["user_id"], self.order.user_id)
+        self.assertEqual(rows[0]["tickets_count"], 2)
+
+    def test_export_tickets(self):
+        response = self.client.get(export_url("tickets", "jsonl"))
+
+        rows = [json.loads(line) for line in self._content(response).splitlines()]
+        self.assertEqual(
+            [(row["flight_id"], row["row"], row["seat"]) for row in rows],
+            [(self.flights[0].id, 1, 1), (self.flights[0].id, 1, 2)],
+        )
+        self.assertEqual(rows[0]["user_id"], self.order.user_id)
+
+    def test_export_streams_asynchronously_over_asgi(self):
+        headers = {"Authorization": f"Bearer {AccessToken.for_user(self.user)}"}
+
+        async def export():
+            response = await self.async_client.get(
+                export_url("flights"), headers=headers
+            )
+            return response, b"".join([part async for part in response])
+
+        response, content = async_to_sync(export)()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.is_async)
+        rows = list(csv.DictReader(io.StringIO(content.decode())))
+        self.assertEqual(
+            [int(row["id"]) for row in rows], [flight.id for flight in self.flights]
+        )
+
+    def test_export_reads_rows_in_one_query(self):
+        with self.assertNumQueries(1):
+            self._content(self.client.get(export_url("flights")))
+
+    def test_invalid_output(self):
+        response = self.client.get(export_url("flights", "xml"))
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_admin_required(self):
+        self.user.is_staff = False
+        self.user.save()
+
+        response = self.client.get(export_url("tickets"))
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
@@ -0,0 +1,206 @@
+import json
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from airport.models import Airport, Route, Flight, AirplaneType, Airplane, Crew
+
+IMPORT_URL = reverse("airport:flight-import-schedule")
+
+
+class FlightImportApiTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "admin@user.com", "testpassword", is_staff=True
+        )
+        self.client.force_authenticate(self.user)
+        airport1 = Airport.objects.create(name="airport1", closest_big_city="Paris")
+        airport2 = Airport.objects.create(name="airport2", closest_big_city="Berlin")
+        self.route = Route.objects.create(
+            source=airport1, destination=airport2, distance=1000
+        )
+        airplane_type = AirplaneType.objects.create(name="type")
+        self.airplane = Airplane.objects.create(
+            name="test", rows=20, seats_in_row=6, airplane_type=airplane_type
+        )
+        self.crew = [
+            Crew.objects.create(first_name="Ann", last_name="Ok"),
+            Crew.objects.create(first_name="Bob", last_name="Crab"),
+        ]
+        self.departure_time = timezone.now() + timezone.timedelta(days=2)
+
+    def _row(self, index=0, **params):
+        departure_time = self.departure_time + timezone.timedelta(hours=index)
+        row = {
+            "route": self.route.id,
+            "airplane": self.airplane.id,
+            "crew": [member.id for member in self.crew],
+            "departure_time": departure_time.isoformat(),
+            "arrival_time": (
+                departure_time + timezone.timedelta(hours=2)
+            ).isoformat(),
+        }
+        row.update(params)
+        return row
+
+    def _csv(self, rows):
+        lines = ["route,airplane,crew,departure_time,arrival_time"]
+        for row in rows:
+            crew = ";".join(str(crew_id) for crew_id in row["crew"])
+            lines.append(
+                f"{row['route']},{row['airplane']},{crew},"
+                f"{row['departure_time']},{row['arrival_time']}"
+            )
+        return "\n".join(lines) + "\n"
+
+    def _json_lines(self, rows):
+        return "".join(json.dumps(row) + "\n" for row in rows)
+
+    def test_import_csv(self):
+        response = self.client.post(
+            IMPORT_URL,
+            self._csv([self._row(index) for index in range(3)]),
+            content_type="text/csv",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data, {"created": 3})
+        self.assertEqual(Flight.objects.count(), 3)
+        for flight in Flight.objects.all():
+            self.assertEqual(set(flight.crew.all()), set(self.crew))
+            self.assertEqual(flight.tickets_available, self.airplane.capacity)
+
+    def test_import_json_lines(self):
+        rows = [self._row(0), self._row(1, crew=[])]
+        response = self.client.post(
+            IMPORT_URL, self._json_lines(rows), content_type="application/x-ndjson"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        first, second = Flight.objects.order_by("departure_time")
+        self.assertEqual(set(first.crew.all()), set(self.crew))
+        self.assertFalse(second.crew.exists())
+
+    def test_invalid_rows_import_nothing(self):
+        rows = [
+            self._row(0),
+            self._row(1, route=999),
+            self._row(2, arrival_time=self.departure_time.isoformat()),
+            self._row(3, departure_time=timezone.now().isoformat()),
+            self._row(4, crew=[self.crew[0].id, 999]),
+            self._row(5, airplane="plane"),
+        ]
+        response = self.client.post(
+            IMPORT_URL, self._csv(rows), content_type="text/csv"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Flight.objects.count(), 0)
+        errors = {error["line"]: error["errors"] for error in response.data["errors"]}
+        self.assertEqual(sorted(errors), [3, 4, 5, 6, 7])
+        self.assertIn("route", errors[3])
+        self.assertIn(
+            "Arrival time must be later than departure time.",
+            errors[4]["non_field_errors"],
+        )
+        self.assertIn(
+            "Flights must be created no later than a day before departure",
+            errors[5]["non_field_errors"],
+        )
+        self.assertEqual(
+            errors[6], {"crew": ['Invalid pk "999" - object does not exist.']}
+        )
+        self.assertIn("airplane", errors[7])
+
+    def test_malformed_json_line(self):
+        response = self.client.post(
+            IMPORT_URL,
+            self._json_lines([self._row()]) + "{not json\n",
+            content_type="application/x-ndjson",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("Line 2", response.data["detail"])
+        self.assertEqual(Flight.objects.count(), 0)
+
+    def test_malformed_csv_line(self):
+        body = self._csv([self._row()]) + "1,1,,2030-01-01," + "x" * 200000 + "\n"
+
+        response = self.client.post(IMPORT_URL, body, content_type="text/csv")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("Line 3", response.data["detail"])
+        self.assertEqual(Flight.objects.count(), 0)
+
+    def test_undecodable_line(self):
+        for content_type, body in (
+            ("text/csv", self._csv([self._row(), self._row(1)])),
+            ("application/x-ndjson", self._json_lines([self._row(), self._row(1)])),
+        ):
+            with self.subTest(content_type=content_type):
+                lines = body.encode().splitlines(keepends=True)
+                lines[-1] = lines[-1].replace(b"T", b"\xff", 1)
+
+                response = self.client.post(
+                    IMPORT_URL, b"".join(lines), content_type=content_type
+                )
+
+                self.assertEqual(
+                    response.status_code, status.HTTP_400_BAD_REQUEST
+                )
+                self.assertIn(f"Line {len(lines)}", response.data["detail"])
+                self.assertEqual(Flight.objects.count(), 0)
+
+    def test_import_query_count_does_not_grow_with_rows(self):
+        def queries(rows_count):
+            Flight.objects.all().delete()
+            body = self._json_lines([self._row(index) for index in range(rows_count)])
+            with CaptureQueriesContext(connection) as captured:
+                response = self.client.post(
+                    IMPORT_URL, body, content_type="application/x-ndjson"
+                )
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            return len(captured)
+
+        self.assertEqual(queries(2), queries(100))
+
+    def test_admin_required(self):
+        self.user.is_staff = False
+        self.user.save()
+
+        response = self.client.post(
+            IMPORT_URL, self._csv([self._row()]), content_type="text/csv"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_import_flights_command(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".csv") as schedule:
+            schedule.write(self._csv([self._row(index) for index in range(5)]))
+            schedule.flush()
+            out = StringIO()
+            call_command("import_flights", schedule.name, batch_size=2, stdout=out)
+
+        self.assertIn("Imported 5 flights", out.getvalue())
+        self.assertEqual(Flight.objects.count(), 5)
+
+    def test_import_flights_command_reports_invalid_rows(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".jsonl") as schedule:
+            schedule.write(self._json_lines([self._row(), self._row(1, route=999)]))
+            schedule.flush()
+            err = StringIO()
+            with self.assertRaises(CommandError):
+                call_command("import_flights", schedule.name, stderr=err)
+
+        self.assertIn("Line 2", err.getvalue())
+        self.assertEqual(Flight.objects.count(), 0)
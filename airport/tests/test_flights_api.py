@@ -1,14 +1,29 @@
-from datetime import datetime
+import base64
+from datetime import UTC, datetime
+from unittest import skipUnless
 
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
 from django.urls import reverse
 from django.utils import timezone
 from rest_framework import status
-from rest_framework.test import APIClient
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
 
-from airport.models import Airport, Route, Flight, AirplaneType, Airplane, Crew
+from airport.models import (
+    Airport,
+    Route,
+    Flight,
+    AirplaneType,
+    Airplane,
+    Crew,
+    Order,
+    Ticket,
+)
 from airport.serializers import FlightListSerializer
+from airport.views import FlightViewSet
 
 FLIGHTS_URL = reverse("airport:flight-list")
 
@@ -17,6 +32,10 @@ def detail_url(flight_id):
     return reverse("airport:flight-detail", args=[flight_id])
 
 
+def seats_url(flight_id):
+    return reverse("airport:flight-seats", args=[flight_id])
+
+
 class UnauthenticatedFlightApiTests(TestCase):
     def setUp(self):
         self.client = APIClient()
@@ -124,6 +143,217 @@ class AuthenticatedFlightApiTest(TestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data["count"], 1)
 
+    def _flights_departing(self, *departure_times, airplane=None):
+        return [
+            Flight.objects.create(
+                route=self.route,
+                airplane=airplane or self.airplane,
+                departure_time=departure_time,
+                arrival_time=departure_time + timezone.timedelta(hours=2),
+            )
+            for departure_time in departure_times
+        ]
+
+    def _listed_ids(self, params):
+        response = self.client.get(FLIGHTS_URL, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        return sorted(flight["id"] for flight in response.data["results"])
+
+    def test_filter_flights_by_utc_date_range(self):
+        day = datetime.combine(
+            timezone.now().date() + timezone.timedelta(days=3),
+            datetime.min.time(),
+            tzinfo=UTC,
+        )
+        before, first, last, after = self._flights_departing(
+            day - timezone.timedelta(seconds=1),
+            day,
+            day + timezone.timedelta(days=1, seconds=-1),
+            day + timezone.timedelta(days=1),
+        )
+
+        self.assertEqual(
+            self._listed_ids({"date": day.date()}), [first.id, last.id]
+        )
+        self.assertEqual(
+            self._listed_ids(
+                {
+                    "date_from": day.date(),
+                    "date_to": day.date() + timezone.timedelta(days=1),
+                }
+            ),
+            [first.id, last.id, after.id],
+        )
+        self.assertEqual(
+            self._listed_ids({"date_to": day.date() - timezone.timedelta(days=1)}),
+            [before.id],
+        )
+
+    def test_filter_flights_by_departure_time_window(self):
+        day = datetime.combine(
+            timezone.now().date() + timezone.timedelta(days=3),
+            datetime.min.time(),
+            tzinfo=UTC,
+        )
+        night, morning, evening = self._flights_departing(
+            day + timezone.timedelta(hours=1),
+            day + timezone.timedelta(hours=9),
+            day + timezone.timedelta(hours=22),
+        )
+
+        self.assertEqual(
+            self._listed_ids(
+                {"departure_after": "08:00", "departure_before": "12:00"}
+            ),
+            [morning.id],
+        )
+        self.assertEqual(
+            self._listed_ids(
+                {"departure_after": "21:00", "departure_before": "02:00"}
+            ),
+            [night.id, evening.id],
+        )
+        self.assertEqual(
+            self._listed_ids({"departure_after": "09:00"}), [morning.id, evening.id]
+        )
+
+    def test_filter_flights_by_airplane_type_and_seats(self):
+        small_airplane = Airplane.objects.create(
+            name="small",
+            rows=2,
+            seats_in_row=2,
+            airplane_type=AirplaneType.objects.create(name="small type"),
+        )
+        departure_time = timezone.now() + timezone.timedelta(days=3)
+        large_flight, small_flight = self._flights_departing(
+            departure_time
+        ) + self._flights_departing(departure_time, airplane=small_airplane)
+        small_flight.take_seats([(1, 1)])
+
+        self.assertEqual(
+            self._listed_ids({"airplane_type": small_airplane.airplane_type_id}),
+            [small_flight.id],
+        )
+        self.assertEqual(
+            self._listed_ids({"min_seats_available": 3}),
+            [large_flight.id, small_flight.id],
+        )
+        self.assertEqual(
+            self._listed_ids({"min_seats_available": 4}), [large_flight.id]
+        )
+
+    def test_invalid_flight_filters(self):
+        response = self.client.get(
+            FLIGHTS_URL,
+            {
+                "date": "tomorrow",
+                "date_from": "2030-01-02",
+                "date_to": "2030-01-01",
+                "departure_after": "25:00",
+                "min_seats_available": -1,
+            },
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            sorted(response.data),
+            ["date", "departure_after", "min_seats_available"],
+        )
+
+    def test_list_flights_with_cursor_pagination(self):
+        for days in range(1, 6):
+            Flight.objects.create(
+                route=self.route,
+                airplane=self.airplane,
+                departure_time=timezone.now() + timezone.timedelta(days=days),
+                arrival_time=timezone.now() + timezone.timedelta(days=days + 1),
+            )
+
+        response = self.client.get(FLIGHTS_URL, {"pagination": "cursor", "limit": 2})
+        flight_ids = [flight["id"] for flight in response.data["results"]]
+        while response.data["next"]:
+            response = self.client.get(response.data["next"])
+            flight_ids += [flight["id"] for flight in response.data["results"]]
+
+        self.assertNotIn("count", response.data)
+        self.assertEqual(
+            flight_ids, list(Flight.objects.values_list("id", flat=True))
+        )
+
+    def test_filter_and_order_flights_by_capacity(self):
+        small_airplane = Airplane.objects.create(
+            name="small", rows=10, seats_in_row=4, airplane_type=self.airplane_type
+        )
+        flights = [
+            Flight.objects.create(
+                route=self.route,
+                airplane=airplane,
+                departure_time=timezone.now() + timezone.timedelta(days=days),
+                arrival_time=timezone.now() + timezone.timedelta(days=days + 1),
+            )
+            for days, airplane in (
+                (1, small_airplane),
+                (2, self.airplane),
+                (3, small_airplane),
+            )
+        ]
+
+        response = self.client.get(FLIGHTS_URL, {"min_capacity": 100})
+        self.assertEqual(
+            [flight["id"] for flight in response.data["results"]], [flights[1].id]
+        )
+
+        response = self.client.get(FLIGHTS_URL, {"ordering": "capacity"})
+        self.assertEqual(
+            [flight["id"] for flight in response.data["results"]],
+            [flights[2].id, flights[0].id, flights[1].id],
+        )
+
+    def test_order_flights_by_capacity_with_cursor_pagination(self):
+        small_airplane = Airplane.objects.create(
+            name="small", rows=10, seats_in_row=4, airplane_type=self.airplane_type
+        )
+        for days in range(1, 6):
+            Flight.objects.create(
+                route=self.route,
+                airplane=small_airplane if days % 2 else self.airplane,
+                departure_time=timezone.now() + timezone.timedelta(days=days),
+                arrival_time=timezone.now() + timezone.timedelta(days=days + 1),
+            )
+
+        params = {"pagination": "cursor", "limit": 2, "ordering": "-capacity"}
+        response = self.client.get(FLIGHTS_URL, params)
+        flight_ids = [flight["id"] for flight in response.data["results"]]
+        while response.data["next"]:
+            response = self.client.get(response.data["next"])
+            flight_ids += [flight["id"] for flight in response.data["results"]]
+
+        self.assertEqual(
+            flight_ids,
+            list(
+                Flight.objects.order_by(
+                    "-airplane__capacity", "-departure_time"
+                ).values_list("id", flat=True)
+            ),
+        )
+
+    def test_list_flights_without_count(self):
+        for days in range(1, 4):
+            Flight.objects.create(
+                route=self.route,
+                airplane=self.airplane,
+                departure_time=timezone.now() + timezone.timedelta(days=days),
+                arrival_time=timezone.now() + timezone.timedelta(days=days + 1),
+            )
+
+        response = self.client.get(FLIGHTS_URL, {"count": "false", "limit": 2})
+        last_page = self.client.get(response.data["next"])
+
+        self.assertIsNone(response.data["count"])
+        self.assertEqual(len(response.data["results"]), 2)
+        self.assertEqual(len(last_page.data["results"]), 1)
+        self.assertIsNone(last_page.data["next"])
+
     def test_create_flight_forbidden(self):
         payload = {
             "route": self.route.id,
@@ -135,6 +365,79 @@ class AuthenticatedFlightApiTest(TestCase):
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
 
 
+@skipUnless(
+    connection.vendor == "postgresql",
+    "Query plans are only checked on PostgreSQL",
+)
+class FlightFilterIndexTest(TestCase):
+    """The flight filters are served by indexes on a production-sized table."""
+
+    @classmethod
+    def setUpTestData(cls):
+        airports = Airport.objects.bulk_create(
+            Airport(name=f"airport{index}", closest_big_city=f"City {index}")
+            for index in range(100)
+        )
+        Route.objects.bulk_create(
+            Route(source=source, destination=destination, distance=500)
+            for index, source in enumerate(airports)
+            for destination in airports[index + 1 :]
+        )
+        airplane = Airplane.objects.create(
+            name="test",
+            rows=10,
+            seats_in_row=4,
+            airplane_type=AirplaneType.objects.create(name="type"),
+        )
+        cls.first_date = timezone.now().date() + timezone.timedelta(days=2)
+        with connection.cursor() as cursor:
+            # 100,000 flights over 180 days, spread over all the routes
+            cursor.execute(
+                """
+                INSERT INTO airport_flight (
+                    route_id, airplane_id, departure_time, arrival_time,
+                    seat_map, tickets_sold, updated_at
+                )
+                SELECT route_ids[flight %% array_length(route_ids, 1) + 1], %s,
+                    departure_time, departure_time + interval '2 hours', '', 0, now()
+                FROM (SELECT array_agg(id) AS route_ids FROM airport_route) routes,
+                    generate_series(0, 99999) flight,
+                    LATERAL (
+                        SELECT %s::timestamptz + flight * interval '155 seconds'
+                            AS departure_time
+                    ) departure
+                """,
+                [
+                    airplane.pk,
+                    datetime.combine(cls.first_date, datetime.min.time(), UTC),
+                ],
+            )
+            cursor.execute("ANALYZE airport_route, airport_flight")
+
+    def _plan(self, params):
+        request = Request(APIRequestFactory().get(FLIGHTS_URL, params))
+        view = FlightViewSet(request=request, action="list", format_kwarg=None)
+        return view.get_queryset().explain()
+
+    def test_date_range_uses_departure_index(self):
+        plan = self._plan({"date": self.first_date + timezone.timedelta(days=30)})
+
+        self.assertIn("flight_departure_keyset_idx", plan)
+        self.assertNotIn("Seq Scan on airport_flight", plan)
+
+    def test_source_and_dates_use_route_departure_index(self):
+        plan = self._plan(
+            {
+                "source": "City 0",
+                "date_from": self.first_date,
+                "date_to": self.first_date + timezone.timedelta(days=1),
+            }
+        )
+
+        self.assertIn("flight_route_departure_idx", plan)
+        self.assertNotIn("Seq Scan on airport_flight", plan)
+
+
 class AdminMovieApiTest(TestCase):
     def setUp(self):
         self.client = APIClient()
@@ -213,3 +516,147 @@ class AdminMovieApiTest(TestCase):
         self.assertEqual(crew.count(), 2)
         self.assertIn(person1, crew)
         self.assertIn(person2, crew)
+
+
+class FlightCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "admin@user.com", "testpassword", is_staff=True
+        )
+        self.client.force_authenticate(self.user)
+        airport1 = Airport.objects.create(name="airport1", closest_big_city="Paris")
+        airport2 = Airport.objects.create(name="airport2", closest_big_city="Berlin")
+        route = Route.objects.create(
+            source=airport1, destination=airport2, distance=5000
+        )
+        airplane_type = AirplaneType.objects.create(name="type")
+        airplane = Airplane.objects.create(
+            name="test", rows=10, seats_in_row=4, airplane_type=airplane_type
+        )
+        self.flight = Flight.objects.create(
+            route=route,
+            airplane=airplane,
+            departure_time=timezone.now() + timezone.timedelta(days=2),
+            arrival_time=timezone.now() + timezone.timedelta(days=3),
+        )
+
+    def test_list_served_from_cache(self):
+        first = self.client.get(FLIGHTS_URL)
+        second = self.client.get(FLIGHTS_URL)
+
+        self.assertEqual(first["X-Cache"], "MISS")
+        self.assertEqual(second["X-Cache"], "HIT")
+        self.assertEqual(first.data, second.data)
+
+    def test_not_modified_from_cache_without_queries(self):
+        etag = self.client.get(detail_url(self.flight.id))["ETag"]
+
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                detail_url(self.flight.id), HTTP_IF_NONE_MATCH=etag
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["X-Cache"], "HIT")
+
+    def test_sold_ticket_invalidates_list_and_detail(self):
+        self.client.get(FLIGHTS_URL)
+        self.client.get(detail_url(self.flight.id))
+
+        self.client.post(
+            reverse("airport:order-list"),
+            {"tickets": [{"flight": self.flight.id, "row": 1, "seat": 1}]},
+            format="json",
+        )
+        list_response = self.client.get(FLIGHTS_URL)
+        detail_response = self.client.get(detail_url(self.flight.id))
+
+        self.assertEqual(list_response["X-Cache"], "MISS")
+        self.assertEqual(list_response.data["results"][0]["tickets_available"], 39)
+        self.assertEqual(detail_response["X-Cache"], "MISS")
+        self.assertEqual(detail_response.data["taken_places"], [{"row": 1, "seat": 1}])
+
+    def test_crew_change_invalidates_detail(self):
+        crew = Crew.objects.create(first_name="Ann", last_name="Ok")
+        self.client.get(detail_url(self.flight.id))
+
+        self.flight.crew.add(crew)
+        response = self.client.get(detail_url(self.flight.id))
+
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(len(response.data["crew"]), 1)
+
+    def test_crew_change_changes_list_etag(self):
+        crew = Crew.objects.create(first_name="Ann", last_name="Ok")
+        etag = self.client.get(FLIGHTS_URL)["ETag"]
+
+        self.flight.crew.add(crew)
+        response = self.client.get(FLIGHTS_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["results"][0]["crew"]), 1)
+
+    def test_cache_stats(self):
+        self.client.get(FLIGHTS_URL)
+        self.client.get(FLIGHTS_URL)
+
+        response = self.client.get(reverse("airport:flight-cache-stats"))
+
+        self.assertEqual(response.data, {"hits": 1, "misses": 1})
+
+
+class FlightSeatMapApiTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "test@user.com", "testpassword"
+        )
+        self.client.force_authenticate(self.user)
+        airport1 = Airport.objects.create(name="airport1", closest_big_city="Paris")
+        airport2 = Airport.objects.create(name="airport2", closest_big_city="Berlin")
+        route = Route.objects.create(
+            source=airport1, destination=airport2, distance=5000
+        )
+        airplane_type = AirplaneType.objects.create(name="type")
+        airplane = Airplane.objects.create(
+            name="test", rows=3, seats_in_row=4, airplane_type=airplane_type
+        )
+        self.flight = Flight.objects.create(
+            route=route,
+            airplane=airplane,
+            departure_time=timezone.now() + timezone.timedelta(days=2),
+            arrival_time=timezone.now() + timezone.timedelta(days=3),
+        )
+        self.order = Order.objects.create(user=self.user)
+        Ticket.objects.create(flight=self.flight, row=1, seat=2, order=self.order)
+        Ticket.objects.create(flight=self.flight, row=1, seat=3, order=self.order)
+
+    def test_seat_map_bitmap(self):
+        response = self.client.get(seats_url(self.flight.id))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["rows"], 3)
+        self.assertEqual(response.data["seats_in_row"], 4)
+        self.assertEqual(
+            base64.b64decode(response.data["seat_map"]), bytes([0b01100000, 0])
+        )
+
+    def test_seat_map_rle(self):
+        response = self.client.get(seats_url(self.flight.id), {"encoding": "rle"})
+
+        self.assertEqual(response.data["seat_map"], [1, 2, 9])
+
+    def test_seat_map_not_modified_until_ticket_sold(self):
+        etag = self.client.get(seats_url(self.flight.id))["ETag"]
+
+        not_modified = self.client.get(
+            seats_url(self.flight.id), HTTP_IF_NONE_MATCH=etag
+        )
+        Ticket.objects.create(flight=self.flight, row=3, seat=4, order=self.order)
+        modified = self.client.get(seats_url(self.flight.id), HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(modified.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(modified["ETag"], etag)
@@ -0,0 +1,64 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from airport.models import Flight, Order, Route, Ticket
+from airport.seat_map import SeatMap
+
+
+def generate(**options):
+    defaults = {
+        "airports": 10,
+        "routes": 20,
+        "airplanes": 4,
+        "crew": 10,
+        "users": 5,
+        "flights": 30,
+        "tickets": 500,
+        "batch_size": 7,
+        "stdout": StringIO(),
+    }
+    defaults.update(options)
+    call_command("generate_airport_data", **defaults)
+
+
+class GenerateAirportDataTest(TestCase):
+    def test_generated_data_is_consistent(self):
+        generate()
+
+        self.assertEqual(Route.objects.count(), 20)
+        self.assertEqual(Flight.objects.count(), 30)
+        self.assertEqual(Ticket.objects.count(), 500)
+        self.assertFalse(Order.objects.filter(tickets__isnull=True).exists())
+
+        pairs = {
+            frozenset(pair)
+            for pair in Route.objects.values_list("source_id", "destination_id")
+        }
+        self.assertEqual(len(pairs), 20)
+        self.assertTrue(all(len(pair) == 2 for pair in pairs))
+
+        for flight in Flight.objects.select_related("airplane").prefetch_related(
+            "tickets"
+        ):
+            places = sorted((ticket.row, ticket.seat) for ticket in flight.tickets.all())
+            self.assertEqual(sorted(SeatMap.for_flight(flight).taken_places()), places)
+            self.assertEqual(flight.tickets_sold, len(places))
+            self.assertGreater(flight.arrival_time, flight.departure_time)
+            self.assertTrue(2 <= flight.crew.count() <= 5)
+
+    def test_same_seed_generates_same_data(self):
+        def snapshot():
+            return list(
+                Flight.objects.order_by("id").values_list(
+                    "route__distance", "airplane__rows", "tickets_sold", "seat_map"
+                )
+            )
+
+        generate(seed=7)
+        first = snapshot()
+        Flight.objects.all().delete()
+        generate(seed=7)
+
+        self.assertEqual(snapshot(), first)
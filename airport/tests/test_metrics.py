@@ -0,0 +1,173 @@
+import os
+import statistics
+import time
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from airport import metrics
+from airport.models import Airport
+
+AIRPORT_URL = reverse("airport:airport-list")
+METRICS_URL = reverse("metrics")
+
+
+class MetricsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        metrics._process = metrics._ProcessMetrics()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "test@user.com", "testpassword"
+        )
+        self.client.force_authenticate(self.user)
+        Airport.objects.create(name="Heathrow", closest_big_city="London")
+
+    def _metrics(self, **headers):
+        return APIClient().get(METRICS_URL, headers=headers)
+
+    def _bearer(self, user):
+        return f"Bearer {AccessToken.for_user(user)}"
+
+    def _staff(self):
+        return get_user_model().objects.create_user(
+            "admin@user.com", "testpassword", is_staff=True
+        )
+
+    def test_request_is_recorded_by_action(self):
+        with self.assertNumQueries(3):
+            self.client.get(AIRPORT_URL)
+        requests, histograms = metrics.collect()
+
+        self.assertEqual(requests, {("AirportViewSet.list", "GET", 200): 1})
+        queries = histograms[("airport_db_queries", "AirportViewSet.list")]
+        self.assertEqual(queries[-2:], [3, 1])
+        render = histograms[("airport_render_duration_seconds", "AirportViewSet.list")]
+        self.assertGreater(render[-2], 0)
+
+    def test_render(self):
+        self.client.get(AIRPORT_URL)
+        self.client.get(reverse("airport:airport-detail", args=[0]))
+        response = self._metrics(Authorization=self._bearer(self._staff()))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], metrics.CONTENT_TYPE)
+        content = response.content.decode()
+        self.assertIn(
+            'airport_requests_total{view="AirportViewSet.list",method="GET",'
+            'status="200"} 1',
+            content,
+        )
+        self.assertIn(
+            'airport_requests_total{view="AirportViewSet.retrieve",method="GET",'
+            'status="404"} 1',
+            content,
+        )
+        self.assertIn(
+            'airport_db_queries_bucket{view="AirportViewSet.list",le="3"} 1',
+            content,
+        )
+        self.assertIn(
+            'airport_db_queries_bucket{view="AirportViewSet.list",le="2"} 0',
+            content,
+        )
+        self.assertIn(
+            'airport_request_duration_seconds_count{view="AirportViewSet.list"} 1',
+            content,
+        )
+        self.assertNotIn("metrics_view", content)
+
+    @override_settings(METRICS_TOKEN="secret")
+    def test_token(self):
+        self.assertEqual(
+            self._metrics().status_code, status.HTTP_401_UNAUTHORIZED
+        )
+        self.assertEqual(
+            self._metrics(Authorization="Bearer wrong").status_code,
+            status.HTTP_401_UNAUTHORIZED,
+        )
+        self.assertEqual(
+            self._metrics(Authorization="Bearer secret").status_code,
+            status.HTTP_200_OK,
+        )
+        self.assertEqual(
+            self._metrics(Authorization=self._bearer(self._staff())).status_code,
+            status.HTTP_200_OK,
+        )
+
+    @override_settings(METRICS_TOKEN=None, DEBUG=False)
+    def test_staff_required_without_token(self):
+        self.assertEqual(
+            self._metrics().status_code, status.HTTP_401_UNAUTHORIZED
+        )
+        self.assertEqual(
+            self._metrics(Authorization=self._bearer(self.user)).status_code,
+            status.HTTP_401_UNAUTHORIZED,
+        )
+        staff = self._staff()
+        self.assertEqual(
+            self._metrics(Authorization=self._bearer(staff)).status_code,
+            status.HTTP_200_OK,
+        )
+        client = APIClient()
+        client.force_login(staff)
+        self.assertEqual(client.get(METRICS_URL).status_code, status.HTTP_200_OK)
+
+        with self.settings(DEBUG=True):
+            self.assertEqual(self._metrics().status_code, status.HTTP_200_OK)
+
+    def test_processes_are_merged(self):
+        self.client.get(AIRPORT_URL)
+        metrics.flush(force=True)
+        other = {"requests": {("AirportViewSet.list", "GET", 200): 2}}
+        other["histograms"] = {}
+        cache.set(metrics._slot_key(cache.incr(metrics.SLOTS_KEY)), other)
+
+        requests, _ = metrics.collect()
+
+        self.assertEqual(requests, {("AirportViewSet.list", "GET", 200): 3})
+
+    def test_exited_process_keeps_counting(self):
+        self.client.get(AIRPORT_URL)
+        metrics.flush(force=True)
+        # A new process takes a slot of its own
+        metrics._process = metrics._ProcessMetrics()
+        self.client.get(AIRPORT_URL)
+
+        requests, _ = metrics.collect()
+
+        self.assertEqual(requests, {("AirportViewSet.list", "GET", 200): 2})
+        self.assertEqual(cache.get(metrics.SLOTS_KEY), 2)
+
+    @skipUnless(
+        os.environ.get("AIRPORT_BENCHMARK_LATENCY") == "1",
+        "set AIRPORT_BENCHMARK_LATENCY=1 to measure the overhead",
+    )
+    def test_overhead(self):
+        def median_ms():
+            latencies = []
+            for _ in range(100):
+                # Stay under the user throttle rate
+                cache.clear()
+                started_at = time.perf_counter()
+                self.client.get(AIRPORT_URL)
+                latencies.append(time.perf_counter() - started_at)
+            return statistics.median(latencies) * 1000
+
+        with_metrics, without_metrics = [], []
+        median_ms()
+        # Alternate the runs, so both see the same machine load
+        for _ in range(5):
+            with_metrics.append(median_ms())
+            with self.modify_settings(
+                MIDDLEWARE={"remove": "airport.metrics.MetricsMiddleware"}
+            ):
+                without_metrics.append(median_ms())
+
+        self.assertLess(min(with_metrics), min(without_metrics) * 1.05)
@@ -1,13 +1,27 @@
 import time
+from io import StringIO
 
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from airport.models import Airport, Route, Flight, AirplaneType, Airplane, Order, Ticket
+from airport.models import (
+    Airport,
+    Route,
+    Flight,
+    AirplaneType,
+    Airplane,
+    Order,
+    Ticket,
+    Crew,
+)
+from airport.seat_map import SeatMap
 
 ORDER_URL = reverse("airport:order-list")
 FLIGHTS_URL = reverse("airport:flight-list")
@@ -83,3 +97,340 @@ class AuthenticatedOrderApiTest(TestCase):
         Ticket.objects.create(flight=self.flight, row=2, seat=8, order=order)
         response = self.client.get(FLIGHTS_URL)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class AdminOrderApiTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "admin@user.com", "testpassword", is_staff=True
+        )
+        self.client.force_authenticate(self.user)
+        airport1 = Airport.objects.create(name="airport1", closest_big_city="Paris")
+        airport2 = Airport.objects.create(name="airport2", closest_big_city="Berlin")
+        route = Route.objects.create(
+            source=airport1, destination=airport2, distance=5000
+        )
+        airplane_type = AirplaneType.objects.create(name="type")
+        self.airplane = Airplane.objects.create(
+            name="test", rows=10, seats_in_row=4, airplane_type=airplane_type
+        )
+        self.flight = Flight.objects.create(
+            route=route,
+            airplane=self.airplane,
+            departure_time=timezone.now() + timezone.timedelta(days=2),
+            arrival_time=timezone.now() + timezone.timedelta(days=3),
+        )
+
+    @override_settings(QUERY_INSPECTOR_MODE="raise")
+    def test_create_order_with_many_tickets(self):
+        payload = {
+            "tickets": [
+                {"flight": self.flight.id, "row": row, "seat": seat}
+                for row in range(1, 11)
+                for seat in range(1, 5)
+            ]
+        }
+        response = self.client.post(ORDER_URL, payload, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Ticket.objects.filter(flight=self.flight).count(), 40)
+
+    def test_create_order_with_taken_seat(self):
+        order = Order.objects.create(user=self.user)
+        Ticket.objects.create(flight=self.flight, row=1, seat=1, order=order)
+        payload = {
+            "tickets": [
+                {"flight": self.flight.id, "row": 1, "seat": 2},
+                {"flight": self.flight.id, "row": 1, "seat": 1},
+            ]
+        }
+        response = self.client.post(ORDER_URL, payload, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(
+            response.data["taken_seats"],
+            [{"flight": self.flight.id, "row": 1, "seat": 1}],
+        )
+        self.assertEqual(Ticket.objects.filter(flight=self.flight).count(), 1)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_create_order_with_drifted_seat_map(self):
+        order = Order.objects.create(user=self.user)
+        Ticket.objects.create(flight=self.flight, row=1, seat=1, order=order)
+        Flight.objects.filter(pk=self.flight.pk).update(seat_map=b"")
+        payload = {"tickets": [{"flight": self.flight.id, "row": 1, "seat": 1}]}
+
+        response = self.client.post(ORDER_URL, payload, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(len(response.data["taken_seats"]), 1)
+
+    def test_create_order_with_duplicated_seat(self):
+        payload = {
+            "tickets": [
+                {"flight": self.flight.id, "row": 1, "seat": 2},
+                {"flight": self.flight.id, "row": 1, "seat": 2},
+            ]
+        }
+        response = self.client.post(ORDER_URL, payload, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Ticket.objects.exists())
+
+    def test_create_order_with_seat_out_of_range(self):
+        payload = {"tickets": [{"flight": self.flight.id, "row": 11, "seat": 1}]}
+        response = self.client.post(ORDER_URL, payload, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("row", response.data["tickets"][0])
+
+    def test_create_order_updates_seat_map(self):
+        payload = {
+            "tickets": [
+                {"flight": self.flight.id, "row": 3, "seat": 2},
+                {"flight": self.flight.id, "row": 1, "seat": 4},
+            ]
+        }
+        self.client.post(ORDER_URL, payload, format="json")
+
+        response = self.client.get(detail_flight_url(self.flight.id))
+
+        self.assertEqual(
+            response.data["taken_places"],
+            [{"row": 1, "seat": 4}, {"row": 3, "seat": 2}],
+        )
+        list_response = self.client.get(FLIGHTS_URL)
+        self.assertEqual(list_response.data["results"][0]["tickets_available"], 38)
+
+    def test_delete_ticket_releases_seat(self):
+        order = Order.objects.create(user=self.user)
+        Ticket.objects.create(flight=self.flight, row=2, seat=3, order=order)
+        order.delete()
+
+        response = self.client.get(detail_flight_url(self.flight.id))
+
+        self.assertEqual(response.data["taken_places"], [])
+
+    def test_delete_order_releases_seats_per_flight(self):
+        other_flight = Flight.objects.create(
+            route=self.flight.route,
+            airplane=self.airplane,
+            departure_time=self.flight.departure_time,
+            arrival_time=self.flight.arrival_time,
+        )
+        order = Order.objects.create(user=self.user)
+        for row in (1, 2):
+            for seat in range(1, 5):
+                for flight in (self.flight, other_flight):
+                    Ticket.objects.create(
+                        flight=flight, row=row, seat=seat, order=order
+                    )
+
+        with CaptureQueriesContext(connection) as queries:
+            order.delete()
+
+        # The tickets are collected and their seats loaded once, then each
+        # flight is locked and saved once in a savepoint, whatever the
+        # number of tickets
+        self.assertEqual(len(queries), 12, [query["sql"] for query in queries])
+        for flight in (self.flight, other_flight):
+            flight.refresh_from_db()
+            self.assertEqual(flight.tickets_sold, 0)
+            self.assertEqual(flight.tickets_available, 40)
+
+    def _change_airplane(self, airplane):
+        crew = Crew.objects.create(first_name="Ann", last_name="Ok")
+        return self.client.put(
+            detail_flight_url(self.flight.id),
+            {
+                "route": self.flight.route_id,
+                "airplane": airplane.id,
+                "crew": [crew.id],
+                "departure_time": self.flight.departure_time,
+                "arrival_time": self.flight.arrival_time,
+            },
+            format="json",
+        )
+
+    def test_airplane_change_keeps_sold_seats_on_map(self):
+        order = Order.objects.create(user=self.user)
+        Ticket.objects.create(flight=self.flight, row=9, seat=4, order=order)
+        smaller = Airplane.objects.create(
+            name="smaller",
+            rows=5,
+            seats_in_row=4,
+            airplane_type=self.airplane.airplane_type,
+        )
+        larger = Airplane.objects.create(
+            name="larger",
+            rows=20,
+            seats_in_row=6,
+            airplane_type=self.airplane.airplane_type,
+        )
+
+        response = self._change_airplane(smaller)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("airplane", response.data)
+        self.flight.refresh_from_db()
+        self.assertEqual(self.flight.airplane, self.airplane)
+
+        response = self._change_airplane(larger)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.flight.refresh_from_db()
+        self.assertEqual(
+            list(SeatMap.for_flight(self.flight).taken_places()), [(9, 4)]
+        )
+
+    def test_delete_order_with_seat_off_the_map(self):
+        order = Order.objects.create(user=self.user)
+        Ticket.objects.create(flight=self.flight, row=9, seat=4, order=order)
+        smaller = Airplane.objects.create(
+            name="smaller",
+            rows=5,
+            seats_in_row=4,
+            airplane_type=self.airplane.airplane_type,
+        )
+        Flight.objects.filter(pk=self.flight.pk).update(airplane=smaller)
+
+        order.delete()
+
+        self.flight.refresh_from_db()
+        self.assertEqual(self.flight.tickets_sold, 0)
+        self.assertEqual(SeatMap.for_flight(self.flight).taken_count, 0)
+
+    def test_move_ticket_to_another_flight(self):
+        other_flight = Flight.objects.create(
+            route=self.flight.route,
+            airplane=self.airplane,
+            departure_time=self.flight.departure_time,
+            arrival_time=self.flight.arrival_time,
+        )
+        order = Order.objects.create(user=self.user)
+        ticket = Ticket.objects.create(flight=self.flight, row=2, seat=3, order=order)
+        self.client.get(detail_flight_url(self.flight.id))
+
+        ticket.flight = other_flight
+        ticket.row = 4
+        ticket.save()
+
+        self.flight.refresh_from_db()
+        other_flight.refresh_from_db()
+        self.assertEqual(self.flight.tickets_sold, 0)
+        self.assertEqual(list(SeatMap.for_flight(self.flight).taken_places()), [])
+        self.assertEqual(other_flight.tickets_sold, 1)
+        self.assertEqual(
+            list(SeatMap.for_flight(other_flight).taken_places()), [(4, 3)]
+        )
+        response = self.client.get(detail_flight_url(self.flight.id))
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.data["taken_places"], [])
+
+    def test_rebuild_seat_maps(self):
+        order = Order.objects.create(user=self.user)
+        Ticket.objects.create(flight=self.flight, row=5, seat=1, order=order)
+        Flight.objects.filter(pk=self.flight.pk).update(seat_map=b"")
+
+        call_command("rebuild_seat_maps", stdout=StringIO())
+
+        self.flight.refresh_from_db()
+        self.assertEqual(self.flight.tickets_available, 39)
+
+    def test_reconcile_flight_counters(self):
+        order = Order.objects.create(user=self.user)
+        Ticket.objects.create(flight=self.flight, row=5, seat=1, order=order)
+        Ticket.objects.create(flight=self.flight, row=5, seat=2, order=order)
+        Flight.objects.filter(pk=self.flight.pk).update(tickets_sold=7, seat_map=b"")
+
+        call_command("reconcile_flight_counters", stdout=StringIO())
+
+        self.flight.refresh_from_db()
+        self.assertEqual(self.flight.tickets_sold, 2)
+        self.assertEqual(self.flight.tickets_available, 38)
+        response = self.client.get(detail_flight_url(self.flight.id))
+        self.assertEqual(len(response.data["taken_places"]), 2)
+
+    def test_reconcile_seat_map(self):
+        order = Order.objects.create(user=self.user)
+        Ticket.objects.create(flight=self.flight, row=5, seat=1, order=order)
+        seat_map = SeatMap.for_flight(self.flight)
+        seat_map.release(5, 1)
+        seat_map.take(1, 1)
+        Flight.objects.filter(pk=self.flight.pk).update(seat_map=seat_map.to_bytes())
+
+        out = StringIO()
+        call_command("reconcile_flight_counters", "--dry-run", stdout=out)
+        self.assertIn(
+            f"Flight {self.flight.id}: seat map differs from the tickets",
+            out.getvalue(),
+        )
+        self.assertIn("Fixed 0 flights", out.getvalue())
+
+        call_command("reconcile_flight_counters", stdout=StringIO())
+
+        response = self.client.get(detail_flight_url(self.flight.id))
+        self.assertEqual(response.data["taken_places"], [{"row": 5, "seat": 1}])
+        out = StringIO()
+        call_command("reconcile_flight_counters", stdout=out)
+        self.assertIn("Fixed 0 flights", out.getvalue())
+
+
+class OrderHistoryQueryCountTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "test@user.com", "testpassword"
+        )
+        self.client.force_authenticate(self.user)
+        airport_type = AirplaneType.objects.create(name="type")
+        self.airplane = Airplane.objects.create(
+            name="test", rows=20, seats_in_row=6, airplane_type=airport_type
+        )
+        airports = [
+            Airport.objects.create(name=f"airport{i}", closest_big_city=f"City{i}")
+            for i in range(3)
+        ]
+        self.routes = [
+            Route.objects.create(
+                source=airports[0], destination=airports[1], distance=100
+            ),
+            Route.objects.create(
+                source=airports[1], destination=airports[2], distance=200
+            ),
+        ]
+        self.crew = [
+            Crew.objects.create(first_name=f"First{i}", last_name=f"Last{i}")
+            for i in range(3)
+        ]
+
+    def _create_orders(self, orders_count, tickets_per_order):
+        for order_index in range(orders_count):
+            flight = Flight.objects.create(
+                route=self.routes[order_index % 2],
+                airplane=self.airplane,
+                departure_time=timezone.now() + timezone.timedelta(days=1),
+                arrival_time=timezone.now() + timezone.timedelta(days=2),
+            )
+            flight.crew.set(self.crew)
+            order = Order.objects.create(user=self.user)
+            for seat in range(1, tickets_per_order + 1):
+                Ticket.objects.create(flight=flight, row=1, seat=seat, order=order)
+
+    def test_order_list_query_count_is_constant(self):
+        self._create_orders(orders_count=1, tickets_per_order=1)
+        with CaptureQueriesContext(connection) as small_history:
+            small_response = self.client.get(ORDER_URL)
+
+        self._create_orders(orders_count=9, tickets_per_order=5)
+        with CaptureQueriesContext(connection) as long_history:
+            long_response = self.client.get(ORDER_URL)
+
+        self.assertEqual(len(small_response.data["results"]), 1)
+        self.assertEqual(len(long_response.data["results"]), 10)
+        self.assertEqual(len(small_history), len(long_history))
+        self.assertLessEqual(len(long_history), 6)
+        ticket = long_response.data["results"][0]["tickets"][0]
+        self.assertEqual(ticket["flight"]["tickets_available"], 115)
+        self.assertEqual(len(ticket["flight"]["crew"]), 3)
@@ -0,0 +1,108 @@
+import os
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from airport.models import Airport, Route, Flight, AirplaneType, Airplane, Ticket
+
+ORDER_URL = reverse("airport:order-list")
+BUYERS = int(os.environ.get("AIRPORT_CONCURRENT_BUYERS", 100))
+MAX_ORDER_SECONDS = float(os.environ.get("AIRPORT_MAX_ORDER_SECONDS", 5))
+
+
+@skipUnless(
+    connection.vendor == "postgresql",
+    "Row locks are only exercised on PostgreSQL",
+)
+# Queries of the racing orders wait for the flight locks, they are slow on purpose
+@override_settings(QUERY_INSPECTOR_MODE=None)
+class ConcurrentOrderTest(TransactionTestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            "admin@user.com", "testpassword", is_staff=True
+        )
+        airport1 = Airport.objects.create(name="airport1", closest_big_city="Paris")
+        airport2 = Airport.objects.create(name="airport2", closest_big_city="Berlin")
+        route = Route.objects.create(
+            source=airport1, destination=airport2, distance=5000
+        )
+        airplane_type = AirplaneType.objects.create(name="type")
+        airplane = Airplane.objects.create(
+            name="test", rows=50, seats_in_row=4, airplane_type=airplane_type
+        )
+        self.flight = Flight.objects.create(
+            route=route,
+            airplane=airplane,
+            departure_time=timezone.now() + timezone.timedelta(days=2),
+            arrival_time=timezone.now() + timezone.timedelta(days=3),
+        )
+
+    def _buy_concurrently(self, payloads):
+        start = threading.Barrier(len(payloads))
+
+        def buy(payload):
+            client = APIClient()
+            client.force_authenticate(self.user)
+            start.wait()
+            started_at = time.perf_counter()
+            try:
+                response = client.post(ORDER_URL, payload, format="json")
+            finally:
+                connection.close()
+            return response.status_code, time.perf_counter() - started_at
+
+        with ThreadPoolExecutor(max_workers=len(payloads)) as executor:
+            return list(executor.map(buy, payloads))
+
+    def _assert_latency(self, results):
+        latencies = sorted(latency for _, latency in results)
+        p95 = latencies[int(len(latencies) * 0.95) - 1]
+        self.assertLess(
+            max(latencies),
+            MAX_ORDER_SECONDS,
+            f"median {statistics.median(latencies):.3f}s, p95 {p95:.3f}s",
+        )
+
+    def test_same_seat_is_sold_once(self):
+        payload = {"tickets": [{"flight": self.flight.id, "row": 7, "seat": 2}]}
+
+        results = self._buy_concurrently([payload] * BUYERS)
+
+        statuses = [status_code for status_code, _ in results]
+        self.assertEqual(statuses.count(status.HTTP_201_CREATED), 1)
+        self.assertEqual(statuses.count(status.HTTP_409_CONFLICT), BUYERS - 1)
+        self.assertEqual(Ticket.objects.filter(flight=self.flight).count(), 1)
+        self._assert_latency(results)
+
+    def test_overlapping_orders_never_double_book(self):
+        payloads = [
+            {
+                "tickets": [
+                    {"flight": self.flight.id, "row": buyer % 50 + 1, "seat": 1},
+                    {"flight": self.flight.id, "row": (buyer + 1) % 50 + 1, "seat": 1},
+                ]
+            }
+            for buyer in range(BUYERS)
+        ]
+
+        results = self._buy_concurrently(payloads)
+
+        sold = Ticket.objects.filter(flight=self.flight)
+        self.flight.refresh_from_db()
+        created = [s for s, _ in results].count(status.HTTP_201_CREATED)
+        self.assertEqual(sold.count(), created * 2)
+        self.assertEqual(
+            sold.values("row", "seat").distinct().count(), sold.count()
+        )
+        self.assertEqual(self.flight.tickets_sold, sold.count())
+        self._assert_latency(results)
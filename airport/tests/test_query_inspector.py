@@ -0,0 +1,121 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from airport.models import Airplane, AirplaneType, Airport, Crew, Flight, Route
+from airport.query_inspector import QueryInspector, QueryProblems, query_template
+from airport.serializers import FlightListSerializer
+from airport.views import FlightViewSet
+
+FLIGHTS_URL = reverse("airport:flight-list")
+
+
+class QueryTemplateTest(TestCase):
+    def test_in_lists_are_collapsed(self):
+        self.assertEqual(
+            query_template('SELECT * FROM "t"\n WHERE "id" IN (%s, %s, %s)'),
+            query_template('SELECT * FROM "t" WHERE "id" IN (%s, %s)'),
+        )
+        self.assertEqual(
+            query_template('SELECT * FROM "t" WHERE "id" IN (%s, %s)'),
+            'SELECT * FROM "t" WHERE "id" IN (%s, ...)',
+        )
+
+
+class QueryInspectorTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "test@user.com", "testpassword"
+        )
+        self.client.force_authenticate(self.user)
+        airports = [
+            Airport.objects.create(name=f"Airport {index}", closest_big_city="City")
+            for index in range(2)
+        ]
+        route = Route.objects.create(
+            source=airports[0], destination=airports[1], distance=500
+        )
+        airplane = Airplane.objects.create(
+            name="Airplane",
+            rows=10,
+            seats_in_row=4,
+            airplane_type=AirplaneType.objects.create(name="Type"),
+        )
+        crew = Crew.objects.create(first_name="First", last_name="Last")
+        departure_time = timezone.now() + timezone.timedelta(days=1)
+        for index in range(3):
+            flight = Flight.objects.create(
+                route=route,
+                airplane=airplane,
+                departure_time=departure_time + timezone.timedelta(hours=index),
+                arrival_time=departure_time + timezone.timedelta(hours=index + 2),
+            )
+            flight.crew.add(crew)
+
+    def test_repeated_query_is_attributed_to_field(self):
+        flights = Flight.objects.select_related(
+            "route__source", "route__destination", "airplane"
+        ).with_seats_held()
+
+        with QueryInspector(repeat=3) as inspector:
+            FlightListSerializer(flights, many=True).data
+
+        problems = inspector.problems()
+        self.assertEqual(len(problems), 1)
+        self.assertTrue(
+            problems[0].startswith("N+1: 3 queries from FlightListSerializer.crew")
+        )
+
+    def test_prefetched_query_is_not_reported(self):
+        flights = (
+            Flight.objects.select_related(
+                "route__source", "route__destination", "airplane"
+            )
+            .prefetch_related("crew")
+            .with_seats_held()
+        )
+
+        with QueryInspector(repeat=3) as inspector:
+            FlightListSerializer(flights, many=True).data
+
+        self.assertEqual(inspector.problems(), [])
+
+    def test_slow_query(self):
+        with QueryInspector(slow_ms=0) as inspector:
+            Airport.objects.count()
+
+        problems = inspector.problems()
+        self.assertEqual(len(problems), 1)
+        self.assertTrue(problems[0].startswith("Slow: "))
+        self.assertIn(" ms from view: SELECT COUNT(*)", problems[0])
+
+    @override_settings(QUERY_INSPECTOR_MODE="raise")
+    def test_middleware_raises_on_missing_prefetch(self):
+        response = self.client.get(FLIGHTS_URL)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        cache.clear()
+        queryset = FlightViewSet.queryset.prefetch_related(None)
+        with mock.patch.object(FlightViewSet, "queryset", queryset):
+            with self.assertRaisesMessage(
+                QueryProblems, "GET /api/airport/flights/: 1 query problem(s)"
+            ):
+                self.client.get(FLIGHTS_URL)
+
+    @override_settings(QUERY_INSPECTOR_MODE="log")
+    def test_middleware_logs(self):
+        queryset = FlightViewSet.queryset.prefetch_related(None)
+        with mock.patch.object(FlightViewSet, "queryset", queryset):
+            with self.assertLogs("airport.query_inspector", "WARNING") as logs:
+                response = self.client.get(FLIGHTS_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("FlightListSerializer.crew", logs.output[0])
@@ -1,10 +1,15 @@
+from unittest import mock
+
 from django.contrib.auth import get_user_model
+from django.db import IntegrityError, connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
+from rest_framework.exceptions import ValidationError
 from rest_framework.test import APIClient
 
-from airport.models import Airport, Route
+from airport.models import ROUTE_EXISTS_ERROR, Airport, Route
 from airport.serializers import RouteListSerializer
 
 ROUTE_URL = reverse("airport:route-list")
@@ -136,6 +141,22 @@ class AdminRouteApiTest(TestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(actual_data, serializer.data)
 
+    def test_filter_resolves_city_once(self):
+        Route.objects.create(
+            source=self.airport1, destination=self.airport2, distance=30
+        )
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(ROUTE_URL, {"destination": "Berlin"})
+
+        self.assertEqual(response.data["count"], 1)
+        lookups = [
+            query
+            for query in queries
+            if 'FROM "airport_airport" WHERE' in query["sql"]
+        ]
+        self.assertEqual(len(lookups), 1)
+
     def test_create_route(self):
         payload = {
             "source": self.airport2.id,
@@ -144,3 +165,115 @@ class AdminRouteApiTest(TestCase):
         }
         response = self.client.post(ROUTE_URL, payload)
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_create_route_single_validation_query(self):
+        route = Route(source=self.airport1, destination=self.airport3, distance=100)
+
+        with CaptureQueriesContext(connection) as queries:
+            route.save()
+
+        selects = [query for query in queries if query["sql"].startswith("SELECT")]
+        self.assertEqual(len(selects), 1)
+
+    def test_concurrently_created_route_rejected(self):
+        payload = {
+            "source": self.airport2.id,
+            "destination": self.airport1.id,
+            "distance": 30,
+        }
+        Route.objects.create(
+            source=self.airport1, destination=self.airport2, distance=30
+        )
+
+        # As if the route was created after the check of this request
+        with mock.patch.object(Route, "validate_route"):
+            response = self.client.post(ROUTE_URL, payload)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, [ROUTE_EXISTS_ERROR])
+        self.assertEqual(Route.objects.count(), 1)
+
+    def test_create_reverse_route_rejected(self):
+        Route.objects.create(
+            source=self.airport1, destination=self.airport2, distance=30
+        )
+        payload = {
+            "source": self.airport2.id,
+            "destination": self.airport1.id,
+            "distance": 30,
+        }
+
+        response = self.client.post(ROUTE_URL, payload)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Route.objects.count(), 1)
+
+    def test_create_route_same_airports_rejected(self):
+        payload = {
+            "source": self.airport1.id,
+            "destination": self.airport1.id,
+            "distance": 30,
+        }
+
+        response = self.client.post(ROUTE_URL, payload)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_update_route(self):
+        route = Route.objects.create(
+            source=self.airport1, destination=self.airport2, distance=30
+        )
+
+        response = self.client.patch(detail_url(route.id), {"distance": 40})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        route.refresh_from_db()
+        self.assertEqual(route.distance, 40)
+
+    def test_reversed_pair_rejected_by_database(self):
+        Route.objects.create(
+            source=self.airport1, destination=self.airport2, distance=30
+        )
+
+        with self.assertRaises(IntegrityError):
+            Route.objects.bulk_create(
+                [Route(source=self.airport2, destination=self.airport1, distance=30)]
+            )
+
+
+class ValidateRoutesTest(TestCase):
+    def setUp(self):
+        self.airports = Airport.objects.bulk_create(
+            Airport(name=f"Airport {index}", closest_big_city="City")
+            for index in range(4)
+        )
+        Route.objects.create(
+            source=self.airports[0], destination=self.airports[1], distance=100
+        )
+
+    def _route(self, source, destination):
+        return Route(
+            source=self.airports[source],
+            destination=self.airports[destination],
+            distance=100,
+        )
+
+    def test_valid_routes(self):
+        routes = [self._route(0, 2), self._route(3, 1), self._route(2, 3)]
+
+        with self.assertNumQueries(1):
+            Route.validate_routes(routes)
+
+    def test_invalid_routes(self):
+        routes = [
+            self._route(0, 2),
+            self._route(1, 0),
+            self._route(3, 3),
+            self._route(2, 0),
+            self._route(2, 3),
+        ]
+
+        with self.assertNumQueries(1), self.assertRaises(ValidationError) as error:
+            Route.validate_routes(routes)
+
+        self.assertEqual(sorted(error.exception.detail), [1, 2, 3])
@@ -0,0 +1,193 @@
+import pickle
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from airport import routing
+from airport.models import Airport, Route
+from airport.routing_table import RoutingTable
+
+SHORTEST_URL = reverse("airport:route-shortest")
+ROUTES = [(1, 2, 100), (2, 3, 100), (1, 3, 300), (3, 4, 50), (5, 6, 10)]
+
+
+def all_paths(table, airport_ids):
+    return {
+        (source, destination): table.shortest_path(source, destination)
+        for source in airport_ids
+        for destination in airport_ids
+    }
+
+
+class RoutingTableTest(TestCase):
+    def setUp(self):
+        self.table = RoutingTable.build(ROUTES)
+
+    def test_shortest_path(self):
+        self.assertEqual(self.table.shortest_path(1, 4), ([1, 2, 3, 4], 250))
+        self.assertEqual(self.table.shortest_path(4, 1), ([4, 3, 2, 1], 250))
+        self.assertEqual(self.table.shortest_path(2, 2), ([2], 0))
+
+    def test_unreachable(self):
+        self.assertIsNone(self.table.shortest_path(1, 5))
+        self.assertIsNone(self.table.shortest_path(1, 7))
+
+    def test_keeps_shortest_of_duplicate_routes(self):
+        table = RoutingTable.build(ROUTES + [(3, 1, 150)])
+
+        self.assertEqual(table.shortest_path(1, 3), ([1, 3], 150))
+
+    def test_add_route_matches_build(self):
+        added = [(4, 5, 20), (1, 4, 200), (6, 7, 5)]
+        table = RoutingTable.build(ROUTES)
+        for route in added:
+            table.add_route(*route)
+
+        self.assertEqual(
+            all_paths(table, range(1, 8)),
+            all_paths(RoutingTable.build(ROUTES + added), range(1, 8)),
+        )
+        self.assertEqual(table.shortest_path(1, 7), ([1, 4, 5, 6, 7], 235))
+
+    def test_add_routes_to_empty_table(self):
+        table = RoutingTable.build([])
+        for route in ROUTES:
+            table.add_route(*route)
+
+        self.assertEqual(
+            all_paths(table, range(1, 7)), all_paths(self.table, range(1, 7))
+        )
+
+    def test_remove_unused_route(self):
+        self.assertTrue(self.table.remove_route(1, 3, 300))
+        self.assertEqual(
+            all_paths(self.table, range(1, 7)),
+            all_paths(RoutingTable.build(ROUTES[:2] + ROUTES[3:]), range(1, 7)),
+        )
+
+    def test_remove_route_on_shortest_path(self):
+        self.assertTrue(self.table.remove_route(2, 3, 100))
+        self.assertEqual(self.table.shortest_path(1, 4), ([1, 3, 4], 350))
+        self.assertEqual(
+            all_paths(self.table, range(1, 7)),
+            all_paths(RoutingTable.build(ROUTES[:1] + ROUTES[2:]), range(1, 7)),
+        )
+
+    def test_remove_unknown_route(self):
+        self.assertFalse(self.table.remove_route(2, 3, 99))
+        self.assertFalse(self.table.remove_route(1, 6, 10))
+
+    def test_remove_duplicate_route(self):
+        table = RoutingTable.build(ROUTES + [(3, 1, 150)])
+
+        self.assertTrue(table.remove_route(1, 3, 150))
+        self.assertEqual(table.shortest_path(1, 3), ([1, 2, 3], 200))
+
+    def test_pickles_routes_only(self):
+        self.table.shortest_path(1, 4)
+
+        table = pickle.loads(pickle.dumps(self.table))
+
+        self.assertEqual(vars(table), {"edges": self.table.edges, "_graph": None})
+        self.assertEqual(table.shortest_path(1, 4), ([1, 2, 3, 4], 250))
+
+
+class ShortestRouteApiTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "test@user.com", "testpassword"
+        )
+        self.client.force_authenticate(self.user)
+        self.airports = [
+            Airport.objects.create(name=f"Airport {index}", closest_big_city="City")
+            for index in range(4)
+        ]
+        self.direct = Route.objects.create(
+            source=self.airports[0], destination=self.airports[2], distance=500
+        )
+        Route.objects.create(
+            source=self.airports[0], destination=self.airports[1], distance=100
+        )
+        Route.objects.create(
+            source=self.airports[2], destination=self.airports[1], distance=150
+        )
+
+    def _shortest(self, source, destination):
+        return self.client.get(
+            SHORTEST_URL, {"from": source.pk, "to": destination.pk}
+        )
+
+    def test_shortest_route(self):
+        response = self._shortest(self.airports[2], self.airports[0])
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["distance"], 250)
+        self.assertEqual(
+            [airport["id"] for airport in response.data["airports"]],
+            [self.airports[2].pk, self.airports[1].pk, self.airports[0].pk],
+        )
+        self.assertEqual(response.data["airports"][1]["name"], "Airport 1")
+
+    def test_no_route(self):
+        response = self._shortest(self.airports[0], self.airports[3])
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_invalid_query(self):
+        response = self.client.get(SHORTEST_URL, {"from": "paris"})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("from", response.data)
+        self.assertIn("to", response.data)
+
+    def test_requires_authentication(self):
+        response = APIClient().get(SHORTEST_URL, {"from": 1, "to": 2})
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_route_changes_update_table(self):
+        self._shortest(self.airports[0], self.airports[2])
+        Route.objects.create(
+            source=self.airports[2], destination=self.airports[3], distance=50
+        )
+        with self.assertNumQueries(1):
+            response = self._shortest(self.airports[0], self.airports[3])
+
+        self.assertEqual(response.data["distance"], 300)
+
+        self.direct.delete()
+        with self.assertNumQueries(1):
+            response = self._shortest(self.airports[0], self.airports[3])
+
+        self.assertEqual(response.data["distance"], 300)
+
+        Route.objects.get(destination=self.airports[1], distance=100).delete()
+        response = self._shortest(self.airports[0], self.airports[3])
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_table_is_persisted(self):
+        self._shortest(self.airports[0], self.airports[2])
+        routing._state.table = None
+
+        with self.assertNumQueries(1):
+            response = self._shortest(self.airports[0], self.airports[2])
+
+        self.assertEqual(response.data["distance"], 250)
+
+    def test_paths_are_shared_per_source(self):
+        self._shortest(self.airports[0], self.airports[2])
+        routing._state.table = None
+
+        with mock.patch.object(RoutingTable, "paths_from") as paths_from:
+            response = self._shortest(self.airports[0], self.airports[1])
+
+        paths_from.assert_not_called()
+        self.assertEqual(response.data["distance"], 100)
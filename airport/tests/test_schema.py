@@ -0,0 +1,85 @@
+import tempfile
+from io import StringIO
+from pathlib import Path
+from unittest import skipUnless
+
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+
+from Airport_API_Service import production_settings
+from airport import schema
+
+SCHEMA_URL = reverse("schema")
+
+
+@skipUnless(
+    connection.vendor == "postgresql",
+    "The schema is rendered with the integer bounds of PostgreSQL",
+)
+class SchemaTest(TestCase):
+    def test_committed_schema_is_up_to_date(self):
+        # Fails when views or serializers changed without
+        # `manage.py build_schema`
+        call_command("build_schema", "--check", stdout=StringIO())
+
+
+class SchemaFileTest(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name) / "openapi-schema.yml"
+        schema.load_schema.cache_clear()
+        self.addCleanup(schema.load_schema.cache_clear)
+        settings_override = override_settings(OPENAPI_SCHEMA_FILE=self.path)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_serves_schema_file(self):
+        self.path.write_bytes(b"openapi: 3.0.3\n")
+
+        response = self.client.get(SCHEMA_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.content, b"openapi: 3.0.3\n")
+        self.assertEqual(response["Content-Type"], schema.CONTENT_TYPE)
+        self.assertIn("no-cache", response["Cache-Control"])
+        self.assertIn("public", response["Cache-Control"])
+
+    def test_not_modified(self):
+        self.path.write_bytes(b"openapi: 3.0.3\n")
+        etag = self.client.get(SCHEMA_URL)["ETag"]
+
+        response = self.client.get(SCHEMA_URL, headers={"If-None-Match": etag})
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["ETag"], etag)
+
+    def test_missing_file_is_generated_once(self):
+        response = self.client.get(SCHEMA_URL)
+
+        self.assertIn(b"/api/airport/flights/", response.content)
+        self.assertEqual(self.path.read_bytes(), response.content)
+        self.path.write_bytes(b"changed")
+        self.assertEqual(self.client.get(SCHEMA_URL).content, response.content)
+
+    def test_build_and_check(self):
+        self.path.write_bytes(b"openapi: 3.0.3\n")
+        with self.assertRaisesMessage(CommandError, "is out of date"):
+            call_command("build_schema", "--check", stdout=StringIO())
+
+        call_command("build_schema", stdout=StringIO())
+        call_command("build_schema", "--check", stdout=StringIO())
+
+        self.assertEqual(self.path.read_bytes(), schema.build_schema())
+
+
+class ProductionSettingsTest(SimpleTestCase):
+    def test_schema_class_is_installed(self):
+        # The views describe their schema with drf-spectacular
+        schema_class = production_settings.REST_FRAMEWORK["DEFAULT_SCHEMA_CLASS"]
+        self.assertIn(schema_class.split(".")[0], production_settings.INSTALLED_APPS)
+        self.assertNotIn("debug_toolbar", production_settings.INSTALLED_APPS)
+        self.assertFalse(production_settings.API_DOC_PAGES)
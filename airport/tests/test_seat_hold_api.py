@@ -0,0 +1,192 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from airport.models import (
+    Airport,
+    Route,
+    Flight,
+    AirplaneType,
+    Airplane,
+    SeatHold,
+    Ticket,
+)
+
+ORDER_URL = reverse("airport:order-list")
+FLIGHTS_URL = reverse("airport:flight-list")
+
+
+def holds_url(flight_id):
+    return reverse("airport:flight-hold", args=[flight_id])
+
+
+class SeatHoldApiTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "admin@user.com", "testpassword", is_staff=True
+        )
+        self.client.force_authenticate(self.user)
+        self.other_client = APIClient()
+        self.other_user = get_user_model().objects.create_user(
+            "other@user.com", "testpassword", is_staff=True
+        )
+        self.other_client.force_authenticate(self.other_user)
+        airport1 = Airport.objects.create(name="airport1", closest_big_city="Paris")
+        airport2 = Airport.objects.create(name="airport2", closest_big_city="Berlin")
+        route = Route.objects.create(
+            source=airport1, destination=airport2, distance=5000
+        )
+        airplane_type = AirplaneType.objects.create(name="type")
+        airplane = Airplane.objects.create(
+            name="test", rows=10, seats_in_row=4, airplane_type=airplane_type
+        )
+        self.flight = Flight.objects.create(
+            route=route,
+            airplane=airplane,
+            departure_time=timezone.now() + timezone.timedelta(days=2),
+            arrival_time=timezone.now() + timezone.timedelta(days=3),
+        )
+
+    def _hold(self, client, *seats, ttl=600):
+        return client.post(
+            holds_url(self.flight.id),
+            {"seats": [{"row": row, "seat": seat} for row, seat in seats], "ttl": ttl},
+            format="json",
+        )
+
+    def _tickets_available(self):
+        return self.client.get(FLIGHTS_URL).data["results"][0]["tickets_available"]
+
+    def test_hold_seats(self):
+        response = self._hold(self.client, (1, 1), (1, 2))
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data), 2)
+        self.assertEqual(self._tickets_available(), 38)
+
+    def test_hold_seat_held_by_other_user(self):
+        self._hold(self.client, (1, 1))
+
+        response = self._hold(self.other_client, (1, 2), (1, 1))
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(
+            response.data["taken_seats"],
+            [{"flight": self.flight.id, "row": 1, "seat": 1}],
+        )
+
+    def test_hold_more_seats_than_allowed(self):
+        seats = [(row, seat) for row in range(1, 4) for seat in range(1, 5)]
+
+        response = self._hold(self.client, *seats[:11])
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(SeatHold.objects.exists())
+
+    def test_hold_limit_counts_active_holds_of_user(self):
+        seats = [(row, seat) for row in range(1, 4) for seat in range(1, 5)]
+        self._hold(self.client, *seats[:8])
+        SeatHold.objects.filter(row=1).update(
+            expires_at=timezone.now() - timezone.timedelta(seconds=1)
+        )
+
+        renewed = self._hold(self.client, *seats[4:12])
+        exceeded = self._hold(self.client, *seats[:3])
+        other_user = self._hold(self.other_client, *seats[:3])
+
+        self.assertEqual(renewed.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(exceeded.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(exceeded.data["detail"].code, "seat_hold_limit")
+        self.assertEqual(other_user.status_code, status.HTTP_201_CREATED)
+
+    def test_order_rejects_seat_held_by_other_user(self):
+        self._hold(self.client, (1, 1))
+
+        response = self.other_client.post(
+            ORDER_URL,
+            {"tickets": [{"flight": self.flight.id, "row": 1, "seat": 1}]},
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Ticket.objects.exists())
+
+    def test_order_consumes_own_hold(self):
+        self._hold(self.client, (1, 1))
+
+        response = self.client.post(
+            ORDER_URL,
+            {"tickets": [{"flight": self.flight.id, "row": 1, "seat": 1}]},
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertFalse(SeatHold.objects.exists())
+        self.assertEqual(self._tickets_available(), 39)
+
+    def test_expired_hold_does_not_block(self):
+        self._hold(self.client, (1, 1))
+        SeatHold.objects.update(expires_at=timezone.now())
+
+        response = self._hold(self.other_client, (1, 1))
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_expired_hold_restores_availability(self):
+        detail_url = reverse("airport:flight-detail", args=[self.flight.id])
+        self._hold(self.client, (1, 1), (1, 2))
+        list_response = self.client.get(FLIGHTS_URL)
+        detail_response = self.client.get(detail_url)
+        self.assertEqual(list_response.data["results"][0]["tickets_available"], 38)
+
+        # The holds expire without a write
+        later = timezone.now() + timezone.timedelta(seconds=601)
+        with mock.patch("django.utils.timezone.now", return_value=later):
+            response = self.client.get(
+                FLIGHTS_URL, headers={"If-None-Match": list_response["ETag"]}
+            )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.data["results"][0]["tickets_available"], 40)
+            response = self.client.get(
+                detail_url, headers={"If-None-Match": detail_response["ETag"]}
+            )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.data["id"], self.flight.id)
+            response = self.client.get(
+                detail_url, headers={"If-None-Match": response["ETag"]}
+            )
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_release_holds(self):
+        self._hold(self.client, (1, 1), (1, 2))
+
+        response = self.client.delete(
+            holds_url(self.flight.id),
+            {"seats": [{"row": 1, "seat": 2}]},
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(
+            list(SeatHold.objects.values_list("row", "seat")), [(1, 1)]
+        )
+        self.assertEqual(self._tickets_available(), 39)
+
+    def test_sweep_seat_holds(self):
+        self._hold(self.client, (1, 1))
+        self._hold(self.other_client, (2, 1))
+        SeatHold.objects.filter(user=self.user).update(expires_at=timezone.now())
+
+        call_command("sweep_seat_holds", stdout=StringIO())
+
+        self.assertEqual(
+            list(SeatHold.objects.values_list("row", "seat")), [(2, 1)]
+        )
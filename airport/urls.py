@@ -9,6 +9,7 @@ from airport.views import (
     FlightViewSet,
     OrderViewSet,
     CrewViewSet,
+    ExportViewSet,
 )
 
 router = routers.DefaultRouter()
@@ -19,6 +20,7 @@ router.register("crews", CrewViewSet)
 router.register("routes", RouteViewSet)
 router.register("flights", FlightViewSet)
 router.register("orders", OrderViewSet)
+router.register("export", ExportViewSet, basename="export")
 
 urlpatterns = [path("", include(router.urls))]
 
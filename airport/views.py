@@ -1,61 +1,145 @@
-from django.db.models import F, Count
+import datetime
+import hashlib
+
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import F, Prefetch, Q
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
 from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import OpenApiParameter, extend_schema
-from rest_framework import mixins
-from rest_framework.viewsets import GenericViewSet, ModelViewSet
-
+from rest_framework import mixins, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.viewsets import GenericViewSet, ModelViewSet, ViewSet
+
+from airport.cache import FlightCacheMixin, flight_cache_stats
+from airport.conditional import ConditionalGetMixin, ConditionalListMixin
+from airport.connections import search_connections
+from airport.export import OUTPUTS, export_response
 from airport.models import AirplaneType, Airplane, Airport, Route, Flight, Order, Crew
 from airport.permissions import IsAdminOrIfAuthenticatedReadOnly
+from airport.search import AirportSearchMixin
 from airport.serializers import (
     AirplaneTypeSerializer,
     AirplaneSerializer,
     AirplaneListSerializer,
     AirportSerializer,
+    CapacityQuerySerializer,
     RouteSerializer,
     RouteListSerializer,
     FlightSerializer,
     FlightListSerializer,
+    FlightFilterSerializer,
     OrderSerializer,
     OrderListSerializer,
     FlightDetailSerializer,
     CrewSerializer,
+    SeatMapSerializer,
+    SeatHoldRequestSerializer,
+    SeatReleaseRequestSerializer,
+    SeatHoldSerializer,
+    FlightImportResultSerializer,
+    ConnectionSearchSerializer,
+    ItinerarySerializer,
+    ShortestRouteQuerySerializer,
+    ShortestRouteSerializer,
+)
+from airport.reservations import hold_seats, release_holds
+from airport.routing import shortest_route
+from airport.schedule_import import (
+    FlightScheduleCSVParser,
+    FlightScheduleJSONLinesParser,
+    import_flight_schedule,
 )
+from airport.seat_map import SeatMap
 
 
 class AirplaneTypeViewSet(
-    mixins.CreateModelMixin, mixins.ListModelMixin, GenericViewSet
+    ConditionalListMixin,
+    mixins.CreateModelMixin,
+    mixins.ListModelMixin,
+    GenericViewSet,
 ):
     queryset = AirplaneType.objects.all()
     serializer_class = AirplaneTypeSerializer
     permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
 
 
-class AirplaneViewSet(ModelViewSet):
+def utc_day(date):
+    """Start of the given date in UTC"""
+    return datetime.datetime.combine(date, datetime.time.min, datetime.timezone.utc)
+
+
+def filter_by_capacity(queryset, request, capacity_field, *ordering):
+    """
+    Apply ?min_capacity= and ?ordering=capacity|-capacity to a queryset
+    with airplane capacity in capacity_field. Ties are ordered by ordering.
+    """
+    serializer = CapacityQuerySerializer(data=request.query_params)
+    serializer.is_valid(raise_exception=True)
+    params = serializer.validated_data
+
+    if "min_capacity" in params:
+        queryset = queryset.filter(
+            **{f"{capacity_field}__gte": params["min_capacity"]}
+        )
+
+    if "ordering" in params:
+        if capacity_field != "capacity":
+            # The keyset pagination reads the ordering value from the results
+            queryset = queryset.annotate(capacity=F(capacity_field))
+        queryset = queryset.order_by(params["ordering"], *ordering)
+    return queryset
+
+
+class AirplaneViewSet(ConditionalGetMixin, ModelViewSet):
     queryset = Airplane.objects.select_related("airplane_type")
     serializer_class = AirplaneSerializer
     permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
+    conditional_fields = ("updated_at", "airplane_type__updated_at")
+
+    def get_queryset(self):
+        return filter_by_capacity(self.queryset, self.request, "capacity", "pk")
 
     def get_serializer_class(self):
         if self.action in ("list", "retrieve"):
             return AirplaneListSerializer
         return self.serializer_class
 
+    @extend_schema(parameters=[CapacityQuerySerializer])
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
 
-class AirportViewSet(ModelViewSet):
+class AirportViewSet(ConditionalGetMixin, ModelViewSet):
     queryset = Airport.objects.all()
     serializer_class = AirportSerializer
     permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
 
     def get_queryset(self):
         queryset = self.queryset
+        name = self.request.query_params.get("name")
         city = self.request.query_params.get("city")
 
+        if name:
+            queryset = queryset.filter(name__icontains=name)
+
         if city:
             queryset = queryset.filter(closest_big_city__icontains=city)
         return queryset
 
     @extend_schema(
         parameters=[
+            OpenApiParameter(
+                "name",
+                description="Filter by name (ex. ?name=Heathrow)",
+                required=False,
+                type=str,
+            ),
             OpenApiParameter(
                 "city",
                 description="Filter by closest_big_city (ex. ?city=Paris)",
@@ -68,7 +152,7 @@ class AirportViewSet(ModelViewSet):
         return super().list(request, *args, **kwargs)
 
 
-class CrewViewSet(ModelViewSet):
+class CrewViewSet(ConditionalGetMixin, ModelViewSet):
     queryset = Crew.objects.all()
     serializer_class = CrewSerializer
     permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
@@ -106,10 +190,16 @@ class CrewViewSet(ModelViewSet):
         return super().list(request, *args, **kwargs)
 
 
-class RouteViewSet(ModelViewSet):
+class RouteViewSet(AirportSearchMixin, ConditionalGetMixin, ModelViewSet):
     queryset = Route.objects.select_related("source", "destination")
     serializer_class = RouteSerializer
     permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
+    airport_search_params = ("source", "destination")
+    conditional_fields = (
+        "updated_at",
+        "source__updated_at",
+        "destination__updated_at",
+    )
 
     def get_queryset(self):
         queryset = self.queryset
@@ -117,11 +207,11 @@ class RouteViewSet(ModelViewSet):
         destination = self.request.query_params.get("destination")
 
         if source:
-            queryset = queryset.filter(source__closest_big_city__icontains=source)
+            queryset = queryset.filter(source_id__in=self.airport_ids(source))
 
         if destination:
             queryset = queryset.filter(
-                destination__closest_big_city__icontains=destination
+                destination_id__in=self.airport_ids(destination)
             )
 
         return queryset.select_related("source", "destination")
@@ -150,39 +240,104 @@ class RouteViewSet(ModelViewSet):
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
 
+    @extend_schema(
+        parameters=[ShortestRouteQuerySerializer],
+        responses=ShortestRouteSerializer,
+    )
+    @action(methods=["GET"], detail=False, url_path="shortest")
+    def shortest(self, request):
+        """
+        Shortest path between two airports over the routes, each route
+        flown in either direction, with its total distance
+        """
+        serializer = ShortestRouteQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+
+        path = shortest_route(params["from"], params["to"])
+        airports = Airport.objects.in_bulk(path[0]) if path else {}
+        if not path or any(airport_id not in airports for airport_id in path[0]):
+            raise NotFound("There is no route between these airports.")
+
+        airport_ids, distance = path
+        return Response(
+            ShortestRouteSerializer(
+                {
+                    "distance": distance,
+                    "airports": [airports[airport_id] for airport_id in airport_ids],
+                }
+            ).data
+        )
+
 
-class FlightViewSet(ModelViewSet):
+class FlightViewSet(AirportSearchMixin, FlightCacheMixin, ModelViewSet):
     queryset = (
-        Flight.objects.select_related("route__destination", "route__source", "airplane")
-        .prefetch_related("crew")
-        .annotate(
-            tickets_available=(
-                F("airplane__rows") * F("airplane__seats_in_row") - Count("tickets")
-            )
-        )
+        Flight.objects.select_related(
+            "route__destination", "route__source", "airplane"
+        ).prefetch_related("crew")
     )
     serializer_class = FlightSerializer
     permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
+    airport_search_params = ("source", "destination")
 
     def get_queryset(self):
-        queryset = self.queryset
+        # Active holds are counted at the time of the request
+        queryset = self.queryset.with_seats_held()
         source = self.request.query_params.get("source")
         destination = self.request.query_params.get("destination")
-        date = self.request.query_params.get("date")
+        serializer = FlightFilterSerializer(data=self.request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
 
         if source:
+            queryset = queryset.filter(route__source_id__in=self.airport_ids(source))
+
+        if destination:
             queryset = queryset.filter(
-                route__source__closest_big_city__icontains=source
+                route__destination_id__in=self.airport_ids(destination)
             )
 
-        if destination:
+        # Dates become ranges on departure_time, which the indexes can serve
+        for first_date, last_date in (
+            (params.get("date"), params.get("date")),
+            (params.get("date_from"), params.get("date_to")),
+        ):
+            if first_date:
+                queryset = queryset.filter(departure_time__gte=utc_day(first_date))
+            if last_date:
+                queryset = queryset.filter(
+                    departure_time__lt=utc_day(last_date) + datetime.timedelta(days=1)
+                )
+
+        after, before = params.get("departure_after"), params.get("departure_before")
+        if after and before and before < after:
             queryset = queryset.filter(
-                route__destination__closest_big_city__icontains=destination
+                Q(departure_time__time__gte=after) | Q(departure_time__time__lt=before)
             )
+        else:
+            if after:
+                queryset = queryset.filter(departure_time__time__gte=after)
+            if before:
+                queryset = queryset.filter(departure_time__time__lt=before)
 
-        if date:
-            queryset = queryset.filter(departure_time__date=date)
+        if "airplane_type" in params:
+            queryset = queryset.filter(
+                airplane__airplane_type_id=params["airplane_type"]
+            )
+
+        if "min_seats_available" in params:
+            queryset = queryset.alias(
+                seats_available=F("airplane__capacity")
+                - F("tickets_sold")
+                - F("seats_held")
+            ).filter(seats_available__gte=params["min_seats_available"])
 
+        queryset = filter_by_capacity(
+            queryset, self.request, "airplane__capacity", *Flight._meta.ordering
+        )
+        if self.action == "retrieve":
+            # FlightDetailSerializer lists the airplane with its type
+            queryset = queryset.select_related("airplane__airplane_type")
         return queryset.select_related(
             "airplane", "route__source", "route__destination"
         )
@@ -208,30 +363,236 @@ class FlightViewSet(ModelViewSet):
                 required=False,
                 type=str,
             ),
+            FlightFilterSerializer,
+            CapacityQuerySerializer,
+        ]
+    )
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @extend_schema(
+        parameters=[
             OpenApiParameter(
-                "date",
-                description="Filter by departure_date (ex. ?date=24-10-08)",
+                "encoding",
+                description="Seat map encoding: 'bitmap' (default) or 'rle'",
                 required=False,
-                type=OpenApiTypes.DATE,
-                location=OpenApiParameter.QUERY,
+                type=str,
+                enum=["bitmap", "rle"],
+            ),
+        ],
+        responses={200: SeatMapSerializer, 304: None},
+    )
+    @action(methods=["GET"], detail=True, url_path="seats")
+    def seats(self, request, pk=None):
+        """
+        Seat map of the flight: a base64 bitmap with one bit per seat in
+        row order (set bits are sold seats) or, with ?encoding=rle, the
+        lengths of alternating free and sold runs starting with free seats.
+        """
+        flight = get_object_or_404(
+            Flight.objects.select_related("airplane").only(
+                "seat_map", "airplane", "airplane__rows", "airplane__seats_in_row"
             ),
+            pk=pk,
+        )
+        encoding = request.query_params.get("encoding", "bitmap")
+        if encoding not in ("bitmap", "rle"):
+            raise ValidationError({"encoding": "Must be one of: bitmap, rle."})
+
+        seat_map = SeatMap.for_flight(flight)
+        etag = quote_etag(
+            hashlib.md5(
+                f"{encoding}:{seat_map.rows}x{seat_map.seats_in_row}:".encode()
+                + seat_map.to_bytes()
+            ).hexdigest()
+        )
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
+
+        serializer = SeatMapSerializer(
+            {
+                "rows": seat_map.rows,
+                "seats_in_row": seat_map.seats_in_row,
+                "encoding": encoding,
+                "seat_map": (
+                    seat_map.to_runs()
+                    if encoding == "rle"
+                    else seat_map.to_base64()
+                ),
+            }
+        )
+        return Response(serializer.data, headers={"ETag": etag})
+
+    @extend_schema(
+        request=SeatHoldRequestSerializer,
+        responses={201: SeatHoldSerializer(many=True), 409: None},
+    )
+    @action(
+        methods=["POST"],
+        detail=True,
+        url_path="holds",
+        permission_classes=(IsAuthenticated,),
+    )
+    def hold(self, request, pk=None):
+        """Hold seats of the flight while the order is being paid"""
+        flight = get_object_or_404(Flight, pk=pk)
+        serializer = SeatHoldRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        seats = [
+            (seat["row"], seat["seat"]) for seat in serializer.validated_data["seats"]
         ]
+        holds = hold_seats(
+            flight, request.user, seats, serializer.validated_data["ttl"]
+        )
+        return Response(
+            SeatHoldSerializer(holds, many=True).data, status=status.HTTP_201_CREATED
+        )
+
+    @extend_schema(request=SeatReleaseRequestSerializer, responses={204: None})
+    @hold.mapping.delete
+    def release(self, request, pk=None):
+        """Release the given (by default all) seats the user holds on the flight"""
+        flight = get_object_or_404(Flight, pk=pk)
+        serializer = SeatReleaseRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        release_holds(
+            flight,
+            request.user,
+            [
+                (seat["row"], seat["seat"])
+                for seat in serializer.validated_data.get("seats", [])
+            ],
+        )
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @extend_schema(
+        parameters=[ConnectionSearchSerializer],
+        responses=ItinerarySerializer(many=True),
     )
-    def list(self, request, *args, **kwargs):
-        return super().list(request, *args, **kwargs)
+    @action(methods=["GET"], detail=False, url_path="connections")
+    def connections(self, request):
+        """
+        Itineraries of up to three flights between two cities, with the
+        first flight departing between date_from and date_to (UTC), sorted
+        by arrival time.
+        """
+        serializer = ConnectionSearchSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+
+        itineraries = search_connections(
+            self.airport_ids(params["source"]),
+            self.airport_ids(params["destination"]),
+            max(
+                timezone.now(),
+                timezone.make_aware(
+                    datetime.datetime.combine(params["date_from"], datetime.time.min)
+                ),
+            ),
+            timezone.make_aware(
+                datetime.datetime.combine(params["date_to"], datetime.time.max)
+            ),
+            max_legs=params["max_legs"],
+            min_connection=params["min_connection"] * 60,
+            max_connection=params["max_connection"] * 60,
+            limit=params["limit"],
+        )
+        flights = self.queryset.with_seats_held().in_bulk(
+            {leg.flight_id for legs in itineraries for leg in legs}
+        )
 
+        results = []
+        for legs in itineraries:
+            if any(leg.flight_id not in flights for leg in legs):
+                continue
+            departure_time = flights[legs[0].flight_id].departure_time
+            arrival_time = flights[legs[-1].flight_id].arrival_time
+            duration = arrival_time - departure_time
+            results.append(
+                {
+                    "departure_time": departure_time,
+                    "arrival_time": arrival_time,
+                    "duration": duration // datetime.timedelta(minutes=1),
+                    "legs": [flights[leg.flight_id] for leg in legs],
+                }
+            )
+        return Response(
+            ItinerarySerializer(
+                results, many=True, context=self.get_serializer_context()
+            ).data
+        )
 
-class OrderViewSet(mixins.ListModelMixin, mixins.CreateModelMixin, GenericViewSet):
-    queryset = Order.objects.prefetch_related(
-        "tickets__flight__source__name", "tickets__flight__destination__name"
+    @extend_schema(
+        request={
+            "text/csv": OpenApiTypes.STR,
+            "application/x-ndjson": OpenApiTypes.STR,
+        },
+        responses={201: FlightImportResultSerializer},
+    )
+    @action(
+        methods=["POST"],
+        detail=False,
+        url_path="import",
+        permission_classes=(IsAdminUser,),
+        parser_classes=(FlightScheduleCSVParser, FlightScheduleJSONLinesParser),
+    )
+    def import_schedule(self, request):
+        """
+        Create flights from a CSV file with a header row or from JSON lines.
+        Each row has route, airplane, crew, departure_time and arrival_time.
+        Either all flights are created or, if a row is invalid, none.
+        """
+        created = import_flight_schedule(request.data)
+        return Response(
+            FlightImportResultSerializer({"created": created}).data,
+            status=status.HTTP_201_CREATED,
+        )
+
+    @extend_schema(
+        responses={
+            200: {
+                "type": "object",
+                "properties": {
+                    "hits": {"type": "integer"},
+                    "misses": {"type": "integer"},
+                },
+            }
+        }
     )
+    @action(
+        methods=["GET"],
+        detail=False,
+        url_path="cache-stats",
+        permission_classes=(IsAdminUser,),
+    )
+    def cache_stats(self, request):
+        """Hit and miss counters of the flight list and detail cache"""
+        return Response(flight_cache_stats())
+
+
+class OrderViewSet(mixins.ListModelMixin, mixins.CreateModelMixin, GenericViewSet):
+    queryset = Order.objects.all()
     serializer_class = OrderSerializer
     permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
 
     def get_queryset(self):
-        return Order.objects.filter(user=self.request.user).prefetch_related(
-            "tickets__flight__route"
-        )
+        queryset = self.queryset.filter(user=self.request.user)
+
+        if self.action == "list":
+            queryset = queryset.prefetch_related(
+                "tickets",
+                Prefetch(
+                    "tickets__flight",
+                    queryset=Flight.objects.select_related(
+                        "route__source", "route__destination", "airplane"
+                    )
+                    .prefetch_related("crew")
+                    .with_seats_held(),
+                ),
+            )
+
+        return queryset
 
     def get_serializer_class(self):
         if self.action == "list":
@@ -240,3 +601,49 @@ class OrderViewSet(mixins.ListModelMixin, mixins.CreateModelMixin, GenericViewSe
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
+
+
+EXPORT_OUTPUT_PARAMETER = OpenApiParameter(
+    "output",
+    description="Output format: 'csv' (default) or 'jsonl' (JSON lines)",
+    required=False,
+    type=str,
+    enum=list(OUTPUTS),
+)
+EXPORT_RESPONSES = {
+    (200, content_type): OpenApiTypes.STR for content_type in OUTPUTS.values()
+}
+
+
+class ExportViewSet(ViewSet):
+    """Streaming dumps of whole tables for analytics"""
+
+    permission_classes = (IsAdminUser,)
+
+    def _export(self, name):
+        output = self.request.query_params.get("output", "csv")
+        if output not in OUTPUTS:
+            raise ValidationError(
+                {"output": f"Must be one of: {', '.join(OUTPUTS)}."}
+            )
+        return export_response(
+            name, output, asynchronous=isinstance(self.request._request, ASGIRequest)
+        )
+
+    @extend_schema(parameters=[EXPORT_OUTPUT_PARAMETER], responses=EXPORT_RESPONSES)
+    @action(methods=["GET"], detail=False)
+    def flights(self, request):
+        """All flights with their route and airplane"""
+        return self._export("flights")
+
+    @extend_schema(parameters=[EXPORT_OUTPUT_PARAMETER], responses=EXPORT_RESPONSES)
+    @action(methods=["GET"], detail=False)
+    def orders(self, request):
+        """All orders with their number of tickets"""
+        return self._export("orders")
+
+    @extend_schema(parameters=[EXPORT_OUTPUT_PARAMETER], responses=EXPORT_RESPONSES)
+    @action(methods=["GET"], detail=False)
+    def tickets(self, request):
+        """All tickets with the user and time of their order"""
+        return self._export("tickets")